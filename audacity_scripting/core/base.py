@@ -4,10 +4,14 @@
 #                          master/scripts/piped-work/pipe_test.py
 
 from audacity_scripting import LOGGER_NAME
+from audacity_scripting.core.latency import LatencyStats
+from audacity_scripting.core.stream import JsonArrayStream
+from collections import deque
 import json
 import logging
 import os
 import sys
+from time import perf_counter
 
 # TODO(adthomas811): Log raised exceptions to the log file.
 
@@ -49,12 +53,23 @@ class AudacityScriptingBase(object):
         The file object to read responses from Audacity.
     EOL : str
         The end of line character used depending on the OS.
+    latency : LatencyStats
+        Measured round trip times of the commands sent with run_command.
 
     Methods
     -------
     run_command(command)
         Writes a command to the Audacity scripting pipe, reads and checks the
         output, then returns the result.
+    run_commands(command_list, max_in_flight=16)
+        Writes a batch of commands to the Audacity scripting pipe without
+        waiting for each result, then returns the list of results.
+    stream_json(command)
+        Writes a command to the Audacity scripting pipe and yields each
+        element of the returned JSON array as soon as it has been read.
+    get_json_text(result)
+        Returns the JSON text from the result from Audacity, without the
+        status line and with the backslashes escaped.
     get_json(result)
         Parses a JSON data structure from the result from Audacity.
     close()
@@ -73,6 +88,8 @@ class AudacityScriptingBase(object):
             If the fromfile file object doesn't exist.
         """
 
+        self.latency = LatencyStats()
+
         if sys.platform == 'win32':
             logger.info('Running on windows')
             base_path = '\\\\.\\pipe\\'
@@ -145,6 +162,33 @@ class AudacityScriptingBase(object):
         self._assert_command_success(result.split('\n')[-2])
         return result
 
+    def _iter_response(self):
+        """
+        Reads a response from the fromfile file object one line at a time
+        and yields each line of the result. The final status line is held
+        back and checked once the response has ended. Unread lines are
+        drained if the caller stops early, so the pipe stays in sync.
+        """
+
+        finished = False
+        try:
+            line = self.fromfile.readline()
+            # Remove leading newline character on Mac OSX
+            if line == '\n':
+                line = self.fromfile.readline()
+            held_line = None
+            while line != '\n':
+                if held_line is not None:
+                    yield held_line
+                held_line = line
+                line = self.fromfile.readline()
+            finished = True
+            self._assert_command_success((held_line or '').rstrip('\n'))
+        finally:
+            if not finished:
+                while self.fromfile.readline() != '\n':
+                    pass
+
     def _assert_command_success(self, result_string):
         """
         Checks the result string and raises an exception if the command did
@@ -179,13 +223,182 @@ class AudacityScriptingBase(object):
         """
 
         logger.info('Command: {}'.format(command))
+        start_time = perf_counter()
         self._send_command(command)
-        return self._get_response()
+        succeeded = False
+        try:
+            result = self._get_response()
+            succeeded = True
+            return result
+        finally:
+            self.latency.record(command.split(':')[0].strip(),
+                                perf_counter() - start_time)
+            self._command_finished(command, succeeded)
+
+    def run_commands(self, command_list, max_in_flight=16,
+                     result_read=None):
+        """
+        Writes a batch of commands to the Audacity scripting pipe without
+        waiting for each result, then returns the list of results. At most
+        max_in_flight commands are written ahead of the results being read,
+        so the pipes never fill up. If a command fails, no further commands
+        are written, the results of the commands already written are read,
+        and the first failure is raised. The time Audacity spends on each
+        command, from when it is written or the previous result is read,
+        whichever is later, to when its result is read, is recorded in
+        latency.
 
-    # TODO(adthomas811): Move get_json out of this class?
-    def get_json(self, result):
+        Parameters
+        ----------
+        command_list : list
+            Commands to be sent to Audacity, in order.
+        max_in_flight : int, optional
+            Maximum number of commands written before their results are read
+            (Default is 16).
+        result_read : callable, optional
+            Called as result_read(position) with the position of each
+            command in command_list as soon as its result has been read, as
+            long as no command has failed (Default is None).
+
+        Raises
+        ------
+        CommandAssertFailure
+            If the result of any command indicates that it did not succeed.
         """
-        Parses a JSON data structure from the result from Audacity.
+
+        results = []
+        in_flight = deque()
+        first_failure = None
+        for command in command_list:
+            if len(in_flight) >= max_in_flight:
+                first_failure = self._read_in_flight(in_flight, results,
+                                                     first_failure,
+                                                     result_read)
+                if first_failure is not None:
+                    break
+            logger.info('Command: {}'.format(command))
+            self._send_command(command)
+            in_flight.append((command, perf_counter()))
+
+        while in_flight:
+            first_failure = self._read_in_flight(in_flight, results,
+                                                 first_failure, result_read)
+        if first_failure is not None:
+            raise first_failure
+        return results
+
+    def _read_in_flight(self, in_flight, results, first_failure,
+                        result_read=None):
+        """
+        Reads the result of the oldest command written by run_commands and
+        returns the first failure seen so far.
+
+        Parameters
+        ----------
+        in_flight : deque
+            (command, start_time) pairs of the commands that have been
+            written but whose results are unread, where start_time is when
+            Audacity could start on the command.
+        results : list
+            Results read so far, appended to in place.
+        first_failure : CommandAssertFailure
+            The first failure seen so far, or None.
+        result_read : callable, optional
+            Called as result_read(position) with the position of the command
+            in the batch if its result is read before any failure (Default
+            is None).
+        """
+
+        command, start_time = in_flight.popleft()
+        succeeded = False
+        try:
+            result = self._get_response()
+            succeeded = True
+        except CommandAssertFailure as err:
+            logger.info('Command failed: {}'.format(command))
+            if first_failure is None:
+                first_failure = err
+            return first_failure
+        finally:
+            read_time = perf_counter()
+            self.latency.record(command.split(':')[0].strip(),
+                                read_time - start_time)
+            if in_flight:
+                # The next command waits for this one, so its time starts
+                # when this result is read.
+                next_command, next_start_time = in_flight[0]
+                in_flight[0] = (next_command, max(next_start_time,
+                                                  read_time))
+            self._command_finished(command, succeeded)
+        results.append(result)
+        if result_read is not None and first_failure is None:
+            result_read(len(results) - 1)
+        return first_failure
+
+    def _command_finished(self, command, succeeded=True):
+        """
+        Called after the result of each command has been read, even if the
+        command failed. Does nothing here, subclasses can override it to
+        track the effects of commands.
+
+        Parameters
+        ----------
+        command : str
+            Command that was sent to Audacity.
+        succeeded : bool, optional
+            Flag that is False if the command did not succeed, in which
+            case its effects are not known (Default is True).
+        """
+
+        pass
+
+    def stream_json(self, command):
+        """
+        Writes a command to the Audacity scripting pipe and yields each
+        element of the returned JSON array as soon as it has been read, so
+        large replies are never held in memory as a whole.
+
+        Parameters
+        ----------
+        command : str
+            Command to be sent to Audacity. The command must return a JSON
+            array, e.g. 'GetInfo: Type=Commands'.
+        """
+
+        logger.info('Command: {}'.format(command))
+        self._send_command(command)
+        parser = JsonArrayStream()
+        succeeded = True
+        try:
+            for line in self._iter_response():
+                for element in parser.feed(self._escape_result_line(line)):
+                    yield element
+            parser.close()
+        except CommandAssertFailure:
+            succeeded = False
+            raise
+        finally:
+            self._command_finished(command, succeeded)
+
+    @staticmethod
+    def _escape_result_line(result_line):
+        """
+        Escapes the backslashes in a line of the result from Audacity, which
+        are not escaped in paths, so that it can be parsed as JSON.
+
+        Parameters
+        ----------
+        result_line : str
+            A line of the result returned from an Audacity command.
+        """
+
+        new_result_line = result_line.replace('\\', '\\\\')
+        return new_result_line.replace('\\\\"', '\\"')
+
+    def get_json_text(self, result):
+        """
+        Returns the JSON text from the result from Audacity, without the
+        status line and with the backslashes escaped.
 
         Parameters
         ----------
@@ -196,7 +409,18 @@ class AudacityScriptingBase(object):
         raw_result_item_list = result.split('\n')[:-2]
         result_item_list = []
         for result_item in raw_result_item_list:
-            new_result_item = result_item.replace('\\', '\\\\')
-            new_result_item = new_result_item.replace('\\\\"', '\\"')
-            result_item_list.append(new_result_item)
-        return json.loads('\n'.join(result_item_list))
+            result_item_list.append(self._escape_result_line(result_item))
+        return '\n'.join(result_item_list)
+
+    # TODO(adthomas811): Move get_json out of this class?
+    def get_json(self, result):
+        """
+        Parses a JSON data structure from the result from Audacity.
+
+        Parameters
+        ----------
+        result : str
+            Result returned from an Audacity command, containing a JSON object.
+        """
+
+        return json.loads(self.get_json_text(result))
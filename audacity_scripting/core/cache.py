@@ -0,0 +1,121 @@
+from collections import OrderedDict
+from hashlib import blake2b
+from types import MappingProxyType
+
+
+def freeze(obj):
+    """
+    Returns an immutable copy of a parsed JSON object. Lists become tuples and
+    dicts become read-only mappings.
+
+    Parameters
+    ----------
+    obj : object
+        Parsed JSON object to be frozen.
+    """
+
+    if isinstance(obj, list):
+        return tuple(freeze(item) for item in obj)
+    if isinstance(obj, dict):
+        return MappingProxyType({key: freeze(value)
+                                 for key, value in obj.items()})
+    return obj
+
+
+class ParseCache(object):
+    """
+    A size-bounded LRU cache of parsed Audacity results, keyed on a hash of
+    the raw result text. Identical replies are only parsed once.
+
+    Attributes
+    ----------
+    max_size : int
+        Maximum number of parsed results held before the least recently used
+        result is evicted.
+    hits : int
+        Number of lookups answered from the cache.
+    misses : int
+        Number of lookups that required parsing the result.
+    evictions : int
+        Number of results evicted to stay within max_size.
+
+    Methods
+    -------
+    get(result, parse)
+        Returns the immutable parsed result, parsing it only on a miss.
+    stats()
+        Returns a dict containing the hit, miss, eviction and size counts.
+    clear()
+        Removes all cached results and resets the counters.
+    """
+
+    def __init__(self, max_size=32):
+        """
+        Initializes an empty cache.
+
+        Parameters
+        ----------
+        max_size : int, optional
+            Maximum number of parsed results held (Default is 32).
+        """
+
+        if max_size < 1:
+            raise ValueError('max_size must be at least 1, '
+                             'got {}'.format(max_size))
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _key(result):
+        return blake2b(result.encode('utf-8'), digest_size=16).digest()
+
+    def get(self, result, parse):
+        """
+        Returns the immutable parsed result, parsing it only on a miss.
+
+        Parameters
+        ----------
+        result : str
+            Raw result returned from an Audacity command.
+        parse : callable
+            Called with result on a miss to produce the parsed JSON object.
+        """
+
+        key = self._key(result)
+        if key in self._entries:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+        self.misses += 1
+        parsed = freeze(parse(result))
+        self._entries[key] = parsed
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return parsed
+
+    def stats(self):
+        """
+        Returns a dict containing the hit, miss, eviction and size counts.
+        """
+
+        return {'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'size': len(self._entries),
+                'max_size': self.max_size}
+
+    def clear(self):
+        """
+        Removes all cached results and resets the counters.
+        """
+
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
@@ -0,0 +1,275 @@
+from audacity_scripting import LOGGER_NAME
+from hashlib import sha1
+import json
+import logging
+import os
+from os.path import expanduser, isdir, isfile, join
+import sys
+
+logger = logging.getLogger(LOGGER_NAME)
+
+# Bump when the layout of the cache file changes, so old files are ignored.
+CATALOG_FORMAT_VERSION = 1
+
+# Preferences written by Audacity on start up that identify its version.
+VERSION_PREFERENCES = ('/Version/Major', '/Version/Minor', '/Version/Micro')
+
+
+def default_cache_dir():
+    """
+    Returns the directory the command catalog is cached in, inside the user
+    cache directory of this platform. Can be overridden with the
+    AUDACITY_SCRIPTING_CACHE_DIR environment variable.
+    """
+
+    if 'AUDACITY_SCRIPTING_CACHE_DIR' in os.environ:
+        return os.environ['AUDACITY_SCRIPTING_CACHE_DIR']
+    if sys.platform == 'win32':
+        cache_root = os.environ.get('LOCALAPPDATA', expanduser('~'))
+    elif sys.platform == 'darwin':
+        cache_root = join(expanduser('~'), 'Library', 'Caches')
+    else:
+        cache_root = os.environ.get('XDG_CACHE_HOME',
+                                    join(expanduser('~'), '.cache'))
+    return join(cache_root, 'audacity_scripting')
+
+
+def default_audacity_data_dirs():
+    """
+    Returns the directories where Audacity may keep its settings and
+    plug-ins on this platform.
+    """
+
+    if sys.platform == 'win32':
+        return [join(os.environ.get('APPDATA', expanduser('~')), 'audacity')]
+    if sys.platform == 'darwin':
+        return [join(expanduser('~'), 'Library', 'Application Support',
+                     'audacity')]
+    return [join(expanduser('~'), '.audacity-data'),
+            join(expanduser('~'), '.local', 'share', 'audacity'),
+            join(expanduser('~'), '.config', 'audacity')]
+
+
+def plugin_fingerprint(data_dirs=None):
+    """
+    Returns a list describing the installed plug-ins, built from the names
+    and modification times of the files in the Audacity plug-in directories
+    and of the plug-in registry. Only the local file system is read.
+
+    Parameters
+    ----------
+    data_dirs : list, optional
+        Audacity data directories to look in. Uses
+        default_audacity_data_dirs() if the value is None (Default is None).
+    """
+
+    if data_dirs is None:
+        data_dirs = default_audacity_data_dirs()
+
+    entries = []
+    for data_dir in data_dirs:
+        registry_path = join(data_dir, 'pluginregistry.cfg')
+        if isfile(registry_path):
+            entries.append([registry_path, os.path.getmtime(registry_path)])
+        for plugin_dir_name in ('Plug-Ins', 'plug-ins'):
+            plugin_dir = join(data_dir, plugin_dir_name)
+            if not isdir(plugin_dir):
+                continue
+            for file_name in sorted(os.listdir(plugin_dir)):
+                file_path = join(plugin_dir, file_name)
+                entries.append([file_path, os.path.getmtime(file_path)])
+    return entries
+
+
+def catalog_key(version, plugins):
+    """
+    Returns the key identifying a command catalog.
+
+    Parameters
+    ----------
+    version : str
+        Audacity version string.
+    plugins : list
+        Installed plug-ins, as returned by plugin_fingerprint().
+    """
+
+    key_source = json.dumps([CATALOG_FORMAT_VERSION, version, plugins])
+    return sha1(key_source.encode('utf-8')).hexdigest()
+
+
+class CommandCatalog(object):
+    """
+    The scripting ids and parameter signatures available in Audacity,
+    derived from the Commands and Menus info.
+
+    Attributes
+    ----------
+    key : str
+        Key identifying the Audacity version and plug-ins the catalog was
+        built for.
+    scripting_ids : frozenset
+        Unique scripting ids from the Commands and Menus info.
+    signatures : dict
+        Maps each lower case scripting id from the Commands info to a dict
+        with the 'id' of the command and its 'params', which maps each
+        parameter name to a dict with its 'type' and, for enums, its 'enum'
+        values.
+
+    Methods
+    -------
+    from_info(key, commands_info, menus_info)
+        Builds a catalog from iterables over the Commands and Menus info.
+    from_dict(catalog_dict)
+        Builds a catalog from the dict stored in the cache file.
+    to_dict()
+        Returns a dict that can be stored in the cache file.
+    """
+
+    def __init__(self, key, scripting_ids, signatures):
+        self.key = key
+        self.scripting_ids = frozenset(scripting_ids)
+        self.signatures = signatures
+
+    @classmethod
+    def from_info(cls, key, commands_info, menus_info):
+        """
+        Builds a catalog from iterables over the Commands and Menus info.
+        Each item is used as it arrives, so streamed info is never held in
+        memory as a whole.
+
+        Parameters
+        ----------
+        key : str
+            Key identifying the Audacity version and plug-ins.
+        commands_info : iterable
+            Items of the Commands info.
+        menus_info : iterable
+            Items of the Menus info.
+        """
+
+        scripting_ids = set()
+        signatures = {}
+        for command_info in commands_info:
+            scripting_ids.add(command_info['id'])
+            params = {}
+            for param_info in command_info.get('params', ()):
+                param = {'type': param_info['type']}
+                if 'enum' in param_info:
+                    param['enum'] = list(param_info['enum'])
+                params[param_info['key']] = param
+            signatures[command_info['id'].lower()] = {
+                'id': command_info['id'], 'params': params}
+
+        for menu_info in menus_info:
+            if 'id' in menu_info.keys():
+                scripting_ids.add(menu_info['id'])
+
+        scripting_ids = [scripting_id for scripting_id in scripting_ids
+                         if '\\' not in scripting_id]
+        return cls(key, scripting_ids, signatures)
+
+    @classmethod
+    def from_dict(cls, catalog_dict):
+        """
+        Builds a catalog from the dict stored in the cache file.
+
+        Parameters
+        ----------
+        catalog_dict : dict
+            Dict returned by to_dict().
+        """
+
+        return cls(catalog_dict['key'], catalog_dict['scripting_ids'],
+                   catalog_dict['signatures'])
+
+    def to_dict(self):
+        """
+        Returns a dict that can be stored in the cache file.
+        """
+
+        return {'format_version': CATALOG_FORMAT_VERSION, 'key': self.key,
+                'scripting_ids': sorted(self.scripting_ids),
+                'signatures': self.signatures}
+
+
+class CatalogDiskCache(object):
+    """
+    Stores command catalogs on disk, one file per catalog key, so a new
+    process can reuse the catalog without fetching the Commands and Menus
+    info.
+
+    Attributes
+    ----------
+    cache_dir : str
+        Directory the catalog files are stored in.
+
+    Methods
+    -------
+    load(key)
+        Returns the cached catalog for the key, or None.
+    save(catalog)
+        Writes the catalog to disk and removes catalogs for other keys.
+    """
+
+    def __init__(self, cache_dir=None):
+        """
+        Parameters
+        ----------
+        cache_dir : str, optional
+            Directory the catalog files are stored in. Uses
+            default_cache_dir() if the value is None (Default is None).
+        """
+
+        self.cache_dir = cache_dir or default_cache_dir()
+
+    def _path(self, key):
+        return join(self.cache_dir, 'catalog_{}.json'.format(key))
+
+    def load(self, key):
+        """
+        Returns the cached catalog for the key, or None if there is no
+        readable catalog for it.
+
+        Parameters
+        ----------
+        key : str
+            Key returned by catalog_key().
+        """
+
+        path = self._path(key)
+        if not isfile(path):
+            return None
+        try:
+            with open(path, 'r') as catalog_file:
+                catalog_dict = json.load(catalog_file)
+        except (IOError, ValueError) as err:
+            logger.info('Ignoring unreadable catalog cache: {}'.format(err))
+            return None
+        if (catalog_dict.get('format_version') != CATALOG_FORMAT_VERSION or
+                catalog_dict.get('key') != key):
+            return None
+        return CommandCatalog.from_dict(catalog_dict)
+
+    def save(self, catalog):
+        """
+        Writes the catalog to disk and removes catalogs for other keys.
+
+        Parameters
+        ----------
+        catalog : CommandCatalog
+            Catalog to be stored.
+        """
+
+        if not isdir(self.cache_dir):
+            os.makedirs(self.cache_dir)
+        path = self._path(catalog.key)
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w') as catalog_file:
+            json.dump(catalog.to_dict(), catalog_file)
+        os.replace(temp_path, path)
+
+        for file_name in os.listdir(self.cache_dir):
+            file_path = join(self.cache_dir, file_name)
+            if (file_name.startswith('catalog_') and
+                    file_name.endswith('.json') and file_path != path):
+                os.remove(file_path)
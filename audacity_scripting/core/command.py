@@ -0,0 +1,86 @@
+from collections import namedtuple
+import re
+
+# Matches one Key=Value parameter, where the value may be double quoted.
+_PARAM_RE = re.compile(r'\s*([^\s=]+)=("(?:[^"\\]|\\.)*"|\S*)')
+
+ParsedCommand = namedtuple('ParsedCommand', ['scripting_id', 'params'])
+ParsedCommand.__doc__ = """
+A command string split into its scripting id and parameters.
+
+Attributes
+----------
+scripting_id : str
+    Scripting id of the command, e.g. 'SelectTracks'.
+params : dict
+    Maps each parameter name to its unquoted value string.
+"""
+
+
+class CommandSyntaxError(Exception):
+    """
+    An exception that is raised if a command string cannot be parsed.
+    """
+    pass
+
+
+def parse_command(command):
+    """
+    Splits a command string into its scripting id and parameters.
+
+    Parameters
+    ----------
+    command : str
+        Command to be sent to Audacity, e.g.
+        'SelectTracks: Mode=Set Track=0'.
+
+    Raises
+    ------
+    CommandSyntaxError
+        If the command is missing the ':' after the scripting id or a
+        parameter is not of the form Key=Value.
+    """
+
+    scripting_id, separator, param_string = command.partition(':')
+    scripting_id = scripting_id.strip()
+    if not separator or not scripting_id or ' ' in scripting_id:
+        raise CommandSyntaxError('Command is missing \':\' after the '
+                                 'scripting id: {!r}'.format(command))
+
+    params = {}
+    position = 0
+    param_string = param_string.rstrip()
+    while position < len(param_string):
+        match = _PARAM_RE.match(param_string, position)
+        if match is None:
+            raise CommandSyntaxError('Could not parse the parameters of '
+                                     '{!r} at {!r}'.format(
+                                         command, param_string[position:]))
+        value = match.group(2)
+        if len(value) >= 2 and value[0] == '"' and value[-1] == '"':
+            value = value[1:-1]
+        params[match.group(1)] = value
+        position = match.end()
+    return ParsedCommand(scripting_id, params)
+
+
+def format_command(scripting_id, params=None):
+    """
+    Returns a command string built from a scripting id and parameters.
+    Values containing spaces are double quoted.
+
+    Parameters
+    ----------
+    scripting_id : str
+        Scripting id of the command, e.g. 'Normalize'.
+    params : dict, optional
+        Maps each parameter name to its value (Default is None).
+    """
+
+    command = '{}:'.format(scripting_id)
+    for key, value in (params or {}).items():
+        value = str(value)
+        if value == '' or any(char.isspace() for char in value):
+            value = '"{}"'.format(value)
+        command += ' {}={}'.format(key, value)
+    return command
@@ -0,0 +1,163 @@
+from collections import namedtuple
+
+DiffEntry = namedtuple('DiffEntry', ['key', 'index', 'before', 'after'])
+DiffEntry.__doc__ = """
+An item that was added, removed or changed between two GetInfo results.
+
+Attributes
+----------
+key : tuple
+    Key identifying the item in both results.
+index : int
+    Position of the item in the after result, or in the before result if
+    the item was removed.
+before : object
+    The item in the before result, or None if the item was added.
+after : object
+    The item in the after result, or None if the item was removed.
+"""
+
+
+class SnapshotDiff(namedtuple('SnapshotDiff',
+                              ['added', 'removed', 'changed'])):
+    """
+    The differences between two GetInfo results of the same type.
+
+    Attributes
+    ----------
+    added : list
+        DiffEntry for each item only present in the after result.
+    removed : list
+        DiffEntry for each item only present in the before result.
+    changed : list
+        DiffEntry for each item present in both results with different
+        values.
+    """
+
+    __slots__ = ()
+
+    def is_empty(self):
+        """
+        Returns True if there are no differences.
+        """
+
+        return not (self.added or self.removed or self.changed)
+
+
+def _occurrence_keys(items, base_key):
+    counts = {}
+    for item in items:
+        key = base_key(item)
+        occurrence = counts.get(key, 0)
+        counts[key] = occurrence + 1
+        yield key + (occurrence,)
+
+
+def _track_items(tracks_info):
+    keys = _occurrence_keys(tracks_info, lambda track: (track['name'],))
+    return [(key, index, track)
+            for (index, track), key in zip(enumerate(tracks_info), keys)]
+
+
+def _clip_items(clips_info):
+    keys = _occurrence_keys(clips_info,
+                            lambda clip: (clip['track'], clip['start']))
+    return [(key, index, clip)
+            for (index, clip), key in zip(enumerate(clips_info), keys)]
+
+
+def _envelope_items(envelopes_info):
+    return [((envelope['track'], envelope['clip']), index, envelope)
+            for index, envelope in enumerate(envelopes_info)]
+
+
+def _label_items(labels_info):
+    items = []
+    for label_track_num, labels in labels_info:
+        keys = _occurrence_keys(labels,
+                                lambda label: (label_track_num, label[0]))
+        for (index, label), key in zip(enumerate(labels), keys):
+            items.append((key, index, label))
+    return items
+
+
+# Maps each GetInfo type to a function returning (key, index, item) tuples,
+# and the item fields that are ignored when comparing items.
+_DIFF_TYPES = {
+    'Tracks': (_track_items, ('focused', 'selected')),
+    'Clips': (_clip_items, ()),
+    'Envelopes': (_envelope_items, ()),
+    'Labels': (_label_items, ()),
+}
+
+
+def _strip(item, ignored_fields):
+    if not ignored_fields or not hasattr(item, 'items'):
+        return item
+    return {key: value for key, value in item.items()
+            if key not in ignored_fields}
+
+
+def diff_info(info_type, before, after):
+    """
+    Returns a SnapshotDiff between two GetInfo results of the same type.
+    Items are matched by key rather than by position, so the diff runs in
+    linear time and an inserted track does not mark every later track as
+    changed.
+
+    Tracks are keyed by name, clips by track and start time, envelopes by
+    track and clip, and labels by label track and start time. Tracks, clips
+    and labels also have the occurrence of their key in the key, so items
+    that share one are not lost.
+
+    Parameters
+    ----------
+    info_type : str
+        One of 'Tracks', 'Clips', 'Envelopes' or 'Labels'.
+    before : list
+        GetInfo result taken before the change.
+    after : list
+        GetInfo result taken after the change.
+    """
+
+    if info_type not in _DIFF_TYPES:
+        raise ValueError('Cannot diff GetInfo type {!r}, expected one '
+                         'of {}'.format(info_type, sorted(_DIFF_TYPES)))
+    get_items, ignored_fields = _DIFF_TYPES[info_type]
+
+    before_index = {}
+    for key, index, item in get_items(before):
+        before_index[key] = (index, item)
+
+    added = []
+    changed = []
+    for key, index, item in get_items(after):
+        previous = before_index.pop(key, None)
+        if previous is None:
+            added.append(DiffEntry(key, index, None, item))
+        elif (_strip(previous[1], ignored_fields) !=
+                _strip(item, ignored_fields)):
+            changed.append(DiffEntry(key, index, previous[1], item))
+
+    removed = [DiffEntry(key, index, item, None)
+               for key, (index, item) in before_index.items()]
+    return SnapshotDiff(added, removed, changed)
+
+
+def diff_snapshots(before, after):
+    """
+    Returns a dict mapping each GetInfo type present in both snapshots to the
+    SnapshotDiff between them.
+
+    Parameters
+    ----------
+    before : dict
+        Maps GetInfo types to the results taken before the change, as
+        returned by AudacityScriptingUtils.get_snapshot().
+    after : dict
+        Maps GetInfo types to the results taken after the change.
+    """
+
+    return {info_type: diff_info(info_type, before[info_type],
+                                 after[info_type])
+            for info_type in before if info_type in after}
@@ -0,0 +1,126 @@
+from collections import namedtuple
+import os
+from os.path import abspath, dirname, exists, getmtime, isdir, splitext
+import re
+
+# Template used to name the file of each exported region. The fields are the
+# track name, the position of the region in the track starting at 1, and the
+# start and end times of the region.
+DEFAULT_EXPORT_TEMPLATE = '{track}_{index:03d}.wav'
+
+# File extensions Audacity picks an export format from.
+EXPORT_EXTENSIONS = frozenset(['.wav', '.aif', '.aiff', '.flac', '.mp3',
+                               '.ogg', '.m4a', '.opus', '.wv'])
+
+_UNSAFE_NAME_CHARS_RE = re.compile(r'[\\/:*?"<>|]')
+
+
+ExportSummary = namedtuple('ExportSummary', ['exported', 'skipped',
+                                             'seconds', 'regions_per_second'])
+ExportSummary.__doc__ = """
+The outcome of exporting regions to files.
+
+Attributes
+----------
+exported : list
+    Paths of the files that were exported.
+skipped : list
+    Paths of the files that were already up to date.
+seconds : float
+    Time taken to send the export commands, or None if they were deferred
+    to a plan that has not been sent.
+regions_per_second : float
+    Number of regions exported per second, 0 if none were exported, or None
+    if the commands were deferred.
+"""
+
+
+class ExportPathError(Exception):
+    """
+    An exception that is raised if an export path is checked and cannot be
+    written by Audacity.
+    """
+    pass
+
+
+def export_path(filename_template, track_name, index, start, end):
+    """
+    Returns the absolute path of the file to export one region to. Audacity
+    resolves relative paths against its own working directory, so the path
+    is made absolute here.
+
+    Parameters
+    ----------
+    filename_template : str
+        str.format() template with the fields track, index, start and end.
+    track_name : str
+        Name of the track, with characters that are not allowed in file
+        names replaced by '_'.
+    index : int
+        Position of the region in the track, starting at 1.
+    start : float
+        Start time of the region in seconds.
+    end : float
+        End time of the region in seconds.
+    """
+
+    return abspath(filename_template.format(
+        track=_UNSAFE_NAME_CHARS_RE.sub('_', track_name), index=index,
+        start=start, end=end))
+
+
+def check_export_paths(paths):
+    """
+    Checks that Audacity can write every path before any region is
+    exported.
+
+    Parameters
+    ----------
+    paths : list
+        Absolute paths of the files to export.
+
+    Raises
+    ------
+    ExportPathError
+        If two regions share a path, a path contains a double quote, its
+        extension is not an export format, or its directory does not exist
+        or cannot be written.
+    """
+
+    seen = set()
+    for path in paths:
+        if path in seen:
+            raise ExportPathError('More than one region is exported to '
+                                  '{}'.format(path))
+        seen.add(path)
+        if '"' in path:
+            raise ExportPathError('Export path {} contains a double '
+                                  'quote'.format(path))
+        if splitext(path)[1].lower() not in EXPORT_EXTENSIONS:
+            raise ExportPathError('Export path {} does not end with an '
+                                  'export format extension'.format(path))
+        directory = dirname(path)
+        if not isdir(directory):
+            raise ExportPathError('Export directory {} does not '
+                                  'exist'.format(directory))
+        if not os.access(directory, os.W_OK):
+            raise ExportPathError('Export directory {} cannot be '
+                                  'written'.format(directory))
+
+
+def is_up_to_date(path, project_path):
+    """
+    Returns True if the file exists and is newer than the project file.
+
+    Parameters
+    ----------
+    path : str
+        Path of the exported file.
+    project_path : str
+        Path of the saved Audacity project, or None if it is not known, in
+        which case no file is up to date.
+    """
+
+    if project_path is None or not exists(path):
+        return False
+    return getmtime(path) > getmtime(project_path)
@@ -0,0 +1,151 @@
+# GetInfo types that describe the project and can be changed by commands.
+PROJECT_INFO_TYPES = ('Tracks', 'Clips', 'Envelopes', 'Labels', 'Boxes')
+
+# Maps lower case scripting ids to the GetInfo types they can change. Commands
+# that are not listed here invalidate every type in PROJECT_INFO_TYPES.
+# Selection commands are listed as changing nothing, so the 'selected' and
+# 'focused' fields of a cached Tracks result may be out of date.
+INVALIDATED_INFO = {
+    'getinfo': (),
+    'getpreference': (),
+    'message': (),
+    'help': (),
+    'select': (),
+    'selecttime': (),
+    'selecttracks': (),
+    'selectfrequencies': (),
+    'selectall': (),
+    'selectnone': (),
+    'selalltracks': (),
+    'settrackaudio': ('Tracks',),
+    'settrackstatus': ('Tracks', 'Boxes'),
+    'settrackvisuals': ('Tracks', 'Boxes'),
+    'settrack': ('Tracks', 'Boxes'),
+    'setclip': ('Clips',),
+    'setenvelope': ('Envelopes',),
+    'setlabel': ('Labels',),
+    'split': ('Clips', 'Envelopes'),
+    'splitlabels': ('Clips', 'Envelopes'),
+    'join': ('Clips', 'Envelopes'),
+    'joinlabels': ('Clips', 'Envelopes'),
+    'disjoin': ('Clips', 'Envelopes'),
+    'disjoinlabels': ('Clips', 'Envelopes'),
+    'amplify': (),
+    'bassandtreble': (),
+    'compressor': (),
+    'limiter': (),
+    'noisereduction': (),
+    'normalize': (),
+    'setpreference': ('Preferences',),
+    'export2': (),
+}
+
+
+class InfoCache(object):
+    """
+    A per-connection cache of GetInfo results that is invalidated selectively
+    by the commands sent to Audacity.
+
+    Attributes
+    ----------
+    hits : int
+        Number of lookups answered from the cache.
+    misses : int
+        Number of lookups for results that were not cached.
+
+    Methods
+    -------
+    get(info_type)
+        Returns the cached result for the GetInfo type, or None.
+    put(info_type, info)
+        Stores the result for the GetInfo type.
+    invalidate(info_types=None)
+        Removes the cached results for the GetInfo types.
+    command_sent(parsed_command)
+        Invalidates the GetInfo types that the command can change.
+    command_failed(parsed_command)
+        Invalidates the GetInfo types that the failed command can change.
+    """
+
+    def __init__(self):
+        """
+        Initializes an empty cache.
+        """
+
+        self._results = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, info_type):
+        """
+        Returns the cached result for the GetInfo type, or None.
+
+        Parameters
+        ----------
+        info_type : str
+            Value passed to the Type parameter of the GetInfo command.
+        """
+
+        info = self._results.get(info_type)
+        if info is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return info
+
+    def put(self, info_type, info):
+        """
+        Stores the result for the GetInfo type.
+
+        Parameters
+        ----------
+        info_type : str
+            Value passed to the Type parameter of the GetInfo command.
+        info : object
+            Immutable result of the GetInfo command.
+        """
+
+        self._results[info_type] = info
+
+    def invalidate(self, info_types=None):
+        """
+        Removes the cached results for the GetInfo types.
+
+        Parameters
+        ----------
+        info_types : tuple, optional
+            The GetInfo types to remove. All results are removed if the value
+            is None (Default is None).
+        """
+
+        if info_types is None:
+            self._results.clear()
+            return
+        for info_type in info_types:
+            self._results.pop(info_type, None)
+
+    def command_sent(self, parsed_command):
+        """
+        Invalidates the GetInfo types that the command can change.
+
+        Parameters
+        ----------
+        parsed_command : ParsedCommand
+            The command that was sent to Audacity.
+        """
+
+        self.invalidate(INVALIDATED_INFO.get(
+            parsed_command.scripting_id.lower(), PROJECT_INFO_TYPES))
+
+    def command_failed(self, parsed_command):
+        """
+        Invalidates the GetInfo types that a command that failed can change,
+        since it may have been partly applied.
+
+        Parameters
+        ----------
+        parsed_command : ParsedCommand
+            The command that failed.
+        """
+
+        self.command_sent(parsed_command)
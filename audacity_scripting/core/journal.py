@@ -0,0 +1,152 @@
+from audacity_scripting import LOGGER_NAME
+import json
+import logging
+import os
+from os.path import exists
+
+logger = logging.getLogger(LOGGER_NAME)
+
+
+class JobJournal(object):
+    """
+    A checkpoint journal of the steps of a long running region job. Each
+    completed step, one effect command applied to one region of one track,
+    is appended to a JSON lines file as soon as Audacity confirms it, so a
+    job that is run again after a failure only sends the remaining steps.
+
+    Tracks are recorded by name, since track numbers change as tracks are
+    added. Effects leave no trace in the GetInfo results, so the journal
+    can only check that the recorded regions still exist in the project;
+    if Audacity lost unsaved changes, the journal should be cleared. A
+    journal can be shared by several jobs, and each job only checks the
+    steps of its own tracks and effect commands.
+
+    Attributes
+    ----------
+    path : str
+        Path of the journal file.
+
+    Methods
+    -------
+    is_done(track_name, start, end, command)
+        Returns True if the step has been recorded as completed.
+    record(steps)
+        Appends completed steps to the journal.
+    verify(steps)
+        Forgets the steps of a job whose region is not in the project any
+        more.
+    clear()
+        Forgets every step and removes the journal file.
+    """
+
+    def __init__(self, path):
+        """
+        Loads the steps already recorded in the journal file, if it exists.
+
+        Parameters
+        ----------
+        path : str
+            Path of the journal file.
+        """
+
+        self.path = path
+        self._done = set()
+        if exists(path):
+            with open(path) as journal_file:
+                for line_num, line in enumerate(journal_file, 1):
+                    try:
+                        entry = json.loads(line)
+                        self._done.add((entry['track'], entry['start'],
+                                        entry['end'], entry['command']))
+                    except (ValueError, KeyError, TypeError):
+                        # A crash can leave the last line partly written.
+                        logger.info('Ignoring line {} of journal {}'.format(
+                            line_num, path))
+
+    def __len__(self):
+        return len(self._done)
+
+    def is_done(self, track_name, start, end, command):
+        """
+        Returns True if the step has been recorded as completed.
+
+        Parameters
+        ----------
+        track_name : str
+            Name of the track.
+        start : float
+            Start time of the region.
+        end : float
+            End time of the region.
+        command : str
+            Effect command applied to the region.
+        """
+
+        return (track_name, start, end, command) in self._done
+
+    def record(self, steps):
+        """
+        Appends completed steps to the journal file and flushes it to disk.
+
+        Parameters
+        ----------
+        steps : list
+            (track_name, start, end, command) tuples.
+        """
+
+        new_steps = [step for step in steps if step not in self._done]
+        if not new_steps:
+            return
+        with open(self.path, 'a') as journal_file:
+            for track_name, start, end, command in new_steps:
+                journal_file.write(json.dumps(
+                    {'track': track_name, 'start': start, 'end': end,
+                     'command': command}) + '\n')
+            journal_file.flush()
+            os.fsync(journal_file.fileno())
+        self._done.update(new_steps)
+
+    def verify(self, steps):
+        """
+        Forgets the recorded steps of a job whose region is not in the
+        project any more, e.g. because a label was moved, so those regions
+        are processed again. Only steps with one of the job's tracks and
+        one of its effect commands are checked, so the steps of other jobs
+        sharing the journal are kept. Returns the number of steps forgotten.
+
+        Parameters
+        ----------
+        steps : set
+            (track_name, start, end, command) tuples of every step of the
+            job in the project as it is now.
+        """
+
+        track_names = {step[0] for step in steps}
+        commands = {step[3] for step in steps}
+        stale = {step for step in self._done
+                 if step[0] in track_names and step[3] in commands and
+                 step not in steps}
+        if stale:
+            logger.info('Forgetting {} journal steps whose regions are not '
+                        'in the project'.format(len(stale)))
+            self._done -= stale
+            self._rewrite()
+        return len(stale)
+
+    def clear(self):
+        """
+        Forgets every step and removes the journal file.
+        """
+
+        self._done = set()
+        if exists(self.path):
+            os.remove(self.path)
+
+    def _rewrite(self):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as journal_file:
+            for track_name, start, end, command in sorted(self._done):
+                journal_file.write(json.dumps(
+                    {'track': track_name, 'start': start, 'end': end,
+                     'command': command}) + '\n')
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,60 @@
+# Seconds assumed for a command before any latency has been measured.
+DEFAULT_LATENCY = 0.05
+
+
+class LatencyStats(object):
+    """
+    Running mean of the measured round trip time of each scripting id, used
+    to predict how long a plan of commands will take.
+
+    Methods
+    -------
+    record(scripting_id, seconds)
+        Records one measured round trip.
+    estimate(scripting_id)
+        Returns the predicted round trip time of a command.
+    """
+
+    def __init__(self):
+        """
+        Initializes the stats with no measurements.
+        """
+
+        self._totals = {}
+        self._counts = {}
+
+    def record(self, scripting_id, seconds):
+        """
+        Records one measured round trip.
+
+        Parameters
+        ----------
+        scripting_id : str
+            Scripting id of the command.
+        seconds : float
+            Time from writing the command to reading its result.
+        """
+
+        key = scripting_id.lower()
+        self._totals[key] = self._totals.get(key, 0.0) + seconds
+        self._counts[key] = self._counts.get(key, 0) + 1
+
+    def estimate(self, scripting_id):
+        """
+        Returns the predicted round trip time of a command in seconds: the
+        mean for its scripting id if it has been measured, otherwise the mean
+        of every measurement, otherwise DEFAULT_LATENCY.
+
+        Parameters
+        ----------
+        scripting_id : str
+            Scripting id of the command.
+        """
+
+        key = scripting_id.lower()
+        if key in self._counts:
+            return self._totals[key] / self._counts[key]
+        count = sum(self._counts.values())
+        if count:
+            return sum(self._totals.values()) / count
+        return DEFAULT_LATENCY
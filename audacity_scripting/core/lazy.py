@@ -0,0 +1,139 @@
+from audacity_scripting.core.cache import freeze
+from bisect import bisect_right
+from collections.abc import Sequence
+import json
+import re
+
+# Matches a complete JSON string or a single structural character, so that a
+# scan can skip over string contents without inspecting each character.
+_TOKEN_RE = re.compile(r'"(?:[^"\\]|\\.)*"|[\[\]{},]')
+
+
+class LazyInfo(Sequence):
+    """
+    A read-only sequence over the raw JSON array returned by the GetInfo
+    command. The offsets of the top level elements are recorded in a single
+    scan, and each element is only parsed when it is first accessed. Parsed
+    elements are immutable, as returned by get_info.
+
+    Attributes
+    ----------
+    text : str
+        Raw JSON text of the array.
+
+    Methods
+    -------
+    parsed_count()
+        Returns the number of elements that have been parsed so far.
+    find(key, value)
+        Returns the first element whose key has the given value, parsing
+        only the candidate elements.
+    """
+
+    def __init__(self, text):
+        """
+        Scans the text and records the offsets of the top level elements.
+
+        Parameters
+        ----------
+        text : str
+            Raw JSON text of an array, with backslashes already escaped.
+
+        Raises
+        ------
+        ValueError
+            If the text is not a complete JSON array.
+        """
+
+        self.text = text
+        self._starts = []
+        self._ends = []
+        self._scan()
+        self._elements = [None] * len(self._starts)
+
+    def _scan(self):
+        depth = 0
+        element_start = None
+        for match in _TOKEN_RE.finditer(self.text):
+            token = match.group()
+            if token[0] == '"':
+                if depth == 1 and element_start is None:
+                    element_start = match.start()
+                continue
+            if token in '[{':
+                depth += 1
+                if depth == 1:
+                    if token != '[':
+                        raise ValueError('Text is not a JSON array')
+                    array_start = match.end()
+                    element_start = None
+                elif depth == 2 and element_start is None:
+                    element_start = match.start()
+            elif token in ']}':
+                depth -= 1
+                if depth == 0:
+                    self._close_element(element_start, match.start(),
+                                        array_start)
+                    return
+            elif depth == 1:
+                self._close_element(element_start, match.start(),
+                                    array_start)
+                element_start = None
+                array_start = match.end()
+        raise ValueError('Text is not a complete JSON array')
+
+    def _close_element(self, element_start, end, array_start):
+        # Scalars are not matched by the token pattern, so fall back to the
+        # text after the previous separator.
+        start = array_start if element_start is None else element_start
+        if self.text[start:end].strip():
+            self._starts.append(start)
+            self._ends.append(end)
+
+    def __len__(self):
+        return len(self._starts)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('LazyInfo index out of range')
+        element = self._elements[index]
+        if element is None:
+            raw = self.text[self._starts[index]:self._ends[index]]
+            element = freeze(json.loads(raw))
+            self._elements[index] = element
+        return element
+
+    def parsed_count(self):
+        """
+        Returns the number of elements that have been parsed so far.
+        """
+
+        return sum(element is not None for element in self._elements)
+
+    def find(self, key, value):
+        """
+        Returns the first element whose key has the given value, parsing
+        only the candidate elements. Returns None if there is no match.
+
+        Parameters
+        ----------
+        key : str
+            Key to match in each top level object.
+        value : object
+            Value the key must have.
+        """
+
+        pattern = re.compile(r'"{}"\s*:\s*{}'.format(
+            re.escape(key), re.escape(json.dumps(value))))
+        for match in pattern.finditer(self.text):
+            index = bisect_right(self._starts, match.start()) - 1
+            if index < 0 or match.start() >= self._ends[index]:
+                continue
+            element = self[index]
+            if hasattr(element, 'get') and element.get(key) == value:
+                return element
+        return None
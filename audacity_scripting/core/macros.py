@@ -0,0 +1,128 @@
+from audacity_scripting import LOGGER_NAME
+from audacity_scripting.core.catalog import default_audacity_data_dirs
+from audacity_scripting.core.command import CommandSyntaxError, parse_command
+import logging
+import os
+from os.path import isdir, join
+import re
+
+logger = logging.getLogger(LOGGER_NAME)
+
+# Prefix of the scripting id Audacity gives each macro in the Macros menu.
+MACRO_ID_PREFIX = 'Macro_'
+
+# Lower case scripting ids whose results would be lost inside a macro.
+MACRO_UNSAFE_IDS = frozenset(['getinfo', 'getpreference', 'message', 'help'])
+
+_MACRO_NAME_RE = re.compile(r'^[A-Za-z0-9_-]+$')
+
+
+class MacroCompileError(Exception):
+    """
+    An exception that is raised if a workflow cannot be expressed as an
+    Audacity macro.
+    """
+    pass
+
+
+def default_macros_dir(data_dirs=None):
+    """
+    Returns the Macros directory inside the first Audacity data directory
+    that exists, or None if there is none.
+
+    Parameters
+    ----------
+    data_dirs : list, optional
+        Audacity data directories to look in. Uses
+        default_audacity_data_dirs() if the value is None (Default is None).
+    """
+
+    if data_dirs is None:
+        data_dirs = default_audacity_data_dirs()
+    for data_dir in data_dirs:
+        if isdir(data_dir):
+            return join(data_dir, 'Macros')
+    return None
+
+
+def macro_command(macro_name):
+    """
+    Returns the command that runs a macro.
+
+    Parameters
+    ----------
+    macro_name : str
+        Name of the macro, without the .txt extension.
+    """
+
+    return '{}{}:'.format(MACRO_ID_PREFIX, macro_name)
+
+
+def compile_macro(command_list):
+    """
+    Returns the text of a macro file that runs the commands in order.
+
+    Parameters
+    ----------
+    command_list : list
+        Commands in the scripting syntax, which macros share.
+
+    Raises
+    ------
+    MacroCompileError
+        If a command spans more than one line, cannot be parsed, or needs
+        its result to be read.
+    """
+
+    for command in command_list:
+        if '\n' in command or '\r' in command:
+            raise MacroCompileError('Command spans more than one line: '
+                                    '{!r}'.format(command))
+        try:
+            scripting_id = parse_command(command).scripting_id
+        except CommandSyntaxError as err:
+            raise MacroCompileError(str(err))
+        if scripting_id.lower() in MACRO_UNSAFE_IDS:
+            raise MacroCompileError('The result of {} cannot be read inside '
+                                    'a macro'.format(scripting_id))
+    return ''.join(command + '\n' for command in command_list)
+
+
+def write_macro(macro_name, macro_text, macros_dir=None):
+    """
+    Writes a macro file and returns its path. The file is written to a
+    temporary file first and then renamed, so Audacity never reads a partly
+    written macro.
+
+    Parameters
+    ----------
+    macro_name : str
+        Name of the macro. Only letters, digits, '_' and '-' are allowed.
+    macro_text : str
+        Text of the macro file, as returned by compile_macro().
+    macros_dir : str, optional
+        Directory to write to. Uses default_macros_dir() if the value is
+        None (Default is None).
+
+    Raises
+    ------
+    MacroCompileError
+        If the name is not allowed or there is no Macros directory.
+    """
+
+    if not _MACRO_NAME_RE.match(macro_name):
+        raise MacroCompileError('Macro name {!r} is not allowed'.format(
+            macro_name))
+    if macros_dir is None:
+        macros_dir = default_macros_dir()
+    if macros_dir is None:
+        raise MacroCompileError('No Audacity data directory was found')
+
+    os.makedirs(macros_dir, exist_ok=True)
+    macro_path = join(macros_dir, macro_name + '.txt')
+    tmp_path = macro_path + '.tmp'
+    with open(tmp_path, 'w') as macro_file:
+        macro_file.write(macro_text)
+    os.replace(tmp_path, macro_path)
+    logger.info('Wrote macro {}'.format(macro_path))
+    return macro_path
@@ -0,0 +1,348 @@
+from audacity_scripting import LOGGER_NAME
+from audacity_scripting.core.diff import diff_info
+from audacity_scripting.core.info_cache import (INVALIDATED_INFO,
+                                                PROJECT_INFO_TYPES)
+from audacity_scripting.core.tracks import MIX_TRACK_NAME
+import logging
+from math import isclose, log10
+
+logger = logging.getLogger(LOGGER_NAME)
+
+# GetInfo types mirrored by the project model.
+MODEL_INFO_TYPES = ('Tracks', 'Clips', 'Envelopes', 'Labels')
+
+# Relative tolerance used when comparing mirrored numbers with Audacity,
+# which rounds the numbers in the GetInfo results.
+RECONCILE_REL_TOL = 1e-4
+
+
+def _approx_equal(first, second):
+    if isinstance(first, float) or isinstance(second, float):
+        if (isinstance(first, (int, float)) and
+                isinstance(second, (int, float))):
+            return isclose(first, second, rel_tol=RECONCILE_REL_TOL,
+                           abs_tol=RECONCILE_REL_TOL)
+        return False
+    if isinstance(first, dict) and isinstance(second, dict):
+        return (first.keys() == second.keys() and
+                all(_approx_equal(first[key], second[key]) for key in first))
+    if isinstance(first, list) and isinstance(second, list):
+        return (len(first) == len(second) and
+                all(_approx_equal(a, b) for a, b in zip(first, second)))
+    return first == second
+
+
+class ProjectModel(object):
+    """
+    An in-memory mirror of the tracks, clips, envelopes and labels in the
+    project. It is loaded once and then kept up to date by applying the
+    known effects of the commands that are sent, so queries are answered
+    without a round trip. GetInfo types that a command changes in a way
+    that is not modelled are marked as stale and fetched again on the next
+    query.
+
+    Attributes
+    ----------
+    info : dict
+        Maps each GetInfo type in MODEL_INFO_TYPES to the mirrored result.
+    reconcile_every : int
+        Number of commands after which the next query reconciles the model
+        with Audacity, or None to only reconcile when asked.
+    commands_applied : int
+        Number of commands applied since the last reconciliation.
+
+    Methods
+    -------
+    load()
+        Loads every mirrored GetInfo type from Audacity.
+    reconcile()
+        Compares the model with fresh GetInfo results, replaces it with
+        them, and returns the differences that were found.
+    get(info_type)
+        Returns the mirrored result for a GetInfo type.
+    get_track_gain(track_name)
+        Returns the gain in dB of a track.
+    get_project_end()
+        Returns the end time of the last wave track.
+    known_time_span()
+        Returns the times SelectAll selects, if they are known locally.
+    command_sent(parsed_command)
+        Applies the known effects of a command that was sent to Audacity.
+    command_failed(parsed_command)
+        Marks the GetInfo types the failed command could change as stale.
+    """
+
+    def __init__(self, command_runner, reconcile_every=None):
+        """
+        Parameters
+        ----------
+        command_runner : AudacityScriptingUtils
+            Used to fetch the GetInfo results and to read the selection.
+        reconcile_every : int, optional
+            Number of commands after which the next query reconciles the
+            model with Audacity. Only reconciles when asked if the value is
+            None (Default is None).
+        """
+
+        self._command_runner = command_runner
+        self.reconcile_every = reconcile_every
+        self.info = {}
+        self.commands_applied = 0
+        self._stale_info_types = set(MODEL_INFO_TYPES)
+
+    def _fetch(self, info_type):
+        self._command_runner.info_cache.invalidate([info_type])
+        return self._command_runner.get_json(
+            self._command_runner.run_command(
+                'GetInfo: Type={}'.format(info_type)))
+
+    def load(self):
+        """
+        Loads every mirrored GetInfo type from Audacity.
+        """
+
+        for info_type in MODEL_INFO_TYPES:
+            self.info[info_type] = self._fetch(info_type)
+        self._stale_info_types.clear()
+        self.commands_applied = 0
+
+    def reconcile(self):
+        """
+        Compares the model with fresh GetInfo results, replaces it with them,
+        and returns a dict mapping each GetInfo type whose mirror had drifted
+        to its SnapshotDiff. Stale types are fetched without being compared.
+        """
+
+        drift = {}
+        for info_type in MODEL_INFO_TYPES:
+            fresh_info = self._fetch(info_type)
+            if (info_type in self.info and
+                    info_type not in self._stale_info_types):
+                info_diff = diff_info(info_type, self.info[info_type],
+                                      fresh_info)
+                changed = [entry for entry in info_diff.changed
+                           if not _approx_equal(entry.before, entry.after)]
+                info_diff = info_diff._replace(changed=changed)
+                if not info_diff.is_empty():
+                    logger.info('Project model drifted for {}: '
+                                '{}'.format(info_type, info_diff))
+                    drift[info_type] = info_diff
+            self.info[info_type] = fresh_info
+        self._stale_info_types.clear()
+        self.commands_applied = 0
+        return drift
+
+    def get(self, info_type):
+        """
+        Returns the mirrored result for a GetInfo type, fetching it first if
+        it is stale or a reconciliation is due.
+
+        Parameters
+        ----------
+        info_type : str
+            One of the GetInfo types in MODEL_INFO_TYPES.
+        """
+
+        if (self.reconcile_every is not None and
+                self.commands_applied >= self.reconcile_every):
+            self.reconcile()
+        elif info_type in self._stale_info_types:
+            self.info[info_type] = self._fetch(info_type)
+            self._stale_info_types.discard(info_type)
+        return self.info[info_type]
+
+    def get_track_gain(self, track_name):
+        """
+        Returns the gain in dB of the first wave track with the name, or None
+        if there is no such track.
+
+        Parameters
+        ----------
+        track_name : str
+            Name of the track.
+        """
+
+        for track_info in self.get('Tracks'):
+            if (track_info['kind'] == 'wave' and
+                    track_info['name'] == track_name):
+                return round(20 * log10(track_info['gain']), 4)
+        return None
+
+    def get_project_end(self):
+        """
+        Returns the end time of the last wave track, or 0 if there are no
+        wave tracks.
+        """
+
+        return max([track_info['end'] for track_info in self.get('Tracks')
+                    if track_info['kind'] == 'wave'] or [0])
+
+    def known_time_span(self):
+        """
+        Returns the (start, end) times spanned by the wave tracks and labels,
+        which is the time selection SelectAll makes, or None if the model has
+        not loaded them or they are stale. No command is sent.
+        """
+
+        if (not self.info or
+                self._stale_info_types.intersection(('Tracks', 'Labels'))):
+            return None
+        starts = [track_info['start'] for track_info in self.info['Tracks']
+                  if track_info['kind'] == 'wave']
+        ends = [track_info['end'] for track_info in self.info['Tracks']
+                if track_info['kind'] == 'wave']
+        for _, labels in self.info['Labels']:
+            starts.extend(label_info[0] for label_info in labels)
+            ends.extend(label_info[1] for label_info in labels)
+        if not starts:
+            return None
+        return (float(min(starts)), float(max(ends)))
+
+    def _selected_tracks(self):
+        return self._command_runner.selection.state.tracks
+
+    def command_sent(self, parsed_command):
+        """
+        Applies the known effects of a command that was sent to Audacity.
+        Must be called before the selection tracker sees the command, since
+        the effects apply to the selection the command ran with.
+
+        Parameters
+        ----------
+        parsed_command : ParsedCommand
+            The command that was sent to Audacity.
+        """
+
+        scripting_id = parsed_command.scripting_id.lower()
+        changed_info_types = INVALIDATED_INFO.get(scripting_id,
+                                                  PROJECT_INFO_TYPES)
+        if not changed_info_types:
+            return
+        self.commands_applied += 1
+        if not self.info:
+            return
+
+        apply = getattr(self, '_apply_' + scripting_id, None)
+        selected_tracks = self._selected_tracks()
+        if apply is None or selected_tracks is None:
+            self._stale_info_types.update(
+                info_type for info_type in changed_info_types
+                if info_type in MODEL_INFO_TYPES)
+            return
+        try:
+            apply(parsed_command.params, sorted(selected_tracks))
+        except (KeyError, IndexError, ValueError) as err:
+            logger.info('Could not apply {} to the project model: '
+                        '{}'.format(parsed_command.scripting_id, err))
+            self._stale_info_types.update(MODEL_INFO_TYPES)
+
+    def command_failed(self, parsed_command):
+        """
+        Marks the GetInfo types that a command that failed could change as
+        stale, since it may have been partly applied.
+
+        Parameters
+        ----------
+        parsed_command : ParsedCommand
+            The command that failed.
+        """
+
+        self._stale_info_types.update(
+            info_type for info_type in INVALIDATED_INFO.get(
+                parsed_command.scripting_id.lower(), PROJECT_INFO_TYPES)
+            if info_type in MODEL_INFO_TYPES)
+
+    def _apply_settrackaudio(self, params, selected_tracks):
+        tracks_info = self.info['Tracks']
+        for track_num in selected_tracks:
+            track_info = tracks_info[track_num]
+            if 'Gain' in params:
+                track_info['gain'] = 10 ** (float(params['Gain']) / 20)
+            if 'Pan' in params:
+                track_info['pan'] = float(params['Pan'])
+            for key in ('Mute', 'Solo'):
+                if key in params:
+                    track_info[key.lower()] = int(
+                        params[key].lower() in ('true', '1'))
+
+    def _apply_settrackstatus(self, params, selected_tracks):
+        if 'Name' in params:
+            for track_num in selected_tracks:
+                self.info['Tracks'][track_num]['name'] = params['Name']
+
+    def _label_times(self, time):
+        # SplitLabels splits at the start and end of each label that lies
+        # inside the time selection.
+        label_times = set()
+        for _, labels in self.info['Labels']:
+            for label_info in labels:
+                if time[0] <= label_info[0] and label_info[1] <= time[1]:
+                    label_times.update(label_info[:2])
+        return sorted(label_times)
+
+    def _apply_splitlabels(self, params, selected_tracks):
+        time = self._command_runner.selection.state.time
+        if time is None or None in time:
+            raise ValueError('the time selection is unknown')
+        label_times = self._label_times(time)
+        new_clips_info = []
+        for clip_info in self.info['Clips']:
+            if clip_info['track'] not in selected_tracks:
+                new_clips_info.append(clip_info)
+                continue
+            start = clip_info['start']
+            for label_time in label_times:
+                if clip_info['start'] < label_time < clip_info['end']:
+                    new_clips_info.append(dict(clip_info, start=start,
+                                               end=label_time))
+                    start = label_time
+            new_clips_info.append(dict(clip_info, start=start))
+        self.info['Clips'] = new_clips_info
+        self._stale_info_types.add('Envelopes')
+
+    def _apply_join(self, params, selected_tracks):
+        time = self._command_runner.selection.state.time
+        new_clips_info = []
+        joined_clips = {}
+        for clip_info in self.info['Clips']:
+            track_num = clip_info['track']
+            inside = (time is None or None in time or
+                      (clip_info['start'] < time[1] and
+                       clip_info['end'] > time[0]))
+            if track_num not in selected_tracks or not inside:
+                new_clips_info.append(clip_info)
+            elif track_num in joined_clips:
+                joined_clip = joined_clips[track_num]
+                joined_clip['start'] = min(joined_clip['start'],
+                                           clip_info['start'])
+                joined_clip['end'] = max(joined_clip['end'],
+                                         clip_info['end'])
+            else:
+                joined_clips[track_num] = dict(clip_info)
+                new_clips_info.append(joined_clips[track_num])
+        self.info['Clips'] = new_clips_info
+        self._stale_info_types.add('Envelopes')
+
+    def _apply_mixandrendertonewtrack(self, params, selected_tracks):
+        tracks_info = self.info['Tracks']
+        source_tracks = [tracks_info[track_num]
+                         for track_num in selected_tracks
+                         if tracks_info[track_num]['kind'] == 'wave']
+        if not source_tracks:
+            return
+        if len(source_tracks) == 1:
+            mix_track_name = source_tracks[0]['name']
+        else:
+            mix_track_name = MIX_TRACK_NAME
+        start = min(track_info['start'] for track_info in source_tracks)
+        end = max(track_info['end'] for track_info in source_tracks)
+        new_track_num = len(tracks_info)
+        tracks_info.append({'name': mix_track_name, 'focused': 0,
+                            'selected': 1, 'kind': 'wave', 'start': start,
+                            'end': end, 'pan': 0, 'gain': 1.0,
+                            'channels': max(track_info.get('channels', 1)
+                                            for track_info in source_tracks),
+                            'solo': 0, 'mute': 0})
+        self.info['Clips'].append({'track': new_track_num, 'start': start,
+                                   'end': end, 'color': 0})
+        self._stale_info_types.add('Envelopes')
@@ -0,0 +1,304 @@
+from audacity_scripting.core.command import CommandSyntaxError, parse_command
+from audacity_scripting.core.selection import (SELECTION_IDS,
+                                               SelectionTracker,
+                                               UNKNOWN_SELECTION)
+from collections import namedtuple
+from time import perf_counter
+
+# Lower case scripting ids of the commands that only read from Audacity, so
+# they are sent straight away inside a transaction instead of deferred.
+READ_ONLY_IDS = frozenset(['getinfo', 'getpreference', 'help'])
+
+
+PlanEstimate = namedtuple('PlanEstimate', ['round_trips', 'seconds',
+                                           'commands', 'depends_on'])
+PlanEstimate.__doc__ = """
+The predicted cost of sending a plan.
+
+Attributes
+----------
+round_trips : int
+    Number of commands that would be sent, each answered by one reply.
+seconds : float
+    Predicted time to send the plan, from the measured latencies.
+commands : list
+    (command, seconds) pairs for the optimized commands, in order.
+depends_on : list
+    Read commands whose results the plan was built from.
+"""
+
+
+def _scripting_id(command):
+    return command.split(':')[0].strip()
+
+
+def is_read_only(command):
+    """
+    Returns True if the command only reads from Audacity.
+
+    Parameters
+    ----------
+    command : str
+        Command to be sent to Audacity.
+    """
+
+    try:
+        scripting_id = parse_command(command).scripting_id
+    except CommandSyntaxError:
+        return False
+    return scripting_id.lower() in READ_ONLY_IDS
+
+
+def _coalesce_selection(start, final):
+    """
+    Returns the shortest commands that change the selection from start to
+    final, or None if final cannot be set with SelectNone, SelectTracks and
+    SelectTime commands alone.
+
+    Parameters
+    ----------
+    start : SelectionState
+        Selection before the commands.
+    final : SelectionState
+        Selection after the commands.
+    """
+
+    if (final == start and start.tracks is not None and
+            start.time is not None):
+        return []
+    if final.tracks is None or final.time is None:
+        return None
+    if final.tracks and final.time == (None, None):
+        # SelectNone leaves the same empty time selection that the commands
+        # did, since both collapse the time selection from start.
+        commands = SelectionTracker().restore_commands(final)
+        if start.time != final.time:
+            commands.insert(0, 'SelectNone:')
+        return commands
+    if final.tracks and None in final.time:
+        return None
+    return SelectionTracker().restore_commands(final)
+
+
+class CommandPlan(object):
+    """
+    The commands collected inside a transaction, to be sent as one pipelined
+    batch when the transaction ends.
+
+    Attributes
+    ----------
+    commands : list
+        Commands in the order they were collected.
+    results : list
+        Results of the commands that were sent, in order, or None until the
+        plan has been sent.
+    depends_on : list
+        Read commands whose results the plan was built from, e.g.
+        'GetInfo: Type=Labels'.
+    track_gains : dict
+        Gains in dB set by commands in the plan, by track number, so later
+        changes in the same plan are compared with them instead of with the
+        gains read on entry.
+    before_send : list
+        Callables run just before the plan is sent, e.g. to write the files
+        its commands need, so a dry run writes nothing.
+    after_send : list
+        Callables run once the plan has been sent, e.g. to report stats.
+    seconds : float
+        Time taken to send the plan, or None until it has been sent.
+
+    Methods
+    -------
+    add(command)
+        Adds a command to the end of the plan.
+    record_read(command)
+        Records a read command the plan depends on.
+    extend(command_list)
+        Adds commands to the end of the plan.
+    optimize(selection_state)
+        Returns the commands with each run of selection commands replaced by
+        the fewest commands that leave the same selection.
+    estimate(latency, selection_state)
+        Returns the predicted cost of sending the plan.
+    describe(latency, selection_state)
+        Returns a printable description of the plan and its cost.
+    execute(command_runner, max_in_flight=16)
+        Sends the optimized plan as one pipelined batch.
+    """
+
+    def __init__(self):
+        """
+        Initializes an empty plan.
+        """
+
+        self.commands = []
+        self.results = None
+        self.depends_on = []
+        self.track_gains = {}
+        self.before_send = []
+        self.after_send = []
+        self.seconds = None
+
+    def __len__(self):
+        return len(self.commands)
+
+    def add(self, command):
+        """
+        Adds a command to the end of the plan.
+
+        Parameters
+        ----------
+        command : str
+            Command to be sent to Audacity.
+        """
+
+        self.commands.append(command)
+
+    def record_read(self, command):
+        """
+        Records a read command the plan depends on, once.
+
+        Parameters
+        ----------
+        command : str
+            Read command, e.g. 'GetInfo: Type=Labels'.
+        """
+
+        if command not in self.depends_on:
+            self.depends_on.append(command)
+
+    def extend(self, command_list):
+        """
+        Adds commands to the end of the plan.
+
+        Parameters
+        ----------
+        command_list : list
+            Commands to be sent to Audacity, in order.
+        """
+
+        self.commands.extend(command_list)
+
+    def optimize(self, selection_state=UNKNOWN_SELECTION):
+        """
+        Returns the commands with each run of consecutive selection commands
+        replaced by the fewest commands that leave the same selection, e.g.
+        the SelectNone: that each helper method starts and ends with. Runs
+        whose result is not fully known are kept as they are.
+
+        Parameters
+        ----------
+        selection_state : SelectionState, optional
+            Selection in Audacity before the plan is sent (Default is
+            UNKNOWN_SELECTION).
+        """
+
+        # The track count is left unknown, since mixes in the plan add
+        # tracks that the track index does not know about yet.
+        selection = SelectionTracker()
+        selection.state = selection_state
+        optimized = []
+        run = []
+        run_start = selection.state
+
+        def flush_run():
+            replacement = _coalesce_selection(run_start, selection.state)
+            if replacement is None or len(replacement) >= len(run):
+                optimized.extend(command for command, _ in run)
+            else:
+                optimized.extend(replacement)
+            del run[:]
+
+        for command in self.commands:
+            try:
+                parsed_command = parse_command(command)
+            except CommandSyntaxError:
+                parsed_command = None
+            if (parsed_command is not None and
+                    parsed_command.scripting_id.lower() in SELECTION_IDS):
+                if not run:
+                    run_start = selection.state
+                run.append((command, parsed_command))
+                selection.command_sent(parsed_command)
+                continue
+            if run:
+                flush_run()
+            optimized.append(command)
+            if parsed_command is None:
+                selection.state = UNKNOWN_SELECTION
+            else:
+                selection.command_sent(parsed_command)
+        if run:
+            flush_run()
+        return optimized
+
+    def estimate(self, latency, selection_state=UNKNOWN_SELECTION):
+        """
+        Returns a PlanEstimate with the predicted cost of sending the
+        optimized plan. Each command is predicted to take the mean measured
+        round trip for its scripting id, so effects are estimated from
+        earlier runs on similar regions.
+
+        Parameters
+        ----------
+        latency : LatencyStats
+            Measured round trip times.
+        selection_state : SelectionState, optional
+            Selection in Audacity before the plan is sent (Default is
+            UNKNOWN_SELECTION).
+        """
+
+        commands = [(command, latency.estimate(_scripting_id(command)))
+                    for command in self.optimize(selection_state)]
+        return PlanEstimate(len(commands),
+                            sum(seconds for _, seconds in commands),
+                            commands, list(self.depends_on))
+
+    def describe(self, latency, selection_state=UNKNOWN_SELECTION):
+        """
+        Returns a printable description of the plan: the reads it depends
+        on, its predicted cost, and each command with its predicted time.
+
+        Parameters
+        ----------
+        latency : LatencyStats
+            Measured round trip times.
+        selection_state : SelectionState, optional
+            Selection in Audacity before the plan is sent (Default is
+            UNKNOWN_SELECTION).
+        """
+
+        plan_estimate = self.estimate(latency, selection_state)
+        lines = ['Depends on: {}'.format(
+                     ', '.join(plan_estimate.depends_on) or 'nothing'),
+                 '{} round trips for {} collected commands, estimated '
+                 '{:.2f} s'.format(plan_estimate.round_trips, len(self),
+                                   plan_estimate.seconds)]
+        for command, seconds in plan_estimate.commands:
+            lines.append('{:8.3f} s  {}'.format(seconds, command))
+        return '\n'.join(lines)
+
+    def execute(self, command_runner, max_in_flight=16):
+        """
+        Runs the before_send callables, sends the optimized plan as one
+        pipelined batch, stores the results in results, runs the after_send
+        callables, and returns the results.
+
+        Parameters
+        ----------
+        command_runner : AudacityScriptingUtils
+            Connection to send the plan with.
+        max_in_flight : int, optional
+            Maximum number of commands written before their results are read
+            (Default is 16).
+        """
+
+        for callback in self.before_send:
+            callback()
+        start_time = perf_counter()
+        self.results = command_runner.run_commands(
+            self.optimize(command_runner.selection.state), max_in_flight)
+        self.seconds = perf_counter() - start_time
+        for callback in self.after_send:
+            callback()
+        return self.results
@@ -0,0 +1,234 @@
+from audacity_scripting import LOGGER_NAME
+from audacity_scripting.core.command import format_command
+from contextlib import contextmanager
+import logging
+
+logger = logging.getLogger(LOGGER_NAME)
+
+BOOL_TEXT = {'true': '1', 'false': '0'}
+
+
+def preference_text(value):
+    """
+    Returns a preference value as the text sent in a SetPreference command.
+    Bools are written as 1 or 0, and floats without a trailing .0.
+
+    Parameters
+    ----------
+    value : object
+        Preference value, e.g. from a desired-state mapping.
+    """
+
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def same_preference_value(first, second):
+    """
+    Returns True if two preference values are the same, comparing numbers
+    by value and bools and other text case insensitively.
+
+    Parameters
+    ----------
+    first : object
+        Preference value.
+    second : object
+        Preference value.
+    """
+
+    first = preference_text(first)
+    second = preference_text(second)
+    first = BOOL_TEXT.get(first.lower(), first)
+    second = BOOL_TEXT.get(second.lower(), second)
+    try:
+        return float(first) == float(second)
+    except ValueError:
+        return first.lower() == second.lower()
+
+
+class PreferencesManager(object):
+    """
+    A cache of the current values of Audacity preferences that sends only
+    the SetPreference commands needed to reach a desired state. Each
+    preference is read with GetPreference the first time it is needed and
+    then kept up to date from the SetPreference commands that are sent. The
+    Preferences info is not used, since the value it reports for each
+    preference is the built-in default rather than the current setting.
+
+    Attributes
+    ----------
+    reads : int
+        Number of preferences read with GetPreference.
+
+    Methods
+    -------
+    get(name)
+        Returns the current value of a preference as text.
+    changes(desired)
+        Returns the preferences in a desired-state mapping whose values
+        differ from the current values.
+    apply(desired)
+        Sends one batch of SetPreference commands for the changed values.
+    override(desired)
+        Context manager that applies a desired state and restores the
+        original values on exit.
+    invalidate(name=None)
+        Forgets the cached value of one or every preference.
+    command_sent(parsed_command)
+        Updates the cache from a command that was sent to Audacity.
+    command_failed(parsed_command)
+        Forgets the preference a failed SetPreference command names.
+    """
+
+    def __init__(self, command_runner):
+        """
+        Parameters
+        ----------
+        command_runner : AudacityScriptingUtils
+            Used to read the preferences and send the SetPreference commands.
+        """
+
+        self._command_runner = command_runner
+        self._values = {}
+        self.reads = 0
+
+    def get(self, name):
+        """
+        Returns the current value of a preference as text, reading it with
+        GetPreference if it is not cached.
+
+        Parameters
+        ----------
+        name : str
+            Path of the preference, e.g. '/AudioIO/LatencyDuration'.
+        """
+
+        if name not in self._values:
+            self._values[name] = self._command_runner.get_preference(name)
+            self.reads += 1
+        return self._values[name]
+
+    def changes(self, desired):
+        """
+        Returns a dict of the preferences in a desired-state mapping whose
+        values differ from the current values, mapped to the desired values
+        as text.
+
+        Parameters
+        ----------
+        desired : dict
+            Maps preference paths to the desired values.
+        """
+
+        return {name: preference_text(value)
+                for name, value in desired.items()
+                if not same_preference_value(self.get(name), value)}
+
+    def apply(self, desired):
+        """
+        Sends one pipelined batch of SetPreference commands for the values
+        that differ from the current values, and returns a dict mapping each
+        changed preference to its previous value.
+
+        Parameters
+        ----------
+        desired : dict
+            Maps preference paths to the desired values.
+        """
+
+        changed = self.changes(desired)
+        previous = {name: self.get(name) for name in changed}
+        logger.info('Setting {} of {} preferences'.format(
+            len(changed), len(desired)))
+        self._send(changed)
+        return previous
+
+    def _send(self, values):
+        """
+        Sends one pipelined batch of SetPreference commands.
+
+        Parameters
+        ----------
+        values : dict
+            Maps preference paths to the values as text.
+        """
+
+        if values:
+            self._command_runner.run_commands([
+                format_command('SetPreference', {'Name': name,
+                                                 'Value': value})
+                for name, value in sorted(values.items())])
+
+    @contextmanager
+    def override(self, desired):
+        """
+        Context manager that applies a desired state on entry and restores
+        the values the changed preferences had before on exit. Nothing is
+        sent for preferences that already have the desired values.
+
+        Parameters
+        ----------
+        desired : dict
+            Maps preference paths to the desired values.
+        """
+
+        previous = self.apply(desired)
+        try:
+            yield self
+        finally:
+            # Sent without comparing, since inside a transaction the cache
+            # has not seen the deferred changes yet.
+            self._send(previous)
+
+    def invalidate(self, name=None):
+        """
+        Forgets the cached value of a preference, e.g. after it was changed
+        in the Audacity preferences dialog, so it is read again when it is
+        next needed.
+
+        Parameters
+        ----------
+        name : str, optional
+            Path of the preference. Every cached value is forgotten if the
+            value is None (Default is None).
+        """
+
+        if name is None:
+            self._values = {}
+        else:
+            self._values.pop(name, None)
+
+    def command_sent(self, parsed_command):
+        """
+        Updates the cache from a command that was sent to Audacity.
+
+        Parameters
+        ----------
+        parsed_command : ParsedCommand
+            The command that was sent to Audacity.
+        """
+
+        if parsed_command.scripting_id.lower() != 'setpreference':
+            return
+        params = parsed_command.params
+        if 'Name' in params and 'Value' in params:
+            self._values[params['Name']] = params['Value']
+        else:
+            self.invalidate(params.get('Name'))
+
+    def command_failed(self, parsed_command):
+        """
+        Forgets the cached value of the preference a SetPreference command
+        that failed names, since it is not known whether it was changed.
+
+        Parameters
+        ----------
+        parsed_command : ParsedCommand
+            The command that failed.
+        """
+
+        if parsed_command.scripting_id.lower() == 'setpreference':
+            self.invalidate(parsed_command.params.get('Name'))
@@ -0,0 +1,257 @@
+from bisect import bisect_left, bisect_right
+from collections.abc import Sequence
+from heapq import merge
+
+
+def group_tracks_by_region(audio_tracks_info):
+    """
+    Returns a list of ((start, end), track_nums) pairs, sorted by time, that
+    group the tracks sharing each region. Regions inside the tracks are
+    shared by every track, while the first and last regions of a track end
+    at its own start and end.
+
+    Parameters
+    ----------
+    audio_tracks_info : list
+        Result of AudacityScriptingUtils.get_audio_tracks_info().
+    """
+
+    track_nums_by_region = {}
+    for audio_track_info in audio_tracks_info:
+        for label in audio_track_info['labels']:
+            track_nums_by_region.setdefault(
+                (label['start'], label['end']), []).append(
+                    audio_track_info['track_num'])
+    return sorted(track_nums_by_region.items())
+
+
+class TrackRegions(Sequence):
+    """
+    A read-only view of the regions of one track. The regions are read from
+    the shared boundaries of a RegionIndex, so no per-track copy of the
+    region list is stored. Each region is returned as a dict with 'start'
+    and 'end' keys.
+
+    Attributes
+    ----------
+    start : float
+        Start time of the track.
+    end : float
+        End time of the track.
+    """
+
+    def __init__(self, boundaries, first, last, start, end):
+        """
+        Parameters
+        ----------
+        boundaries : list
+            Sorted boundary times shared by every track.
+        first : int
+            Index of the first boundary inside the track.
+        last : int
+            Index after the last boundary inside the track.
+        start : float
+            Start time of the track.
+        end : float
+            End time of the track.
+        """
+
+        self._boundaries = boundaries
+        self._first = first
+        self._last = last
+        self.start = start
+        self.end = end
+
+    def __len__(self):
+        return self._last - self._first + 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('TrackRegions index out of range')
+        if index == 0:
+            region_start = self.start
+        else:
+            region_start = self._boundaries[self._first + index - 1]
+        if index == len(self) - 1:
+            region_end = self.end
+        else:
+            region_end = self._boundaries[self._first + index]
+        return {'start': region_start, 'end': region_end}
+
+    def __eq__(self, other):
+        if isinstance(other, (TrackRegions, list, tuple)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return 'TrackRegions({!r})'.format(list(self))
+
+
+class RegionIndex(object):
+    """
+    The boundaries between label regions, held once in a sorted list and
+    shared by every track. Lookups use binary search.
+
+    Attributes
+    ----------
+    boundaries : list
+        Sorted boundary times in seconds, at the midpoint of each label.
+
+    Methods
+    -------
+    from_labels_info(labels_info, label_track_index=None)
+        Builds the index from the Labels info.
+    region_containing(time, start, end)
+        Returns the region of a track that contains a time.
+    regions_overlapping(range_start, range_end, start, end)
+        Returns the regions of a track that overlap a time range.
+    track_regions(start, end)
+        Returns a view of the regions of a track.
+    clip_aligned_regions(clips)
+        Returns the regions of each clip of a track.
+    audio_regions(clips)
+        Returns the regions of a track that contain audio.
+    """
+
+    def __init__(self, boundaries):
+        """
+        Parameters
+        ----------
+        boundaries : iterable
+            Boundary times in seconds, in any order.
+        """
+
+        self.boundaries = sorted(boundaries)
+
+    @classmethod
+    def from_labels_info(cls, labels_info, label_track_index=None):
+        """
+        Builds the index from the Labels info, using the midpoint of each
+        label as a boundary. The sorted boundaries of the label tracks are
+        merged, so a project with no label track has no boundaries.
+
+        Parameters
+        ----------
+        labels_info : list
+            Result of the GetInfo command with Type=Labels.
+        label_track_index : int, optional
+            Position of the one label track in the Labels info to use. The
+            labels of every label track are used if the value is None
+            (Default is None).
+        """
+
+        if label_track_index is not None:
+            labels_info = [labels_info[label_track_index]]
+        return cls(merge(*[
+            sorted((label_info[0] + label_info[1])/2 for label_info in labels)
+            for _, labels in labels_info]))
+
+    def track_regions(self, start, end):
+        """
+        Returns a view of the regions of a track. The first region starts at
+        the start of the track, the last ends at the end of the track, and
+        the boundaries between them are the boundaries inside the track.
+
+        Parameters
+        ----------
+        start : float
+            Start time of the track.
+        end : float
+            End time of the track.
+        """
+
+        first = bisect_right(self.boundaries, start)
+        last = max(bisect_left(self.boundaries, end), first)
+        return TrackRegions(self.boundaries, first, last, start, end)
+
+    def region_containing(self, time, start, end):
+        """
+        Returns the position and the dict of the region of a track that
+        contains a time, or None if the time is outside the track. Times on
+        a boundary belong to the region that starts there.
+
+        Parameters
+        ----------
+        time : float
+            Time in seconds.
+        start : float
+            Start time of the track.
+        end : float
+            End time of the track.
+        """
+
+        if not start <= time <= end:
+            return None
+        regions = self.track_regions(start, end)
+        position = bisect_right(self.boundaries, time) - regions._first
+        position = min(position, len(regions) - 1)
+        return position, regions[position]
+
+    def regions_overlapping(self, range_start, range_end, start, end):
+        """
+        Returns the (position, region) pairs of the regions of a track that
+        overlap a time range.
+
+        Parameters
+        ----------
+        range_start : float
+            Start of the time range.
+        range_end : float
+            End of the time range.
+        start : float
+            Start time of the track.
+        end : float
+            End time of the track.
+        """
+
+        if (range_end < range_start or range_end < start or
+                range_start > end):
+            return []
+        regions = self.track_regions(start, end)
+        first = max(bisect_right(self.boundaries, range_start) -
+                    regions._first, 0)
+        last = min(bisect_left(self.boundaries, range_end) - regions._first,
+                   len(regions) - 1)
+        return [(position, regions[position])
+                for position in range(first, last + 1)]
+
+    def clip_aligned_regions(self, clips):
+        """
+        Returns the regions of each run of contiguous clips of a track, so
+        that no region spans the gap between two clips. Clips that touch or
+        overlap are merged, so only real gaps end a region.
+
+        Parameters
+        ----------
+        clips : list
+            (start, end) times of the clips of the track.
+        """
+
+        runs = []
+        for clip_start, clip_end in sorted(clips):
+            if runs and clip_start <= runs[-1][1]:
+                runs[-1][1] = max(runs[-1][1], clip_end)
+            else:
+                runs.append([clip_start, clip_end])
+        return [self.track_regions(run_start, run_end)
+                for run_start, run_end in runs]
+
+    def audio_regions(self, clips):
+        """
+        Returns the list of regions of a track that contain audio, as dicts
+        with 'start' and 'end' keys. Label boundaries and the edges of the
+        gaps between clips both end regions, and the gaps are left out.
+
+        Parameters
+        ----------
+        clips : list
+            (start, end) times of the clips of the track.
+        """
+
+        return [region for clip_regions in self.clip_aligned_regions(clips)
+                for region in clip_regions
+                if region['end'] > region['start']]
@@ -0,0 +1,240 @@
+class SchemaError(Exception):
+    """
+    An exception that is raised if the info returned by the GetInfo command
+    does not have the expected shape.
+    """
+    pass
+
+
+class Record(object):
+    """
+    Describes a JSON object with required and optional keys. If a
+    discriminator key is given, the keys required by the matching variant
+    are checked as well.
+
+    Attributes
+    ----------
+    required : dict
+        Maps each required key to the schema of its value.
+    optional : dict
+        Maps each optional key to the schema of its value.
+    discriminator : str
+        Key whose value selects one of the variants.
+    variants : dict
+        Maps a discriminator value to a dict of extra required keys.
+    """
+
+    def __init__(self, required, optional=None, discriminator=None,
+                 variants=None):
+        self.required = required
+        self.optional = optional or {}
+        self.discriminator = discriminator
+        self.variants = variants or {}
+
+
+class ArrayOf(object):
+    """
+    Describes a JSON array whose items all share one schema.
+
+    Attributes
+    ----------
+    item : object
+        Schema of each item in the array.
+    """
+
+    def __init__(self, item):
+        self.item = item
+
+
+class Tuple(object):
+    """
+    Describes a fixed length JSON array whose items each have their own
+    schema.
+
+    Attributes
+    ----------
+    items : tuple
+        Schema of each item in the array, in order.
+    """
+
+    def __init__(self, *items):
+        self.items = items
+
+
+NUMBER = 'number'
+INTEGER = 'integer'
+ANY = 'any'
+
+GETINFO_SCHEMAS = {
+    'Commands': ArrayOf(Record({'id': str, 'name': str,
+                                'params': ArrayOf(Record({'key': str,
+                                                          'type': str},
+                                                         {'default': ANY,
+                                                          'enum': ANY}))},
+                               {'url': str, 'tip': str})),
+    'Menus': ArrayOf(Record({'depth': INTEGER, 'label': str},
+                            {'id': str, 'flags': INTEGER, 'accel': str})),
+    'Preferences': ArrayOf(Record({'id': str, 'type': str},
+                                  {'prompt': str, 'default': ANY,
+                                   'enum': ArrayOf(str)})),
+    'Tracks': ArrayOf(Record({'name': str, 'kind': str},
+                             {'focused': INTEGER, 'selected': INTEGER},
+                             discriminator='kind',
+                             variants={'wave': {'start': NUMBER,
+                                                'end': NUMBER,
+                                                'gain': NUMBER,
+                                                'pan': NUMBER}})),
+    'Clips': ArrayOf(Record({'track': INTEGER, 'start': NUMBER,
+                             'end': NUMBER},
+                            {'color': INTEGER})),
+    'Envelopes': ArrayOf(Record({'track': INTEGER, 'clip': INTEGER,
+                                 'start': NUMBER, 'end': NUMBER,
+                                 'points': ArrayOf(ANY)})),
+    'Labels': ArrayOf(Tuple(INTEGER, ArrayOf(Tuple(NUMBER, NUMBER, str)))),
+    'Boxes': ArrayOf(Record({'depth': INTEGER,
+                             'box': Tuple(NUMBER, NUMBER, NUMBER, NUMBER)},
+                            {'id': INTEGER, 'label': str, 'name': str})),
+}
+
+_compiled_validators = {}
+
+
+def _type_name(value):
+    return type(value).__name__
+
+
+def _compile(schema):
+    """
+    Compiles a schema into a function that checks a value and its path.
+
+    Parameters
+    ----------
+    schema : object
+        A Record, ArrayOf or Tuple instance, a Python type, or one of
+        NUMBER, INTEGER or ANY.
+    """
+
+    if schema == ANY:
+        return lambda value, path: None
+
+    if schema == NUMBER:
+        def check_number(value, path):
+            if (not isinstance(value, (int, float)) or
+                    isinstance(value, bool)):
+                raise SchemaError('{}: expected a number, '
+                                  'got {}'.format(path, _type_name(value)))
+        return check_number
+
+    if schema == INTEGER:
+        def check_integer(value, path):
+            if not isinstance(value, int) or isinstance(value, bool):
+                raise SchemaError('{}: expected an integer, '
+                                  'got {}'.format(path, _type_name(value)))
+        return check_integer
+
+    if isinstance(schema, type):
+        def check_type(value, path):
+            if not isinstance(value, schema):
+                raise SchemaError('{}: expected {}, got {}'.format(
+                    path, schema.__name__, _type_name(value)))
+        return check_type
+
+    if isinstance(schema, ArrayOf):
+        check_item = _compile(schema.item)
+
+        def check_array(value, path):
+            if not isinstance(value, list):
+                raise SchemaError('{}: expected an array, '
+                                  'got {}'.format(path, _type_name(value)))
+            for index, item in enumerate(value):
+                check_item(item, '{}[{}]'.format(path, index))
+        return check_array
+
+    if isinstance(schema, Tuple):
+        item_checks = [_compile(item) for item in schema.items]
+        length = len(item_checks)
+
+        def check_tuple(value, path):
+            if not isinstance(value, list) or len(value) != length:
+                raise SchemaError('{}: expected an array of {} items, '
+                                  'got {!r}'.format(path, length, value))
+            for index, check_item in enumerate(item_checks):
+                check_item(value[index], '{}[{}]'.format(path, index))
+        return check_tuple
+
+    if isinstance(schema, Record):
+        required = [(key, _compile(value))
+                    for key, value in schema.required.items()]
+        optional = [(key, _compile(value))
+                    for key, value in schema.optional.items()]
+        variants = {name: [(key, _compile(value))
+                           for key, value in keys.items()]
+                    for name, keys in schema.variants.items()}
+        discriminator = schema.discriminator
+
+        def check_keys(value, path, key_checks):
+            for key, check_value in key_checks:
+                if key not in value:
+                    raise SchemaError('{}: missing key {!r}'.format(path,
+                                                                    key))
+                check_value(value[key], '{}[{!r}]'.format(path, key))
+
+        def check_record(value, path):
+            if not isinstance(value, dict):
+                raise SchemaError('{}: expected an object, '
+                                  'got {}'.format(path, _type_name(value)))
+            check_keys(value, path, required)
+            for key, check_value in optional:
+                if key in value:
+                    check_value(value[key], '{}[{!r}]'.format(path, key))
+            if discriminator is not None:
+                check_keys(value, path,
+                           variants.get(value[discriminator], ()))
+        return check_record
+
+    raise TypeError('Unsupported schema: {!r}'.format(schema))
+
+
+def get_validator(info_type):
+    """
+    Returns the compiled validator for a GetInfo type. Validators are
+    compiled on first use and reused afterwards.
+
+    Parameters
+    ----------
+    info_type : str
+        Value passed to the Type parameter of the GetInfo command, e.g.
+        'Tracks'. Returns None if there is no schema for the type.
+    """
+
+    if info_type not in _compiled_validators:
+        schema = GETINFO_SCHEMAS.get(info_type)
+        check = None
+        if schema is not None:
+            check = _compile(schema)
+        _compiled_validators[info_type] = check
+    return _compiled_validators[info_type]
+
+
+def validate_info(info_type, info):
+    """
+    Checks the shape of the info returned by the GetInfo command and returns
+    it unchanged.
+
+    Parameters
+    ----------
+    info_type : str
+        Value passed to the Type parameter of the GetInfo command.
+    info : object
+        Parsed JSON object returned by the GetInfo command.
+
+    Raises
+    ------
+    SchemaError
+        If the info does not match the schema for the type.
+    """
+
+    check = get_validator(info_type)
+    if check is not None:
+        check(info, info_type)
+    return info
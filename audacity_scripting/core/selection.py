@@ -0,0 +1,297 @@
+from audacity_scripting.core.command import format_command
+from audacity_scripting.core.tracks import (ALL_TRACK_SELECTION_IDS,
+                                            CLEAR_TRACK_SELECTION_IDS,
+                                            apply_track_selection)
+from collections import namedtuple
+
+# Lower case scripting ids of the commands that only change the selection.
+SELECTION_IDS = frozenset(['select', 'selecttime', 'selecttracks',
+                           'selectnone', 'selectall', 'selalltracks'])
+
+# Lower case scripting ids of the commands that leave the selection as it
+# was. SetTrackStatus and SetTrack are only neutral without a Selected
+# parameter. Every other command makes the selection unknown.
+SELECTION_NEUTRAL_IDS = frozenset([
+    'getinfo', 'getpreference', 'setpreference', 'message', 'help',
+    'settrackaudio', 'settrackvisuals', 'settrackstatus', 'settrack',
+    'setclip', 'setenvelope', 'setlabel', 'export2', 'amplify',
+    'bassandtreble', 'compressor', 'limiter', 'noisereduction', 'normalize',
+])
+
+SelectionState = namedtuple('SelectionState', ['tracks', 'time'])
+SelectionState.__doc__ = """
+The track and time selection in Audacity.
+
+Attributes
+----------
+tracks : frozenset
+    Selected track numbers, or None if unknown.
+time : tuple
+    Selected (start, end) times in seconds, or None if unknown. Both times
+    are None if the selection is known to be empty at an unknown position.
+"""
+
+UNKNOWN_SELECTION = SelectionState(None, None)
+
+
+def _collapse(time):
+    # Collapsing an unknown time selection still makes it empty, at an
+    # unknown position.
+    if time is None:
+        return (None, None)
+    return (time[0], time[0])
+
+
+class SelectionTracker(object):
+    """
+    A model of the track and time selection in Audacity, updated from the
+    commands that are sent. It is used to skip selection commands that
+    would not change the selection.
+
+    Attributes
+    ----------
+    state : SelectionState
+        The current selection, with None for the parts that are unknown.
+    track_count : callable
+        Returns the number of tracks in the project, or None if unknown.
+    time_span : callable
+        Returns the (start, end) times SelectAll selects, or None if
+        unknown.
+    elided : int
+        Number of selection commands found to be redundant.
+
+    Methods
+    -------
+    next_state(parsed_command)
+        Returns the selection after the command, without changing state.
+    is_redundant(parsed_command)
+        Returns True if the command is a selection command that would not
+        change the known selection.
+    command_sent(parsed_command)
+        Updates the selection from a command that was sent to Audacity.
+    command_failed(parsed_command)
+        Forgets the selection if the failed command could change it.
+    restore_commands(state)
+        Returns the commands that change the selection to the state.
+    """
+
+    def __init__(self, track_count=None, time_span=None):
+        """
+        Initializes the tracker with an unknown selection.
+
+        Parameters
+        ----------
+        track_count : callable, optional
+            Returns the number of tracks in the project, or None if unknown
+            (Default is None).
+        time_span : callable, optional
+            Returns the (start, end) times SelectAll selects, or None if
+            unknown (Default is None).
+        """
+
+        self.state = UNKNOWN_SELECTION
+        self.track_count = track_count or (lambda: None)
+        self.time_span = time_span or (lambda: None)
+        self.elided = 0
+
+    def next_state(self, parsed_command):
+        """
+        Returns the selection after the command, without changing state.
+
+        Parameters
+        ----------
+        parsed_command : ParsedCommand
+            The command to be sent to Audacity.
+        """
+
+        scripting_id = parsed_command.scripting_id.lower()
+        params = parsed_command.params
+        tracks, time = self.state
+
+        if scripting_id in SELECTION_NEUTRAL_IDS:
+            if 'Selected' in params:
+                return SelectionState(None, time)
+            return self.state
+        if scripting_id not in SELECTION_IDS:
+            return UNKNOWN_SELECTION
+
+        if scripting_id in CLEAR_TRACK_SELECTION_IDS:
+            return SelectionState(frozenset(), _collapse(time))
+        if scripting_id in ALL_TRACK_SELECTION_IDS:
+            track_count = self.track_count()
+            if track_count is None:
+                tracks = None
+            else:
+                tracks = frozenset(range(track_count))
+            if scripting_id == 'selectall':
+                time = self.time_span()
+            return SelectionState(tracks, time)
+
+        # Select always applies its track part, with the Track=0
+        # TrackCount=1 Mode=Set defaults when the parameters are missing.
+        if scripting_id in ('selecttracks', 'select'):
+            if tracks is None and params.get('Mode', 'Set').lower() != 'set':
+                tracks = None
+            else:
+                tracks = frozenset(apply_track_selection(
+                    tracks or (), params, self.track_count()))
+        if scripting_id == 'selecttime' or ('Start' in params or
+                                            'End' in params):
+            relative_to = params.get('RelativeTo', 'ProjectStart').lower()
+            if relative_to != 'projectstart':
+                time = None
+            elif 'Start' in params and 'End' in params:
+                time = (float(params['Start']), float(params['End']))
+            elif time is not None and None not in time:
+                time = (float(params.get('Start', time[0])),
+                        float(params.get('End', time[1])))
+            else:
+                time = None
+        return SelectionState(tracks, time)
+
+    def is_redundant(self, parsed_command):
+        """
+        Returns True if the command is a selection command that would not
+        change the known selection.
+
+        Parameters
+        ----------
+        parsed_command : ParsedCommand
+            The command to be sent to Audacity.
+        """
+
+        if parsed_command.scripting_id.lower() not in SELECTION_IDS:
+            return False
+        if self.state.tracks is None or self.state.time is None:
+            return False
+        try:
+            return self.next_state(parsed_command) == self.state
+        except ValueError:
+            return False
+
+    def command_sent(self, parsed_command):
+        """
+        Updates the selection from a command that was sent to Audacity.
+
+        Parameters
+        ----------
+        parsed_command : ParsedCommand
+            The command that was sent to Audacity.
+        """
+
+        try:
+            self.state = self.next_state(parsed_command)
+        except ValueError:
+            self.state = UNKNOWN_SELECTION
+
+    def command_failed(self, parsed_command):
+        """
+        Forgets the selection if a command that failed could have changed
+        it, since it may have been partly applied. Otherwise a later
+        identical selection command would be skipped.
+
+        Parameters
+        ----------
+        parsed_command : ParsedCommand
+            The command that failed.
+        """
+
+        try:
+            if self.next_state(parsed_command) == self.state:
+                return
+        except ValueError:
+            pass
+        self.state = UNKNOWN_SELECTION
+
+    def restore_commands(self, state):
+        """
+        Returns the commands that change the selection to the state, which
+        is empty if the selection already matches it.
+
+        Parameters
+        ----------
+        state : SelectionState
+            The selection to restore. Parts that are unknown are left as
+            they are.
+        """
+
+        if state.tracks is None and state.time is None:
+            return []
+        if state == self.state:
+            return []
+
+        commands = []
+        if state.tracks is not None and state.tracks != self.state.tracks:
+            if not state.tracks:
+                commands.append('SelectNone:')
+            commands.extend(select_tracks_commands(state.tracks))
+        if (state.time is not None and None not in state.time and
+                (commands or state.time != self.state.time)):
+            commands.append(format_command(
+                'SelectTime', {'Start': state.time[0],
+                               'End': state.time[1]}))
+        return commands
+
+
+def select_tracks_commands(tracks):
+    """
+    Returns the SelectTracks commands that select exactly a set of tracks,
+    one per run of consecutive track numbers. The first command replaces the
+    track selection and the rest add to it.
+
+    Parameters
+    ----------
+    tracks : set
+        Track numbers to select.
+    """
+
+    commands = []
+    mode = 'Set'
+    for first_track, count in _track_runs(tracks):
+        commands.append(format_command(
+            'SelectTracks', {'Mode': mode, 'Track': first_track,
+                             'TrackCount': count}))
+        mode = 'Add'
+    return commands
+
+
+def select_region_commands(tracks, start, end):
+    """
+    Returns the commands that select a time range on exactly a set of
+    tracks. A single track is selected with one Select command.
+
+    Parameters
+    ----------
+    tracks : list
+        Track numbers to select.
+    start : float
+        Start of the time range.
+    end : float
+        End of the time range.
+    """
+
+    if len(tracks) == 1:
+        return [format_command('Select', {'Mode': 'Set', 'Track': tracks[0],
+                                          'Start': start, 'End': end})]
+    return select_tracks_commands(tracks) + [
+        format_command('SelectTime', {'Start': start, 'End': end})]
+
+
+def _track_runs(tracks):
+    """
+    Returns (first track, count) pairs for the runs of consecutive track
+    numbers in a set of track numbers.
+
+    Parameters
+    ----------
+    tracks : set
+        Track numbers.
+    """
+
+    runs = []
+    for track_num in sorted(tracks):
+        if runs and runs[-1][0] + runs[-1][1] == track_num:
+            runs[-1][1] += 1
+        else:
+            runs.append([track_num, 1])
+    return [tuple(run) for run in runs]
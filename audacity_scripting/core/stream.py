@@ -0,0 +1,106 @@
+import json
+
+
+class JsonArrayStream(object):
+    """
+    An incremental parser for the top level JSON array returned by the
+    GetInfo command. Text is fed in as it arrives from Audacity and each
+    element of the array is parsed as soon as it is complete, so only one
+    element is held in memory at a time.
+
+    Methods
+    -------
+    feed(text)
+        Consumes a chunk of the reply and returns the elements it completed.
+    close()
+        Checks that the top level array was closed.
+    """
+
+    def __init__(self):
+        """
+        Initializes the scanner state.
+        """
+
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._started = False
+        self._finished = False
+        self._element = []
+
+    def _complete_element(self, completed):
+        text = ''.join(self._element).strip()
+        self._element = []
+        if text:
+            completed.append(json.loads(text))
+
+    def feed(self, text):
+        """
+        Consumes a chunk of the reply and returns the elements it completed.
+
+        Parameters
+        ----------
+        text : str
+            Next chunk of the reply, with backslashes already escaped.
+        """
+
+        completed = []
+        for char in text:
+            if self._finished:
+                if not char.isspace():
+                    raise ValueError('Unexpected data after the end of the '
+                                     'array: {!r}'.format(char))
+                continue
+
+            if not self._started:
+                if char == '[':
+                    self._started = True
+                    self._depth = 1
+                elif not char.isspace():
+                    raise ValueError('Expected a JSON array, '
+                                     'got {!r}'.format(char))
+                continue
+
+            if self._in_string:
+                self._element.append(char)
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._element.append(char)
+            elif char in '[{':
+                self._depth += 1
+                self._element.append(char)
+            elif char in ']}':
+                self._depth -= 1
+                if self._depth == 0:
+                    self._complete_element(completed)
+                    self._finished = True
+                else:
+                    self._element.append(char)
+                    if self._depth == 1:
+                        self._complete_element(completed)
+            elif char == ',' and self._depth == 1:
+                self._complete_element(completed)
+            else:
+                self._element.append(char)
+        return completed
+
+    def close(self):
+        """
+        Checks that the top level array was closed.
+
+        Raises
+        ------
+        ValueError
+            If the reply ended before the top level array was closed.
+        """
+
+        if not self._finished:
+            raise ValueError('Reply ended before the JSON array was closed')
@@ -0,0 +1,55 @@
+from itertools import groupby
+
+
+def order_gain_grid(gain_grid):
+    """
+    Returns the unique gain vectors of a grid ordered so that consecutive
+    vectors differ in as few tracks as possible. The vectors are sorted in
+    reflected (boustrophedon) order: the first track's gain changes least
+    often, and the order of the remaining tracks is reversed on every other
+    step of the track before them. On a full grid, i.e. every combination of
+    some gains per track, each step changes exactly one track's gain.
+
+    Parameters
+    ----------
+    gain_grid : iterable
+        Gain vectors in dB, each with one gain per track.
+    """
+
+    vectors = sorted(set(tuple(gains) for gains in gain_grid))
+    return _reflected_order(vectors, 0)
+
+
+def _reflected_order(vectors, depth):
+    if len(vectors) <= 1 or depth == len(vectors[0]):
+        return vectors
+    ordered = []
+    for position, (_, group) in enumerate(
+            groupby(vectors, key=lambda gains: gains[depth])):
+        group_order = _reflected_order(list(group), depth + 1)
+        if position % 2:
+            group_order.reverse()
+        ordered.extend(group_order)
+    return ordered
+
+
+def count_gain_changes(start_gains, ordered_grid):
+    """
+    Returns the number of track gains that change when stepping through the
+    gain vectors in order, starting from the current gains.
+
+    Parameters
+    ----------
+    start_gains : tuple
+        Current gain of each track in dB.
+    ordered_grid : list
+        Gain vectors in the order they are applied.
+    """
+
+    changes = 0
+    previous = tuple(start_gains)
+    for gains in ordered_grid:
+        changes += sum(1 for before, after in zip(previous, gains)
+                       if before != after)
+        previous = gains
+    return changes
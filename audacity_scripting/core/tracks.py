@@ -0,0 +1,292 @@
+from audacity_scripting.core.info_cache import (INVALIDATED_INFO,
+                                                PROJECT_INFO_TYPES)
+
+# Name Audacity gives the track created by MixAndRenderToNewTrack.
+MIX_TRACK_NAME = 'Mix'
+
+# Lower case scripting ids of the commands that replace the track selection.
+CLEAR_TRACK_SELECTION_IDS = frozenset(['selectnone'])
+ALL_TRACK_SELECTION_IDS = frozenset(['selectall', 'selalltracks'])
+
+
+class TrackNotFound(Exception):
+    """
+    An exception that is raised if no track has the requested name.
+    """
+    pass
+
+
+class DuplicateTrackName(Exception):
+    """
+    An exception that is raised if more than one track has the requested
+    name, so the track cannot be identified by name.
+    """
+    pass
+
+
+def apply_track_selection(selected_tracks, params, track_count):
+    """
+    Returns the set of selected track numbers after a SelectTracks command,
+    or a Select command with a Track parameter.
+
+    Parameters
+    ----------
+    selected_tracks : set
+        Track numbers selected before the command.
+    params : dict
+        Parameters of the command. Mode defaults to Set and TrackCount to 1.
+    track_count : int
+        Number of tracks in the project, or None if unknown.
+    """
+
+    first_track = int(float(params.get('Track', 0)))
+    last_track = first_track + int(float(params.get('TrackCount', 1)))
+    if track_count is not None:
+        last_track = min(last_track, track_count)
+    tracks = set(range(first_track, last_track))
+    mode = params.get('Mode', 'Set').lower()
+    if mode == 'add':
+        return set(selected_tracks) | tracks
+    if mode == 'remove':
+        return set(selected_tracks) - tracks
+    return tracks
+
+
+class TrackIndex(object):
+    """
+    An index from track names and kinds to track numbers. It is built from
+    the Tracks info and kept up to date from the commands that are sent,
+    so looking up a track needs no round trip. Commands whose effect on the
+    track list is not modelled mark the index as invalid, and it is rebuilt
+    on the next lookup.
+
+    Renames and mixes apply to the selected tracks, which are read from a
+    SelectionTracker rather than followed here as well.
+
+    Attributes
+    ----------
+    valid : bool
+        Flag that is False until the index is built, and after a command
+        that changes the tracks in a way that is not modelled.
+    selection : SelectionTracker
+        Model of the selection the commands run with, or None if it is not
+        followed, in which case renames and mixes invalidate the index.
+
+    Methods
+    -------
+    rebuild(tracks_info)
+        Rebuilds the index from the Tracks info.
+    track_num(track_name, kind=None)
+        Returns the number of the one track with the name.
+    track_nums(track_name_list, kind=None)
+        Returns the numbers of the tracks with the names, in track order.
+    tracks_of_kind(kind)
+        Returns the numbers of the tracks of one kind, in track order.
+    append(track_name, kind)
+        Records a track added at the end of the track list.
+    rename(track_num, track_name)
+        Records a track being renamed.
+    command_sent(parsed_command)
+        Updates the index from a command that was sent to Audacity.
+    command_failed(parsed_command)
+        Invalidates the index if the failed command could change the tracks.
+    """
+
+    def __init__(self, selection=None):
+        """
+        Initializes an empty, invalid index.
+
+        Parameters
+        ----------
+        selection : SelectionTracker, optional
+            Model of the selection. It must see each command after the
+            index does, so the index reads the selection the command ran
+            with (Default is None).
+        """
+
+        self.valid = False
+        self.selection = selection
+        self._names = []
+        self._kinds = []
+        self._nums_by_name = {}
+
+    def __len__(self):
+        return len(self._names)
+
+    def rebuild(self, tracks_info):
+        """
+        Rebuilds the index from the Tracks info.
+
+        Parameters
+        ----------
+        tracks_info : list
+            Result of the GetInfo command with Type=Tracks.
+        """
+
+        self._names = []
+        self._kinds = []
+        self._nums_by_name = {}
+        for track_info in tracks_info:
+            self.append(track_info['name'], track_info['kind'])
+        self.valid = True
+
+    def track_num(self, track_name, kind=None):
+        """
+        Returns the number of the one track with the name.
+
+        Parameters
+        ----------
+        track_name : str
+            Name of the track.
+        kind : str, optional
+            Only tracks of this kind are considered, e.g. 'wave'. All kinds
+            are considered if the value is None (Default is None).
+
+        Raises
+        ------
+        TrackNotFound
+            If no track has the name.
+        DuplicateTrackName
+            If more than one track has the name.
+        """
+
+        track_nums = [track_num for track_num
+                      in self._nums_by_name.get(track_name, ())
+                      if kind is None or self._kinds[track_num] == kind]
+        if not track_nums:
+            raise TrackNotFound('No {}track named "{}"'.format(
+                '' if kind is None else kind + ' ', track_name))
+        if len(track_nums) > 1:
+            raise DuplicateTrackName('Tracks {} are all named "{}"'.format(
+                track_nums, track_name))
+        return track_nums[0]
+
+    def track_nums(self, track_name_list, kind=None):
+        """
+        Returns the numbers of the tracks with the names, in track order.
+
+        Parameters
+        ----------
+        track_name_list : list
+            Names of the tracks.
+        kind : str, optional
+            Only tracks of this kind are considered (Default is None).
+
+        Raises
+        ------
+        TrackNotFound
+            If no track has one of the names.
+        DuplicateTrackName
+            If more than one track has one of the names.
+        """
+
+        return sorted(set(self.track_num(track_name, kind)
+                          for track_name in track_name_list))
+
+    def tracks_of_kind(self, kind):
+        """
+        Returns the numbers of the tracks of one kind, in track order.
+
+        Parameters
+        ----------
+        kind : str
+            Kind of track, e.g. 'wave' or 'label'.
+        """
+
+        return [track_num for track_num, track_kind in enumerate(self._kinds)
+                if track_kind == kind]
+
+    def append(self, track_name, kind):
+        """
+        Records a track added at the end of the track list.
+
+        Parameters
+        ----------
+        track_name : str
+            Name of the new track.
+        kind : str
+            Kind of the new track.
+        """
+
+        self._nums_by_name.setdefault(track_name, []).append(len(self._names))
+        self._names.append(track_name)
+        self._kinds.append(kind)
+
+    def rename(self, track_num, track_name):
+        """
+        Records a track being renamed.
+
+        Parameters
+        ----------
+        track_num : int
+            Number of the track.
+        track_name : str
+            New name of the track.
+        """
+
+        old_nums = self._nums_by_name[self._names[track_num]]
+        old_nums.remove(track_num)
+        if not old_nums:
+            del self._nums_by_name[self._names[track_num]]
+        new_nums = self._nums_by_name.setdefault(track_name, [])
+        new_nums.append(track_num)
+        new_nums.sort()
+        self._names[track_num] = track_name
+
+    def command_sent(self, parsed_command):
+        """
+        Updates the index from a command that was sent to Audacity. Renames
+        and mixes are applied to the tracks the selection tracker has
+        selected, and invalidate the index if the selection is unknown.
+
+        Parameters
+        ----------
+        parsed_command : ParsedCommand
+            The command that was sent to Audacity.
+        """
+
+        if not self.valid:
+            return
+        scripting_id = parsed_command.scripting_id.lower()
+        params = parsed_command.params
+
+        if scripting_id in ('settrackstatus', 'settrack',
+                            'mixandrendertonewtrack'):
+            selected_tracks = (None if self.selection is None
+                               else self.selection.state.tracks)
+            if selected_tracks is None:
+                # The selection is unknown, so renames and mixes cannot be
+                # attributed to tracks.
+                self.valid = False
+            elif scripting_id == 'mixandrendertonewtrack':
+                # Audacity keeps the name when a single track is rendered.
+                if len(selected_tracks) == 1:
+                    mix_track_name = self._names[min(selected_tracks)]
+                else:
+                    mix_track_name = MIX_TRACK_NAME
+                self.append(mix_track_name, 'wave')
+            elif 'Name' in params:
+                for track_num in selected_tracks:
+                    self.rename(track_num, params['Name'])
+        elif 'Tracks' in INVALIDATED_INFO.get(scripting_id,
+                                              PROJECT_INFO_TYPES):
+            if scripting_id != 'settrackaudio':
+                self.valid = False
+
+    def command_failed(self, parsed_command):
+        """
+        Invalidates the index if a command that failed could have renamed,
+        added or removed tracks, since it may have been partly applied.
+
+        Parameters
+        ----------
+        parsed_command : ParsedCommand
+            The command that failed.
+        """
+
+        scripting_id = parsed_command.scripting_id.lower()
+        if scripting_id in ('settrackstatus', 'settrack',
+                            'mixandrendertonewtrack') or (
+                scripting_id != 'settrackaudio' and 'Tracks' in
+                INVALIDATED_INFO.get(scripting_id, PROJECT_INFO_TYPES)):
+            self.valid = False
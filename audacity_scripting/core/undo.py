@@ -0,0 +1,211 @@
+from audacity_scripting import LOGGER_NAME
+from audacity_scripting.core.command import format_command
+from audacity_scripting.core.plan import READ_ONLY_IDS
+from audacity_scripting.core.selection import SELECTION_IDS
+from collections import namedtuple
+import logging
+
+# Try to import psutil to sample the memory use of Audacity
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+logger = logging.getLogger(LOGGER_NAME)
+
+# Ways of keeping the undo history short. 'compact' sends Compact, which
+# discards the undo history, and 'checkpoint' saves the project, closes it
+# and opens it again, which starts a new undo history. Compact is only
+# scriptable in Audacity versions that list it, and may ask for confirmation.
+# A confirmation dialog stops Audacity from replying on the pipe, so a run
+# using 'compact' can hang, and callers have to choose the action.
+UNDO_ACTIONS = ('compact', 'checkpoint')
+
+# Lower case scripting ids of the commands that add nothing to the undo
+# history.
+NO_UNDO_IDS = SELECTION_IDS | READ_ONLY_IDS | frozenset(['export2'])
+
+
+UndoSample = namedtuple('UndoSample', ['operations', 'seconds_per_operation',
+                                       'memory_bytes'])
+UndoSample.__doc__ = """
+A measurement taken after a batch of operations.
+
+Attributes
+----------
+operations : int
+    Operations sent so far under the policy.
+seconds_per_operation : float
+    Mean time per operation of the batch.
+memory_bytes : int
+    Resident memory of the Audacity process, or None if it could not be
+    sampled.
+"""
+
+
+def count_undo_operations(command_list):
+    """
+    Returns the number of commands that add to the undo history.
+
+    Parameters
+    ----------
+    command_list : list
+        Commands sent to Audacity.
+    """
+
+    return sum(1 for command in command_list
+               if command.split(':')[0].strip().lower() not in NO_UNDO_IDS)
+
+
+def audacity_memory_bytes():
+    """
+    Returns the resident memory of the Audacity process in bytes, or None if
+    psutil is not installed or no Audacity process is found.
+    """
+
+    if psutil is None:
+        return None
+    for process in psutil.process_iter(['name', 'memory_info']):
+        name = process.info['name'] or ''
+        if name.lower().startswith('audacity') and process.info[
+                'memory_info'] is not None:
+            return process.info['memory_info'].rss
+    return None
+
+
+class UndoPolicy(object):
+    """
+    A policy that keeps the undo history of a long run of commands short.
+    Every effect adds a step to the undo history, and Audacity keeps the
+    audio of every step, so its memory and disk use grow over thousands of
+    operations. After every N operations the policy asks for the history to
+    be discarded. The time per operation and, if psutil is installed, the
+    memory use of Audacity are sampled after each batch. There is no default
+    action, since Compact may open a confirmation dialog that blocks the
+    scripting pipe until it is dismissed.
+
+    Attributes
+    ----------
+    every : int
+        Number of operations between resets of the undo history. A region
+        is never split, so a reset comes after the first region that
+        reaches the count.
+    action : str
+        One of UNDO_ACTIONS.
+    project_path : str
+        Path the project is saved to and opened from by the 'checkpoint'
+        action.
+    sample_memory : bool
+        Flag to sample the memory use of Audacity after each batch.
+    operations : int
+        Operations sent so far.
+    resets : int
+        Number of times the undo history has been reset.
+    samples : list
+        UndoSample taken after each batch.
+
+    Methods
+    -------
+    reset_commands()
+        Returns the commands that reset the undo history.
+    operations_left()
+        Returns the number of operations left before the next reset.
+    operations_done(command_list, seconds)
+        Records a batch of commands and returns True if a reset is due.
+    reset_done()
+        Records that the undo history has been reset.
+    """
+
+    def __init__(self, action, every=500, project_path=None,
+                 sample_memory=True):
+        """
+        Parameters
+        ----------
+        action : str
+            One of UNDO_ACTIONS. 'checkpoint' never waits for input, while
+            'compact' may ask for confirmation and block the pipe.
+        every : int, optional
+            Number of operations between resets of the undo history, rounded
+            up to the end of a region (Default is 500).
+        project_path : str, optional
+            Path the project is saved to and opened from. Required by the
+            'checkpoint' action (Default is None).
+        sample_memory : bool, optional
+            Flag to sample the memory use of Audacity after each batch
+            (Default is True).
+
+        Raises
+        ------
+        ValueError
+            If the action is unknown, every is less than 1, or the
+            'checkpoint' action has no project path.
+        """
+
+        if action not in UNDO_ACTIONS:
+            raise ValueError('Undo action must be one of {}, not '
+                             '{!r}'.format(UNDO_ACTIONS, action))
+        if every < 1:
+            raise ValueError('Undo policy needs every >= 1')
+        if action == 'checkpoint' and project_path is None:
+            raise ValueError('The checkpoint undo action needs a project '
+                             'path')
+        self.every = every
+        self.action = action
+        self.project_path = project_path
+        self.sample_memory = sample_memory
+        self.operations = 0
+        self.resets = 0
+        self.samples = []
+        self._since_reset = 0
+
+    def reset_commands(self):
+        """
+        Returns the commands that reset the undo history.
+        """
+
+        if self.action == 'compact':
+            return ['Compact:']
+        return [format_command('SaveProject2',
+                               {'Filename': self.project_path}),
+                'Close:',
+                format_command('OpenProject2',
+                               {'Filename': self.project_path})]
+
+    def operations_left(self):
+        """
+        Returns the number of operations left before the next reset of the
+        undo history.
+        """
+
+        return max(self.every - self._since_reset, 0)
+
+    def operations_done(self, command_list, seconds):
+        """
+        Records a batch of commands that has been sent and returns True if
+        the undo history is due to be reset.
+
+        Parameters
+        ----------
+        command_list : list
+            Commands of the batch.
+        seconds : float
+            Time taken to send the batch.
+        """
+
+        count = count_undo_operations(command_list)
+        self.operations += count
+        self._since_reset += count
+        self.samples.append(UndoSample(
+            self.operations, seconds / count if count else 0.0,
+            audacity_memory_bytes() if self.sample_memory else None))
+        return self._since_reset >= self.every
+
+    def reset_done(self):
+        """
+        Records that the undo history has been reset.
+        """
+
+        self.resets += 1
+        self._since_reset = 0
+        logger.info('Reset the undo history with {} after {} '
+                    'operations'.format(self.action, self.operations))
@@ -5,20 +5,133 @@
 # Audacity Scripting Reference:
 # https://manual.audacityteam.org/man/scripting_reference.html
 
-from audacity_scripting.core.base import AudacityScriptingBase
-from math import log10
+from audacity_scripting import LOGGER_NAME
+from audacity_scripting.core.base import (AudacityScriptingBase,
+                                          CommandAssertFailure)
+from audacity_scripting.core.cache import ParseCache
+from audacity_scripting.core.catalog import (CatalogDiskCache, CommandCatalog,
+                                             VERSION_PREFERENCES, catalog_key,
+                                             plugin_fingerprint)
+from audacity_scripting.core.command import (CommandSyntaxError,
+                                             ParsedCommand, format_command,
+                                             parse_command)
+from audacity_scripting.core.export import (DEFAULT_EXPORT_TEMPLATE,
+                                            ExportSummary, check_export_paths,
+                                            export_path, is_up_to_date)
+from audacity_scripting.core.info_cache import InfoCache
+from audacity_scripting.core.lazy import LazyInfo
+from audacity_scripting.core.macros import (MacroCompileError, compile_macro,
+                                            macro_command, write_macro)
+from audacity_scripting.core.model import ProjectModel
+from audacity_scripting.core.plan import CommandPlan, is_read_only
+from audacity_scripting.core.preferences import PreferencesManager
+from audacity_scripting.core.regions import group_tracks_by_region
+from audacity_scripting.core.schema import validate_info
+from audacity_scripting.core.selection import (SelectionTracker,
+                                               select_region_commands)
+from audacity_scripting.core.sweep import (count_gain_changes,
+                                           order_gain_grid)
+from audacity_scripting.core.tracks import TrackIndex
+from audacity_scripting.core.undo import count_undo_operations
+from audacity_scripting.core.validation import (CommandValidationError,
+                                                CommandValidator)
+from audacity_scripting.core.views import ViewRegistry
+from contextlib import contextmanager
+from functools import partial
+import logging
+from time import perf_counter
 
 # TODO(adthomas811): Raise exception if any return type besides json is
 #                    requested in the GetInfo command.
 
+logger = logging.getLogger(LOGGER_NAME)
+
+# Result returned for commands that are skipped because they would not change
+# anything.
+ELIDED_RESPONSE = 'BatchCommand finished: OK\n'
+
+# GetInfo types that describe the project state, used for snapshots.
+SNAPSHOT_INFO_TYPES = ('Tracks', 'Clips', 'Envelopes', 'Labels')
+
 
 class AudacityScriptingUtils(AudacityScriptingBase):
     """
     A class to extend the base Audacity scripting class and add functionality
     to execute commands and process the results.
 
+    Attributes
+    ----------
+    parse_cache : ParseCache
+        Cache of parsed GetInfo results, keyed on a hash of the raw result.
+    validate_info : bool
+        Flag to check the shape of each newly parsed GetInfo result against
+        its schema. Set to True by default.
+    info_cache : InfoCache
+        Cache of GetInfo results for this connection, invalidated by the
+        commands that are sent.
+    command_observers : list
+        Objects whose command_sent(parsed_command) method is called after
+        each command succeeds, and whose command_failed(parsed_command)
+        method is called after a command fails.
+    catalog_cache : CatalogDiskCache
+        On-disk cache of the command catalog.
+    command_validator : CommandValidator
+        Checks commands before they are sent, or None if command validation
+        is not enabled.
+    track_index : TrackIndex
+        Index from track names to track numbers, kept up to date from the
+        commands that are sent.
+    selection : SelectionTracker
+        Model of the current track and time selection, kept up to date from
+        the commands that are sent.
+    elide_redundant_selection : bool
+        Flag to skip selection commands that would not change the known
+        selection. Set to True by default.
+    project_model : ProjectModel
+        In-memory mirror of the project, or None until get_project_model()
+        is called.
+    plan : CommandPlan
+        Commands deferred by the current transaction, or None outside a
+        transaction.
+    preferences : PreferencesManager
+        Cache of preference values that sends only the SetPreference
+        commands needed to reach a desired state.
+    views : ViewRegistry
+        Memoized values derived from GetInfo results, e.g. the gain in dB of
+        each track, recomputed only after their sources change.
+    undo_policy : UndoPolicy
+        Policy the region engines follow to keep the undo history short, or
+        None to leave it alone. Set to None by default.
+
     Methods
     -------
+    enable_command_validation()
+        Checks every command against the command catalog before it is sent.
+    run_command(command)
+        Runs a command, checking it first if command validation is enabled.
+    run_commands(command_list, max_in_flight=16)
+        Runs a batch of commands pipelined, checking the whole batch first if
+        command validation is enabled.
+    preserve_selection()
+        Context manager that restores the selection on exit if it changed.
+    transaction(max_in_flight=16, send=True)
+        Context manager that defers the commands that change the project
+        and sends them as one pipelined batch on exit, or keeps them as a
+        dry-run plan.
+    get_info(info_type)
+        Returns an immutable JSON object containing the requested info,
+        reusing the parsed result if the reply has been seen before.
+    get_info_lazy(info_type)
+        Returns a read-only sequence over the requested info that only
+        parses the elements that are accessed.
+    get_track_index()
+        Returns the track index, building it from the Tracks info if needed.
+    get_project_model(reconcile_every=None)
+        Returns the in-memory mirror of the project, loading it on first use.
+    get_region_index()
+        Returns the label region index shared by every track.
+    get_snapshot(info_types=SNAPSHOT_INFO_TYPES)
+        Returns a dict mapping each GetInfo type to its immutable result.
     get_commands_info()
         Returns a JSON object containing the Commands info.
     get_menus_info()
@@ -35,8 +148,12 @@ class AudacityScriptingUtils(AudacityScriptingBase):
         Returns a JSON object containing the Labels info.
     get_boxes_info()
         Returns a JSON object containing the Boxes info.
-    get_audio_tracks_info(track_name_filter_list=None)
+    get_audio_tracks_info(track_name_filter_list=None, clip_aware=True)
         Returns a list containing useful audio track information.
+    get_preference(name)
+        Returns the current value of one preference.
+    get_command_catalog(refresh=False)
+        Returns the command catalog, loading it from disk when it is current.
     get_scripting_id_list()
         Returns a unique list of scripting ids from the Commands and Menus
         info.
@@ -48,34 +165,78 @@ class AudacityScriptingUtils(AudacityScriptingBase):
         Rename a track based on its ordered track number.
     export_multiple_prompt()
         Open the export multiple prompt.
+    export_regions(track_name_list=None, regions=None,
+                   filename_template=DEFAULT_EXPORT_TEMPLATE,
+                   project_path=None, progress=None, max_in_flight=16)
+        Exports each region of one or more tracks to its own file.
     close_project_prompt()
         Open the close project prompt.
+    apply_effect_by_regions(effect_id, params=None, track_name_list=None,
+                            regions=None, multi_track=False, progress=None,
+                            max_in_flight=16, journal=None)
+        Applies an effect to each region of one or more tracks, planned and
+        sent as pipelined batches.
+    run_region_workflow(steps, track_name_list=None, regions=None,
+                        multi_track=False,
+                        macro_name='audacity_scripting_workflow',
+                        macros_dir=None, progress=None, max_in_flight=16,
+                        journal=None)
+        Applies a sequence of effects to each region, compiled into an
+        Audacity macro when possible.
     normalize_tracks_by_label(track_name_list, peak_level=float(-1),
                               apply_gain=True, rem_dc_offset=True,
-                              stereo_ind=False)
+                              stereo_ind=False, multi_track=False,
+                              journal=None)
         Used to normalize one or more tracks using the labels as boundaries
         between regions.
     compress_tracks_by_label(track_name_list, threshold=float(-12),
                              noise_floor=float(-40), ratio=float(2),
                              attack_time=float(0.2),
                              release_time=float(1), normalize=True,
-                             use_peak=False)
+                             use_peak=False, multi_track=False,
+                             journal=None)
         Used to compress one or more tracks using the labels as boundaries
         between regions.
     get_track_gain(track_name)
         Returns the gain for one track by track name.
+    get_track_gains(track_name_list)
+        Returns the gains of several tracks by track name.
     set_track_gain(track_name, gain)
         Sets the gain for one track by track name.
+    set_track_gains(track_gain_dict)
+        Sets the gains of several tracks by track name in one batch.
     mix_and_render_to_new_track(track_name_list)
         Used to mix and render multiple tracks to a new track.
+    mix_and_render_gain_sweep(track_name_list, gain_grid,
+                              restore_gains=True)
+        Mixes and renders the tracks once for every gain vector in a grid.
     """
 
     def __init__(self):
         """
-        Call parent class init.
+        Call parent class init and create the caches.
         """
 
         super(AudacityScriptingUtils, self).__init__()
+        self.parse_cache = ParseCache()
+        self.validate_info = True
+        self.info_cache = InfoCache()
+        self.command_observers = [self.info_cache]
+        self.catalog_cache = CatalogDiskCache()
+        self._command_catalog = None
+        self._menu_ids = None
+        self.command_validator = None
+        self.selection = SelectionTracker(self._known_track_count,
+                                          self._known_time_span)
+        self.track_index = TrackIndex(self.selection)
+        self.elide_redundant_selection = True
+        self.command_observers.extend([self.track_index, self.selection])
+        self.project_model = None
+        self.plan = None
+        self.preferences = PreferencesManager(self)
+        self.views = ViewRegistry(self.get_info)
+        self.command_observers.append(self.preferences)
+        self.undo_policy = None
 
     def __enter__(self):
         """
@@ -91,6 +252,395 @@ class AudacityScriptingUtils(AudacityScriptingBase):
 
         self.close()
 
+    def enable_command_validation(self):
+        """
+        Loads the command catalog and checks every command against it before
+        it is sent from now on.
+        """
+
+        self.command_validator = CommandValidator(self.get_command_catalog())
+
+    def run_command(self, command):
+        """
+        Writes a command to the Audacity scripting pipe, reads and checks the
+        output, then returns the result. The command is checked against the
+        command catalog first if command validation is enabled. Selection
+        commands that would not change the known selection are skipped and
+        a successful result is returned for them. Inside a transaction,
+        commands other than reads are added to the plan instead, and None is
+        returned.
+
+        Parameters
+        ----------
+        command : str
+            Command to be sent to Audacity.
+
+        Raises
+        ------
+        CommandValidationError
+            If command validation is enabled and the command is not valid.
+        """
+
+        if self.command_validator is not None:
+            self.command_validator.validate(command)
+        if self.plan is not None:
+            if not is_read_only(command):
+                self.plan.add(command)
+                return None
+            self.plan.record_read(command)
+        if self._is_redundant_selection(command):
+            return ELIDED_RESPONSE
+        return super(AudacityScriptingUtils, self).run_command(command)
+
+    def run_commands(self, command_list, max_in_flight=16,
+                     result_read=None):
+        """
+        Writes a batch of commands to the Audacity scripting pipe without
+        waiting for each result, then returns the list of results. If
+        command validation is enabled, the whole batch is checked before any
+        command is sent. Selection commands that would not change the
+        selection left by the commands before them are skipped. Inside a
+        transaction the commands are added to the plan instead, and None is
+        returned.
+
+        Parameters
+        ----------
+        command_list : list
+            Commands to be sent to Audacity, in order.
+        max_in_flight : int, optional
+            Maximum number of commands written before their results are read
+            (Default is 16).
+        result_read : callable, optional
+            Called as result_read(position) with the position of each
+            command in command_list as soon as its result has been read, as
+            long as no command has failed. A skipped command counts as read
+            with the next command that is sent. Never called inside a
+            transaction (Default is None).
+
+        Raises
+        ------
+        CommandValidationError
+            If command validation is enabled and any command is not valid.
+        """
+
+        command_list = list(command_list)
+        if self.command_validator is not None:
+            self.command_validator.validate_all(command_list)
+        if self.plan is not None:
+            self.plan.extend(command_list)
+            return None
+
+        sent_command_list = []
+        sent_positions = []
+        elided_positions = []
+        if self.elide_redundant_selection:
+            # Simulate the batch on a copy of the selection model.
+            selection = SelectionTracker(self._known_track_count,
+                                         self._known_time_span)
+            selection.state = self.selection.state
+            for position, command in enumerate(command_list):
+                parsed_command = self._parse_sent_command(command)
+                if selection.is_redundant(parsed_command):
+                    elided_positions.append(position)
+                else:
+                    sent_command_list.append(command)
+                    sent_positions.append(position)
+                    selection.command_sent(parsed_command)
+            self.selection.elided += len(elided_positions)
+        else:
+            sent_command_list = command_list
+            sent_positions = list(range(len(command_list)))
+
+        reported = [0]
+
+        def sent_result_read(sent_position):
+            # Skipped commands count as read with the next sent command.
+            for position in range(reported[0],
+                                  sent_positions[sent_position] + 1):
+                result_read(position)
+            reported[0] = sent_positions[sent_position] + 1
+
+        results = super(AudacityScriptingUtils, self).run_commands(
+            sent_command_list, max_in_flight,
+            None if result_read is None else sent_result_read)
+        if result_read is not None:
+            for position in range(reported[0], len(command_list)):
+                result_read(position)
+        for position in elided_positions:
+            results.insert(position, ELIDED_RESPONSE)
+        return results
+
+    def _is_redundant_selection(self, command):
+        """
+        Returns True if the command should be skipped because it would not
+        change the known selection.
+
+        Parameters
+        ----------
+        command : str
+            Command to be sent to Audacity.
+        """
+
+        if not self.elide_redundant_selection:
+            return False
+        if self.selection.is_redundant(self._parse_sent_command(command)):
+            logger.info('Skipped redundant command: {}'.format(command))
+            self.selection.elided += 1
+            return True
+        return False
+
+    def _known_track_count(self):
+        """
+        Returns the number of tracks according to the track index, or None
+        if the index is not valid.
+        """
+
+        if self.track_index.valid:
+            return len(self.track_index)
+        return None
+
+    def _known_time_span(self):
+        """
+        Returns the times SelectAll selects according to the project model,
+        or None if the model is not loaded or is stale.
+        """
+
+        if self.project_model is None:
+            return None
+        return self.project_model.known_time_span()
+
+    @contextmanager
+    def preserve_selection(self):
+        """
+        Context manager that records the selection on entry and restores it
+        on exit. Restoring only sends the commands needed to undo the
+        changes, and nothing if the selection did not change. Parts of the
+        selection that were unknown on entry are not restored.
+        """
+
+        saved_state = self.selection.state
+        try:
+            yield self.selection
+        finally:
+            for command in self.selection.restore_commands(saved_state):
+                self.run_command(command)
+
+    @contextmanager
+    def transaction(self, max_in_flight=16, send=True):
+        """
+        Context manager that defers the commands that change the project.
+        Inside the scope, GetInfo results are fetched at most once and
+        describe the project as it was on entry, since none of the deferred
+        commands have been sent yet. On exit the plan is optimized and sent
+        as one pipelined batch, and the results are stored in plan.results.
+        If the scope raises, the plan is discarded and nothing is sent. A
+        transaction entered inside another one joins the outer plan.
+
+        With send set to False the plan is kept instead of sent, as a dry
+        run. It records the reads it depends on, plan.describe(self.latency)
+        predicts its cost, and plan.execute(self) sends it later.
+
+        Parameters
+        ----------
+        max_in_flight : int, optional
+            Maximum number of commands written before their results are read
+            (Default is 16).
+        send : bool, optional
+            Flag to send the plan on exit (Default is True).
+        """
+
+        if self.plan is not None:
+            yield self.plan
+            return
+
+        plan = CommandPlan()
+        self.plan = plan
+        try:
+            yield plan
+        except Exception:
+            logger.info('Discarded {} deferred commands'.format(len(plan)))
+            raise
+        finally:
+            self.plan = None
+
+        if not send:
+            logger.info('Planned {} commands without sending them'.format(
+                len(plan)))
+            return
+        logger.info('Sending {} deferred commands'.format(len(plan)))
+        plan.execute(self, max_in_flight)
+
+    @staticmethod
+    def _parse_sent_command(command):
+        """
+        Parses a command. Commands that cannot be parsed are returned with no
+        parameters, so they are treated as unknown commands.
+
+        Parameters
+        ----------
+        command : str
+            Command sent to Audacity.
+        """
+
+        try:
+            return parse_command(command)
+        except CommandSyntaxError:
+            return ParsedCommand(command, {})
+
+    def _command_finished(self, command, succeeded=True):
+        """
+        Parses a command that was sent and passes it to the command
+        observers. A command that failed may have been partly applied, so
+        the observers forget what it could have changed instead of applying
+        it.
+
+        Parameters
+        ----------
+        command : str
+            Command that was sent to Audacity.
+        succeeded : bool, optional
+            Flag that is False if the command did not succeed (Default is
+            True).
+        """
+
+        parsed_command = self._parse_sent_command(command)
+        for observer in self.command_observers:
+            if succeeded:
+                observer.command_sent(parsed_command)
+            else:
+                observer.command_failed(parsed_command)
+
+    def get_info(self, info_type):
+        """
+        Returns an immutable JSON object containing the requested info,
+        reusing the parsed result if the reply has been seen before. Lists are
+        returned as tuples and dicts as read-only mappings. Newly parsed
+        results are checked against the schema for the type, so callers can
+        index into them without defensive checks.
+
+        Results are also kept in info_cache until a command that can change
+        them is sent, e.g. SetTrackAudio invalidates the Tracks info, so
+        repeated reads of unchanged project state need no round trip.
+
+        Parameters
+        ----------
+        info_type : str
+            Value passed to the Type parameter of the GetInfo command in
+            Audacity, e.g. 'Tracks' or 'Labels'.
+
+        Raises
+        ------
+        SchemaError
+            If validate_info is True and the result does not have the
+            expected shape.
+        """
+
+        if self.plan is not None:
+            self.plan.record_read('GetInfo: Type={}'.format(info_type))
+        info = self.info_cache.get(info_type)
+        if info is None:
+            result = self.run_command('GetInfo: Type={}'.format(info_type))
+            info = self.parse_cache.get(
+                result, lambda raw: self._parse_info(info_type, raw))
+            self.info_cache.put(info_type, info)
+        return info
+
+    def _parse_info(self, info_type, result):
+        """
+        Parses the result of the GetInfo command and checks its shape if
+        validate_info is True.
+
+        Parameters
+        ----------
+        info_type : str
+            Value passed to the Type parameter of the GetInfo command.
+        result : str
+            Result returned from the GetInfo command.
+        """
+
+        info = self.get_json(result)
+        if self.validate_info:
+            validate_info(info_type, info)
+        return info
+
+    def get_info_lazy(self, info_type):
+        """
+        Returns a read-only sequence over the requested info that only
+        parses the elements that are accessed. Suited to exploratory calls,
+        e.g. reading one preference out of the Preferences info with
+        get_info_lazy('Preferences').find('id', '/AudioIO/Host').
+
+        Parameters
+        ----------
+        info_type : str
+            Value passed to the Type parameter of the GetInfo command in
+            Audacity, e.g. 'Preferences' or 'Boxes'.
+        """
+
+        result = self.run_command('GetInfo: Type={}'.format(info_type))
+        return LazyInfo(self.get_json_text(result))
+
+    def get_track_index(self):
+        """
+        Returns the track index, building it from the Tracks info if it has
+        not been built yet or a command has changed the tracks in a way the
+        index does not model.
+        """
+
+        if not self.track_index.valid:
+            self.track_index.rebuild(self.get_info('Tracks'))
+        return self.track_index
+
+    def get_project_model(self, reconcile_every=None):
+        """
+        Returns the in-memory mirror of the project, loading it on first use.
+        From then on it is updated from the commands that are sent, so most
+        queries are answered without a round trip.
+
+        Parameters
+        ----------
+        reconcile_every : int, optional
+            Number of commands after which the next query compares the model
+            with fresh GetInfo results. Only reconciles when
+            ProjectModel.reconcile() is called if the value is None (Default
+            is None).
+        """
+
+        if self.project_model is None:
+            self.project_model = ProjectModel(self, reconcile_every)
+            # The model must see each command before the selection changes.
+            self.command_observers.insert(
+                self.command_observers.index(self.selection),
+                self.project_model)
+            self.project_model.load()
+        else:
+            self.project_model.reconcile_every = reconcile_every
+        return self.project_model
+
+    def get_region_index(self):
+        """
+        Returns the RegionIndex built from the Labels info. The index is
+        shared by every track and only rebuilt when the Labels info changes.
+        """
+
+        return self.views.get('label_regions')
+
+    def get_snapshot(self, info_types=SNAPSHOT_INFO_TYPES):
+        """
+        Returns a dict mapping each GetInfo type to its immutable result. Two
+        snapshots can be compared with diff_snapshots from
+        audacity_scripting.core.diff.
+
+        Parameters
+        ----------
+        info_types : tuple, optional
+            The GetInfo types to include in the snapshot (Default is
+            SNAPSHOT_INFO_TYPES).
+        """
+
+        return {info_type: self.get_info(info_type)
+                for info_type in info_types}
+
     def get_commands_info(self):
         """
         Returns a JSON object containing the Commands info.
@@ -155,10 +705,12 @@ class AudacityScriptingUtils(AudacityScriptingBase):
         result = self.run_command('GetInfo: Type=Boxes')
         return self.get_json(result)
 
-    # TODO(adthomas811): Handle zero or more than one label tracks.
-    def get_audio_tracks_info(self, track_name_filter_list=None):
+    def get_audio_tracks_info(self, track_name_filter_list=None,
+                              clip_aware=True):
         """
-        Returns a list containing useful audio track information.
+        Returns a list containing useful audio track information. The
+        'labels' of each track are its regions, bounded by the labels of
+        every label track and by the track's own start and end.
 
         Parameters
         ----------
@@ -167,66 +719,114 @@ class AudacityScriptingUtils(AudacityScriptingBase):
             Track information is returned if the track name is present in the
             list. Information for all audio tracks is returned if the value of
             the list is None (Default is None).
+        clip_aware : bool, optional
+            Whether the gaps between the clips of each track also bound its
+            regions, so that the gaps, which hold no audio, are left out of
+            its regions. Clips that touch are treated as one, so they do not
+            cut a region (Default is True).
+
+        Raises
+        ------
+        TrackNotFound
+            If no audio track has one of the names in the filter list.
+        DuplicateTrackName
+            If more than one audio track has one of the names in the filter
+            list.
         """
 
-        tracks_info = self.get_tracks_info()
-        labels_info = self.get_labels_info()
+        tracks_info = self.get_info('Tracks')
         tracks_list = []
 
-        for track_num in range(len(tracks_info)):
-            if tracks_info[track_num]['kind'] == 'wave':
-                if (track_name_filter_list is None or
-                        tracks_info[track_num]['name']
-                        in track_name_filter_list):
-                    track_dict = {}
-                    track_dict['track_num'] = track_num
-                    track_dict['name'] = tracks_info[track_num]['name']
-
-                    voltage_ratio_gain = tracks_info[track_num]['gain']
-                    track_dict['gain'] = round(20 * log10(voltage_ratio_gain),
-                                               4)
-
-                    boundary_timestamps = []
-                    boundary_timestamps.append(tracks_info[track_num]['start'])
-                    for label_info in labels_info[0][1]:
-                        boundary_timestamps.append((label_info[0] +
-                                                    label_info[1])/2)
-                    boundary_timestamps.append(tracks_info[track_num]['end'])
-
-                    track_dict['labels'] = []
-                    for i in range(len(boundary_timestamps)-1):
-                        label_dict = {}
-                        label_dict['start'] = boundary_timestamps[i]
-                        label_dict['end'] = boundary_timestamps[i+1]
-                        track_dict['labels'].append(label_dict)
-                    tracks_list.append(track_dict)
+        track_index = self.get_track_index()
+        if len(track_index) != len(tracks_info):
+            track_index.rebuild(tracks_info)
+        if track_name_filter_list is None:
+            track_nums = track_index.tracks_of_kind('wave')
+        else:
+            track_nums = track_index.track_nums(track_name_filter_list,
+                                                'wave')
+
+        track_gains_db = self.views.get('track_gains_db')
+        region_index = self.get_region_index()
+        if clip_aware:
+            track_clips = self.views.get('track_clips')
+        for track_num in track_nums:
+            track_dict = {}
+            track_dict['track_num'] = track_num
+            track_dict['name'] = tracks_info[track_num]['name']
+
+            track_dict['gain'] = track_gains_db[track_num]
+
+            if clip_aware:
+                track_dict['labels'] = region_index.audio_regions(
+                    track_clips.get(track_num, ()))
+            else:
+                track_dict['labels'] = region_index.track_regions(
+                    tracks_info[track_num]['start'],
+                    tracks_info[track_num]['end'])
+            tracks_list.append(track_dict)
         return tracks_list
 
-    def get_scripting_id_list(self):
+    def get_preference(self, name):
         """
-        Returns a unique list of scripting ids from the Commands and Menus
-        info.
+        Returns the current value of one preference as a string.
+
+        Parameters
+        ----------
+        name : str
+            Path of the preference, e.g. '/AudioIO/LatencyDuration'.
         """
 
-        commands_info = self.get_commands_info()
-        menus_info = self.get_menus_info()
-        raw_scripting_id_list = []
+        result = self.run_command('GetPreference: Name="{}"'.format(name))
+        return '\n'.join(result.split('\n')[:-2])
 
-        for command_info in commands_info:
-            raw_scripting_id_list.append(command_info['id'])
+    def get_command_catalog(self, refresh=False):
+        """
+        Returns the command catalog. The catalog is keyed by the Audacity
+        version and the installed plug-ins, which are probed with a few
+        GetPreference commands and a local directory listing. The Commands
+        and Menus info is only fetched if there is no cached catalog for the
+        key.
 
-        for menu_info in menus_info:
-            if 'id' in menu_info.keys():
-                raw_scripting_id_list.append(menu_info['id'])
+        Parameters
+        ----------
+        refresh : bool, optional
+            Flag to rebuild the catalog even if a cached one is current
+            (Default is False).
+        """
 
-        raw_scripting_id_list = list(set(raw_scripting_id_list))
+        if self._command_catalog is not None and not refresh:
+            return self._command_catalog
+
+        version = '.'.join(self.get_preference(name)
+                           for name in VERSION_PREFERENCES)
+        key = catalog_key(version, plugin_fingerprint())
+
+        catalog = None
+        if not refresh:
+            catalog = self.catalog_cache.load(key)
+        if catalog is None:
+            catalog = CommandCatalog.from_info(
+                key, self.stream_json('GetInfo: Type=Commands'),
+                self.stream_json('GetInfo: Type=Menus'))
+            if self.plan is None:
+                self.catalog_cache.save(catalog)
+            else:
+                # Saved when the plan is sent, so a dry run writes nothing.
+                self.plan.before_send.append(partial(self.catalog_cache.save,
+                                                     catalog))
+
+        self._command_catalog = catalog
+        self._menu_ids = None
+        return catalog
 
-        scripting_id_list = []
-        for scripting_id in raw_scripting_id_list:
-            if '\\' not in scripting_id:
-                scripting_id_list.append(scripting_id)
+    def get_scripting_id_list(self):
+        """
+        Returns a unique list of scripting ids from the Commands and Menus
+        info, using the cached command catalog when it is current.
+        """
 
-        return scripting_id_list
+        return list(self.get_command_catalog().scripting_ids)
 
     def join_all_clips(self):
         """
@@ -273,6 +873,111 @@ class AudacityScriptingUtils(AudacityScriptingBase):
         self.run_command('SelectNone:')
         self.run_command('ExportMultiple:')
 
+    def export_regions(self, track_name_list=None, regions=None,
+                       filename_template=DEFAULT_EXPORT_TEMPLATE,
+                       project_path=None, progress=None, max_in_flight=16):
+        """
+        Exports each region of one or more tracks to its own file without
+        the Export Multiple prompt. The Select and Export2 commands for each
+        region are sent as pipelined batches. Returns an ExportSummary with
+        the exported and skipped paths and the regions exported per second.
+        Inside a transaction the commands are only deferred, so the seconds
+        and rate are None and the throughput is logged once the plan is
+        sent.
+
+        Parameters
+        ----------
+        track_name_list : list, optional
+            The track names of the tracks to be exported. All audio tracks
+            are exported if the value is None (Default is None).
+        regions : list, optional
+            (start, end) times exported from every track. The label regions
+            of each track are used if the value is None (Default is None).
+        filename_template : str, optional
+            str.format() template for the path of each file, with the fields
+            track, index (starting at 1 for each track), start and end
+            (Default is DEFAULT_EXPORT_TEMPLATE).
+        project_path : str, optional
+            Path of the saved project. Regions whose file already exists and
+            is newer than the project are skipped. Every region is exported
+            if the value is None (Default is None).
+        progress : callable, optional
+            Called as progress(done, total) after each batch of regions has
+            been exported (Default is None).
+        max_in_flight : int, optional
+            Maximum number of regions per batch, and of commands written
+            before their results are read (Default is 16).
+
+        Raises
+        ------
+        ExportPathError
+            If a path cannot be written. No region is exported.
+        CommandAssertFailure
+            If a selection or export command does not succeed.
+        """
+
+        region_groups = self._region_groups(track_name_list, regions, False)
+        tracks_info = self.get_info('Tracks')
+        track_counts = {}
+        region_paths = []
+        for (start, end), track_nums in region_groups:
+            track_num = track_nums[0]
+            track_counts[track_num] = track_counts.get(track_num, 0) + 1
+            region_paths.append(export_path(
+                filename_template, tracks_info[track_num]['name'],
+                track_counts[track_num], start, end))
+        check_export_paths(region_paths)
+
+        exported = []
+        skipped = []
+        region_commands = []
+        for ((start, end), track_nums), path in zip(region_groups,
+                                                    region_paths):
+            if is_up_to_date(path, project_path):
+                skipped.append(path)
+                continue
+            exported.append(path)
+            region_commands.append(
+                select_region_commands(track_nums, start, end) +
+                [format_command('Export2', {
+                    'Filename': path,
+                    'NumChannels': tracks_info[track_nums[0]].get(
+                        'channels', 1)})])
+
+        start_time = perf_counter()
+        self._run_region_batches(region_commands, progress, max_in_flight)
+        if self.plan is not None:
+            # The commands were only deferred, so the throughput is logged
+            # once the plan has been sent.
+            plan = self.plan
+            plan.after_send.append(lambda: self._export_summary(
+                exported, skipped, plan.seconds))
+            return ExportSummary(exported, skipped, None, None)
+        return self._export_summary(exported, skipped,
+                                    perf_counter() - start_time)
+
+    @staticmethod
+    def _export_summary(exported, skipped, seconds):
+        """
+        Logs the export throughput and returns the ExportSummary.
+
+        Parameters
+        ----------
+        exported : list
+            Paths of the files that were exported.
+        skipped : list
+            Paths of the files that were already up to date.
+        seconds : float
+            Time taken to send the export commands.
+        """
+
+        regions_per_second = len(exported) / seconds if exported else 0
+        logger.info('Exported {} regions in {:.2f} s ({:.1f} regions/s), '
+                    'skipped {} up to date'.format(
+                        len(exported), seconds, regions_per_second,
+                        len(skipped)))
+        return ExportSummary(exported, skipped, seconds, regions_per_second)
+
     def close_project_prompt(self):
         """
         Open the close project prompt.
@@ -281,14 +986,516 @@ class AudacityScriptingUtils(AudacityScriptingBase):
         self.run_command('SelectNone:')
         self.run_command('Close:')
 
+    def apply_effect_by_regions(self, effect_id, params=None,
+                                track_name_list=None, regions=None,
+                                multi_track=False, progress=None,
+                                max_in_flight=16, journal=None):
+        """
+        Applies an effect to each region of one or more tracks. The selection
+        and effect commands are planned up front and sent as pipelined
+        batches, with selection commands that would not change the selection
+        skipped.
+
+        With multi_track set, every track that shares a region is selected at
+        once and processed by one effect command. Audacity applies effects
+        such as Normalize, Compressor and Amplify to each selected track
+        separately, so the result is the same as one command per track.
+        Effects that work across tracks, such as AutoDuck or
+        TruncateSilence, give different results, so callers opt in.
+
+        Parameters
+        ----------
+        effect_id : str
+            Scripting id of the effect, e.g. 'Normalize' or 'Amplify'.
+        params : dict, optional
+            Parameters of the effect command (Default is None).
+        track_name_list : list, optional
+            The track names of the tracks to be processed. All audio tracks
+            are processed if the value is None (Default is None).
+        regions : list, optional
+            (start, end) times applied to every track. The label regions of
+            each track are used if the value is None (Default is None).
+        multi_track : bool, optional
+            Flag to process every track that shares a region with one effect
+            command (Default is False).
+        progress : callable, optional
+            Called as progress(done, total) after each batch of regions has
+            been processed (Default is None).
+        max_in_flight : int, optional
+            Maximum number of regions per batch, and of commands written
+            before their results are read (Default is 16).
+        journal : JobJournal, optional
+            Checkpoint journal. Regions it records as done are skipped, and
+            each region is recorded as soon as Audacity confirms its effect,
+            so no finished region is repeated after a failure. Nothing is
+            recorded for commands deferred by a transaction (Default is
+            None).
+
+        Raises
+        ------
+        CommandValidationError
+            If command validation is enabled and the effect command is not
+            valid.
+        CommandAssertFailure
+            If an effect or selection command does not succeed. The commands
+            already in flight are read first, and the selection is cleared.
+        """
+
+        effect_commands = [format_command(effect_id, params)]
+        self._check_effect_commands(effect_commands)
+        region_groups = self._region_groups(track_name_list, regions,
+                                            multi_track)
+        region_groups = self._pending_region_groups(region_groups,
+                                                    effect_commands, journal)
+        self._run_region_steps(effect_commands, region_groups, progress,
+                               max_in_flight, journal)
+        return len(region_groups)
+
+    def run_region_workflow(self, steps, track_name_list=None, regions=None,
+                            multi_track=False,
+                            macro_name='audacity_scripting_workflow',
+                            macros_dir=None, progress=None,
+                            max_in_flight=16, journal=None):
+        """
+        Applies a sequence of effects to each region of one or more tracks,
+        e.g. Normalize then Compressor on every label region. The workflow is
+        compiled into an Audacity macro, which runs every region with a
+        single command. If the workflow cannot be expressed as a macro, or
+        Audacity does not list the macro yet (it only reads new macro files
+        when its Macros menu is rebuilt), or an undo policy is set, the
+        commands are sent from Python as pipelined batches instead. Returns
+        True if the macro was run.
+
+        Parameters
+        ----------
+        steps : list
+            (effect_id, params) pairs, applied in order to each region.
+        track_name_list : list, optional
+            The track names of the tracks to be processed. All audio tracks
+            are processed if the value is None (Default is None).
+        regions : list, optional
+            (start, end) times applied to every track. The label regions of
+            each track are used if the value is None (Default is None).
+        multi_track : bool, optional
+            Flag to process every track that shares a region with one command
+            per step (Default is False).
+        macro_name : str, optional
+            Name of the macro file (Default is
+            'audacity_scripting_workflow').
+        macros_dir : str, optional
+            Directory to write the macro to. Uses the Macros directory of the
+            Audacity data directory if the value is None (Default is None).
+        progress : callable, optional
+            Called as progress(done, total) as regions are processed
+            (Default is None).
+        max_in_flight : int, optional
+            Maximum number of regions per batch when falling back to sending
+            the commands (Default is 16).
+        journal : JobJournal, optional
+            Checkpoint journal. Regions it records as done are left out of
+            the workflow, and the rest are recorded once they are done
+            (Default is None).
+
+        Raises
+        ------
+        CommandValidationError
+            If command validation is enabled and an effect command is not
+            valid.
+        CommandAssertFailure
+            If the macro or a command does not succeed.
+        """
+
+        effect_commands = [format_command(effect_id, params)
+                           for effect_id, params in steps]
+        self._check_effect_commands(effect_commands)
+        region_groups = self._region_groups(track_name_list, regions,
+                                            multi_track)
+        region_groups = self._pending_region_groups(region_groups,
+                                                    effect_commands, journal)
+
+        command_list = ['SelectNone:']
+        for (start, end), track_nums in region_groups:
+            command_list.extend(select_region_commands(track_nums, start,
+                                                       end))
+            command_list.extend(effect_commands)
+        command_list.append('SelectNone:')
+        if self.undo_policy is not None:
+            # A macro adds an undo step for every region with no chance to
+            # reset the history in between.
+            logger.info('Running the workflow without a macro to follow the '
+                        'undo policy')
+        elif self._run_workflow_macro(command_list, macro_name, macros_dir):
+            self._record_region_steps(journal, region_groups,
+                                      effect_commands)
+            if progress is not None:
+                progress(len(region_groups), len(region_groups))
+            return True
+
+        self._run_region_steps(effect_commands, region_groups, progress,
+                               max_in_flight, journal)
+        return False
+
+    def _run_workflow_macro(self, command_list, macro_name, macros_dir):
+        """
+        Writes the commands of a workflow as a macro and runs it if Audacity
+        lists it. Returns True if the macro was run.
+
+        Parameters
+        ----------
+        command_list : list
+            Commands of the workflow.
+        macro_name : str
+            Name of the macro file.
+        macros_dir : str
+            Directory to write the macro to, or None for the Macros
+            directory of the Audacity data directory.
+        """
+
+        try:
+            macro_text = compile_macro(command_list)
+            if self.plan is None:
+                write_macro(macro_name, macro_text, macros_dir)
+            else:
+                # Written when the plan is sent, so a dry run writes nothing.
+                self.plan.before_send.append(partial(
+                    write_macro, macro_name, macro_text, macros_dir))
+        except (MacroCompileError, OSError) as err:
+            logger.info('Running the workflow without a macro: '
+                        '{}'.format(err))
+            return False
+        if not self._macro_known(macro_name):
+            logger.info('Macro {} is not listed by Audacity yet, running the '
+                        'workflow without it'.format(macro_name))
+            return False
+        self.run_command(macro_command(macro_name))
+        return True
+
+    def _check_effect_commands(self, effect_commands):
+        """
+        Checks the effect commands against the command catalog before any
+        region is selected, if command validation is enabled.
+
+        Parameters
+        ----------
+        effect_commands : list
+            Effect commands applied to each region.
+
+        Raises
+        ------
+        CommandValidationError
+            If command validation is enabled and an effect command is not
+            valid.
+        """
+
+        if self.command_validator is not None:
+            self.command_validator.validate_all(effect_commands)
+
+    def _macro_known(self, macro_name):
+        """
+        Returns True if Audacity lists the macro, checking the command
+        catalog first and then the Menus info. The menu ids are read once
+        for each catalog load, so a macro Audacity lists later is only found
+        after get_command_catalog(refresh=True).
+
+        Parameters
+        ----------
+        macro_name : str
+            Name of the macro.
+        """
+
+        macro_id = macro_command(macro_name)[:-1].lower()
+        if macro_id in {scripting_id.lower() for scripting_id
+                        in self.get_command_catalog().scripting_ids}:
+            return True
+        if self._menu_ids is None:
+            self._menu_ids = frozenset(
+                menu_info.get('id', '').lower()
+                for menu_info in self.stream_json('GetInfo: Type=Menus'))
+        return macro_id in self._menu_ids
+
+    def _region_groups(self, track_name_list, regions, multi_track):
+        """
+        Returns a list of ((start, end), track_nums) pairs for the regions to
+        be processed, after clearing the selection.
+
+        Parameters
+        ----------
+        track_name_list : list
+            The track names of the tracks to be processed, or None for all
+            audio tracks.
+        regions : list
+            (start, end) times applied to every track, or None for the label
+            regions of each track. Regions that overlap none of a track's
+            clips are skipped for that track.
+        multi_track : bool
+            Flag to group the tracks that share each region.
+        """
+
+        self.run_command('SelectNone:')
+        audio_tracks_info = self.get_audio_tracks_info(track_name_list)
+        if regions is not None:
+            track_clips = self.views.get('track_clips')
+            audio_tracks_info = [
+                dict(audio_track_info, labels=[
+                    {'start': start, 'end': end} for start, end in regions
+                    if any(clip_start < end and start < clip_end
+                           for clip_start, clip_end in track_clips.get(
+                               audio_track_info['track_num'], ()))])
+                for audio_track_info in audio_tracks_info]
+        if multi_track:
+            return group_tracks_by_region(audio_tracks_info)
+        return [((label['start'], label['end']),
+                 [audio_track_info['track_num']])
+                for audio_track_info in audio_tracks_info
+                for label in audio_track_info['labels']]
+
+    def _region_steps(self, region_groups, effect_commands):
+        """
+        Returns the (track_name, start, end, command) steps of region groups
+        for a checkpoint journal.
+
+        Parameters
+        ----------
+        region_groups : list
+            ((start, end), track_nums) pairs.
+        effect_commands : list
+            Effect commands applied to each region.
+        """
+
+        tracks_info = self.get_info('Tracks')
+        return [(tracks_info[track_num]['name'], start, end, command)
+                for (start, end), track_nums in region_groups
+                for track_num in track_nums
+                for command in effect_commands]
+
+    def _pending_region_groups(self, region_groups, effect_commands,
+                               journal):
+        """
+        Returns the region groups with the tracks whose steps the journal
+        records as done left out, after forgetting the journal steps of
+        these tracks and effect commands whose regions are not in the
+        project any more.
+
+        Parameters
+        ----------
+        region_groups : list
+            ((start, end), track_nums) pairs.
+        effect_commands : list
+            Effect commands applied to each region.
+        journal : JobJournal
+            Checkpoint journal, or None to return every region group.
+        """
+
+        if journal is None:
+            return region_groups
+        tracks_info = self.get_info('Tracks')
+        verify = partial(journal.verify, set(self._region_steps(
+            region_groups, effect_commands)))
+        if self.plan is None:
+            verify()
+        else:
+            # Stale steps never match a current region, so forgetting them
+            # can wait until the plan is sent and a dry run writes nothing.
+            self.plan.before_send.append(verify)
+
+        pending_groups = []
+        for (start, end), track_nums in region_groups:
+            pending_nums = [
+                track_num for track_num in track_nums
+                if not all(journal.is_done(tracks_info[track_num]['name'],
+                                           start, end, command)
+                           for command in effect_commands)]
+            if pending_nums:
+                pending_groups.append(((start, end), pending_nums))
+        if len(pending_groups) < len(region_groups):
+            logger.info('Resuming from journal {}: {} of {} regions left'
+                        .format(journal.path, len(pending_groups),
+                                len(region_groups)))
+        return pending_groups
+
+    def _record_region_steps(self, journal, region_groups, effect_commands):
+        """
+        Records the steps of region groups that have been processed in the
+        journal, unless the commands were deferred by a transaction.
+
+        Parameters
+        ----------
+        journal : JobJournal
+            Checkpoint journal, or None to record nothing.
+        region_groups : list
+            ((start, end), track_nums) pairs.
+        effect_commands : list
+            Effect commands applied to each region.
+        """
+
+        if journal is not None and self.plan is None:
+            journal.record(self._region_steps(region_groups,
+                                              effect_commands))
+
+    def _run_region_steps(self, effect_commands, region_groups, progress,
+                          max_in_flight, journal=None):
+        """
+        Sends the selection and effect commands for each region group as
+        pipelined batches, then clears the selection.
+
+        Parameters
+        ----------
+        effect_commands : list
+            Effect commands applied in order to each region.
+        region_groups : list
+            ((start, end), track_nums) pairs.
+        progress : callable
+            Called as progress(done, total) after each batch, or None.
+        max_in_flight : int
+            Maximum number of regions per batch.
+        journal : JobJournal, optional
+            Journal each region group is recorded in as soon as its last
+            effect command has succeeded (Default is None).
+        """
+
+        # Commands deferred by a transaction are not recorded. The steps are
+        # worked out before sending, since no info can be read while results
+        # are in flight.
+        record = journal is not None and self.plan is None
+        region_steps = [self._region_steps([region_group], effect_commands)
+                        for region_group in region_groups] if record else []
+
+        def record_region(position):
+            journal.record(region_steps[position])
+
+        self._run_region_batches(
+            [select_region_commands(track_nums, start, end) + effect_commands
+             for (start, end), track_nums in region_groups],
+            progress, max_in_flight, record_region if record else None)
+
+    def _check_undo_policy(self, region_commands):
+        """
+        Raises CommandValidationError if the undo policy would reset the
+        undo history with a command that is not in the command catalog.
+
+        Parameters
+        ----------
+        region_commands : list
+            The list of commands for each region.
+        """
+
+        policy = self.undo_policy
+        if policy is None or self.plan is not None or not any(
+                count_undo_operations(command_list)
+                for command_list in region_commands):
+            return
+        scripting_ids = {scripting_id.lower() for scripting_id
+                         in self.get_command_catalog().scripting_ids}
+        for command in policy.reset_commands():
+            scripting_id = parse_command(command).scripting_id
+            if scripting_id.lower() not in scripting_ids:
+                raise CommandValidationError(
+                    'Audacity has no {} command for the {} undo '
+                    'action'.format(scripting_id, policy.action))
+
+    def _undo_operations_left(self):
+        """
+        Returns the number of operations left before the undo policy resets
+        the undo history, or None if no policy is followed.
+        """
+
+        if self.undo_policy is None or self.plan is not None:
+            return None
+        return self.undo_policy.operations_left()
+
+    def _follow_undo_policy(self, command_list, seconds):
+        """
+        Records a batch with the undo policy and resets the undo history if
+        it is due. Commands deferred by a transaction are not counted.
+
+        Parameters
+        ----------
+        command_list : list
+            Commands of the batch.
+        seconds : float
+            Time taken to send the batch.
+        """
+
+        policy = self.undo_policy
+        if policy is None or self.plan is not None:
+            return
+        if policy.operations_done(command_list, seconds):
+            self.run_commands(policy.reset_commands())
+            policy.reset_done()
+
+    def _run_region_batches(self, region_commands, progress, max_in_flight,
+                            region_done=None):
+        """
+        Sends the commands of each region as pipelined batches, then clears
+        the selection. If an undo policy is set, a batch ends at the first
+        region after which a reset is due.
+
+        Parameters
+        ----------
+        region_commands : list
+            The list of commands for each region.
+        progress : callable
+            Called as progress(done, total) after each batch, or None.
+        max_in_flight : int
+            Maximum number of regions per batch.
+        region_done : callable, optional
+            Called as region_done(position) with the position of each region
+            as soon as the result of its last command has been read, if no
+            command has failed (Default is None).
+        """
+
+        self._check_undo_policy(region_commands)
+        try:
+            batch_start = 0
+            while batch_start < len(region_commands):
+                # A batch also ends once the undo policy is due, so resets
+                # are not put off until the end of a full batch.
+                operations_left = self._undo_operations_left()
+                command_list = []
+                region_ends = {}
+                batch_end = batch_start
+                while batch_end < len(region_commands) and (
+                        batch_end == batch_start or
+                        batch_end - batch_start < max_in_flight and
+                        (operations_left is None or
+                         count_undo_operations(command_list) <
+                         operations_left)):
+                    command_list.extend(region_commands[batch_end])
+                    region_ends[len(command_list) - 1] = batch_end
+                    batch_end += 1
+
+                def result_read(command_position, region_ends=region_ends):
+                    if command_position in region_ends:
+                        region_done(region_ends[command_position])
+                start_time = perf_counter()
+                self.run_commands(
+                    command_list, max_in_flight,
+                    None if region_done is None else result_read)
+                self._follow_undo_policy(command_list,
+                                         perf_counter() - start_time)
+                if progress is not None:
+                    progress(batch_end, len(region_commands))
+                batch_start = batch_end
+        except CommandAssertFailure:
+            logger.info('Stopped after the regions in flight')
+            raise
+        finally:
+            self.run_command('SelectNone:')
+
     # TODO(adthomas811): Rename to normalize_tracks_by_labels.
     def normalize_tracks_by_label(self, track_name_list, peak_level=float(-1),
                                   apply_gain=True, rem_dc_offset=True,
-                                  stereo_ind=False):
+                                  stereo_ind=False, multi_track=False,
+                                  journal=None):
         """
         Used to normalize one or more tracks using the labels as boundaries
         between regions.
 
+        With multi_track set, every track that shares a region is selected
+        at once and normalized by one Normalize command, which Audacity
+        applies to each selected track separately. A project with T tracks
+        then needs about T times fewer commands.
+
         Parameters
         ----------
         track_name_list : list
@@ -305,33 +1512,27 @@ class AudacityScriptingUtils(AudacityScriptingBase):
         stereo_ind : bool, optional
             Value passed to the StereoIndependent parameter of the Normalize
             command in Audacity. (Default is False).
+        multi_track : bool, optional
+            Flag to normalize every track that shares a region with one
+            Normalize command. (Default is False).
+        journal : JobJournal, optional
+            Checkpoint journal to resume from and record the normalized
+            regions in. (Default is None).
         """
 
-        self.run_command('SelectNone:')
-        audio_tracks_info = self.get_audio_tracks_info(track_name_list)
-
-        for audio_track_info in audio_tracks_info:
-            track_num = audio_track_info['track_num']
-            for label in audio_track_info['labels']:
-                self.run_command('Select: Mode=Set Track={} '
-                                 'Start={} End={}'.format(track_num,
-                                                          label['start'],
-                                                          label['end']))
-                self.run_command('Normalize: PeakLevel={} ApplyGain={} '
-                                 'RemoveDcOffset={} '
-                                 'StereoIndependent={}'.format(peak_level,
-                                                               apply_gain,
-                                                               rem_dc_offset,
-                                                               stereo_ind))
-
-        self.run_command('SelectNone:')
+        self.apply_effect_by_regions(
+            'Normalize', {'PeakLevel': peak_level, 'ApplyGain': apply_gain,
+                          'RemoveDcOffset': rem_dc_offset,
+                          'StereoIndependent': stereo_ind},
+            track_name_list, multi_track=multi_track, journal=journal)
 
     # TODO(adthomas811): Rename to compress_tracks_by_labels.
     def compress_tracks_by_label(self, track_name_list, threshold=float(-12),
                                  noise_floor=float(-40), ratio=float(2),
                                  attack_time=float(0.2),
                                  release_time=float(1), normalize=True,
-                                 use_peak=False):
+                                 use_peak=False, multi_track=False,
+                                 journal=None):
         """
         Used to compress one or more tracks using the labels as boundaries
         between regions.
@@ -361,29 +1562,21 @@ class AudacityScriptingUtils(AudacityScriptingBase):
         use_peak : bool, optional
             Value passed to the UsePeak parameter of the Compressor command
             in Audacity. (Default is False).
+        multi_track : bool, optional
+            Flag to compress every track that shares a region with one
+            Compressor command. (Default is False).
+        journal : JobJournal, optional
+            Checkpoint journal to resume from and record the compressed
+            regions in. (Default is None).
         """
 
-        self.run_command('SelectNone:')
-        audio_tracks_info = self.get_audio_tracks_info(track_name_list)
-
-        for audio_track_info in audio_tracks_info:
-            track_num = audio_track_info['track_num']
-            for label in audio_track_info['labels']:
-                self.run_command('Select: Mode=Set Track={} '
-                                 'Start={} End={}'.format(track_num,
-                                                          label['start'],
-                                                          label['end']))
-                self.run_command('Compressor: Threshold={} NoiseFloor={} '
-                                 'Ratio={} AttackTime={} ReleaseTime={} '
-                                 'Normalize={} '
-                                 'UsePeak={}'.format(threshold, noise_floor,
-                                                     ratio, attack_time,
-                                                     release_time, normalize,
-                                                     use_peak))
+        self.apply_effect_by_regions(
+            'Compressor', {'Threshold': threshold, 'NoiseFloor': noise_floor,
+                           'Ratio': ratio, 'AttackTime': attack_time,
+                           'ReleaseTime': release_time,
+                           'Normalize': normalize, 'UsePeak': use_peak},
+            track_name_list, multi_track=multi_track, journal=journal)
 
-        self.run_command('SelectNone:')
-
-    # TODO(adthomas811): Check that only one track is returned.
     def get_track_gain(self, track_name):
         """
         Returns the gain for one track by track name.
@@ -392,13 +1585,41 @@ class AudacityScriptingUtils(AudacityScriptingBase):
         ----------
         track_name : str
             Name of the track to return the gain of.
+
+        Raises
+        ------
+        TrackNotFound
+            If no audio track has the name.
+        DuplicateTrackName
+            If more than one audio track has the name.
+        """
+
+        return self.get_track_gains([track_name])[track_name]
+
+    def get_track_gains(self, track_name_list):
         """
+        Returns a dict mapping each track name to the gain of the track in
+        dB, read from one Tracks info.
 
-        audio_tracks_info = self.get_audio_tracks_info([track_name])
+        Parameters
+        ----------
+        track_name_list : list
+            Names of the tracks to return the gains of.
+
+        Raises
+        ------
+        TrackNotFound
+            If no audio track has one of the names.
+        DuplicateTrackName
+            If more than one audio track has one of the names.
+        """
 
-        return audio_tracks_info[0]['gain']
+        track_index = self.get_track_index()
+        track_gains_db = self.views.get('track_gains_db')
+        return {track_name: track_gains_db[track_index.track_num(track_name,
+                                                                 'wave')]
+                for track_name in track_name_list}
 
-    # TODO(adthomas811): Check that only one track is returned.
     def set_track_gain(self, track_name, gain):
         """
         Sets the gain for one track by track name.
@@ -409,18 +1630,60 @@ class AudacityScriptingUtils(AudacityScriptingBase):
             Name of the track to set the gain of.
         gain : float
             Gain to be set on the track.
+
+        Raises
+        ------
+        TrackNotFound
+            If no audio track has the name.
+        DuplicateTrackName
+            If more than one audio track has the name.
         """
 
-        self.run_command('SelectNone:')
-        audio_tracks_info = self.get_audio_tracks_info([track_name])
+        self.set_track_gains({track_name: gain})
 
-        track_num = audio_tracks_info[0]['track_num']
+    def set_track_gains(self, track_gain_dict):
+        """
+        Sets the gains of several tracks by track name with one pipelined
+        batch, skipping the tracks that already have the requested gain.
+        Returns a dict mapping the name of each changed track to its previous
+        gain, which can be passed back to restore them.
 
-        self.run_command('SelectTracks: '
-                         'Mode=Set Track={}'.format(track_num))
-        self.run_command('SetTrackAudio: Gain={}'.format(gain))
+        Parameters
+        ----------
+        track_gain_dict : dict
+            Maps each track name to the gain in dB to be set on it.
+
+        Raises
+        ------
+        TrackNotFound
+            If no audio track has one of the names.
+        DuplicateTrackName
+            If more than one audio track has one of the names.
+        """
 
-        self.run_command('SelectNone:')
+        track_index = self.get_track_index()
+        track_gains_db = self.views.get('track_gains_db')
+        # Gains set earlier in the same transaction have not been sent yet.
+        pending_gains = {} if self.plan is None else self.plan.track_gains
+
+        previous_gains = {}
+        command_list = []
+        for track_name, gain in track_gain_dict.items():
+            track_num = track_index.track_num(track_name, 'wave')
+            current_gain = pending_gains.get(track_num,
+                                             track_gains_db[track_num])
+            if round(gain, 4) == current_gain:
+                continue
+            previous_gains[track_name] = current_gain
+            pending_gains[track_num] = round(gain, 4)
+            command_list.append('SelectTracks: '
+                                'Mode=Set Track={}'.format(track_num))
+            command_list.append('SetTrackAudio: Gain={}'.format(gain))
+
+        if command_list:
+            self.run_commands(['SelectNone:'] + command_list +
+                              ['SelectNone:'])
+        return previous_gains
 
     def mix_and_render_to_new_track(self, track_name_list):
         """
@@ -430,14 +1693,83 @@ class AudacityScriptingUtils(AudacityScriptingBase):
         ----------
         track_name_list : list
             The track names of the tracks to be mixed and rendered.
+
+        Raises
+        ------
+        TrackNotFound
+            If no audio track has one of the names.
+        DuplicateTrackName
+            If more than one audio track has one of the names.
         """
 
         self.run_command('SelectNone:')
-        audio_tracks_info = self.get_audio_tracks_info(track_name_list)
+        track_nums = self.get_track_index().track_nums(track_name_list,
+                                                       'wave')
 
-        for audio_track_info in audio_tracks_info:
+        for track_num in track_nums:
             self.run_command('SelectTracks: Mode=Add '
-                             'Track={}'.format(audio_track_info['track_num']))
+                             'Track={}'.format(track_num))
         self.run_command('MixAndRenderToNewTrack:')
 
         self.run_command('SelectNone:')
+
+    def mix_and_render_gain_sweep(self, track_name_list, gain_grid,
+                                  restore_gains=True):
+        """
+        Mixes and renders the tracks to a new track for every gain vector in
+        a grid, and returns a list of (gains, track_name) pairs in the order
+        the tracks were rendered. The vectors are ordered so that as few
+        track gains as possible change between mixes, only the changed gains
+        are set, and the whole sweep is sent as one pipelined batch. Each
+        rendered track is named after its gains, e.g. 'A: -3.0 B: 0.0'.
+        Its track number is known without reading the Tracks info, because
+        Audacity appends every new mix after the existing tracks.
+
+        Parameters
+        ----------
+        track_name_list : list
+            The track names of the tracks to be mixed and rendered.
+        gain_grid : iterable
+            Gain vectors in dB, each with one gain per track in
+            track_name_list. Duplicate vectors are rendered once.
+        restore_gains : bool, optional
+            Flag to set the gains of the tracks back to their values before
+            the sweep (Default is True).
+
+        Raises
+        ------
+        ValueError
+            If a gain vector does not have one gain per track.
+        TrackNotFound
+            If no audio track has one of the names.
+        DuplicateTrackName
+            If more than one audio track has one of the names.
+        """
+
+        ordered_grid = order_gain_grid(gain_grid)
+        for gains in ordered_grid:
+            if len(gains) != len(track_name_list):
+                raise ValueError('Gain vector {} does not have one gain for '
+                                 'each of {}'.format(list(gains),
+                                                     track_name_list))
+
+        rendered = []
+        with self.transaction():
+            starting_gains = self.get_track_gains(track_name_list)
+            logger.info('Gain sweep of {} mixes with {} gain changes'.format(
+                len(ordered_grid), count_gain_changes(
+                    [starting_gains[track_name]
+                     for track_name in track_name_list], ordered_grid)))
+            new_track_num = len(self.get_track_index())
+            for gains in ordered_grid:
+                self.set_track_gains(dict(zip(track_name_list, gains)))
+                self.mix_and_render_to_new_track(track_name_list)
+                new_track_name = ' '.join(
+                    '{}: {}'.format(track_name, gain)
+                    for track_name, gain in zip(track_name_list, gains))
+                self.rename_track_by_num(new_track_name, new_track_num)
+                rendered.append((gains, new_track_name))
+                new_track_num += 1
+            if restore_gains:
+                self.set_track_gains(starting_gains)
+        return rendered
@@ -0,0 +1,150 @@
+from audacity_scripting.core.command import CommandSyntaxError, parse_command
+
+BOOL_VALUES = frozenset(['true', 'false', '1', '0'])
+
+
+class CommandValidationError(Exception):
+    """
+    An exception that is raised if a command is not valid according to the
+    command catalog.
+    """
+    pass
+
+
+def _check_float(value):
+    float(value)
+
+
+def _check_int(value):
+    int(value)
+
+
+def _check_bool(value):
+    if value.lower() not in BOOL_VALUES:
+        raise ValueError('expected one of {}'.format(sorted(BOOL_VALUES)))
+
+
+def _make_enum_check(enum_values):
+    allowed = frozenset(enum_value.lower() for enum_value in enum_values)
+
+    def check_enum(value):
+        if value.lower() not in allowed:
+            raise ValueError('expected one of {}'.format(list(enum_values)))
+    return check_enum
+
+
+def _check_any(value):
+    pass
+
+
+_TYPE_CHECKS = {
+    'double': _check_float,
+    'float': _check_float,
+    'number': _check_float,
+    'int': _check_int,
+    'bool': _check_bool,
+}
+
+
+class CommandValidator(object):
+    """
+    Checks command strings against the command catalog before they are sent
+    to Audacity. The catalog is compiled into an index of lower case
+    scripting ids and parameter names, so each check is a dict lookup per
+    parameter.
+
+    Methods
+    -------
+    validate(command)
+        Checks one command string and returns it parsed.
+    validate_all(command_list)
+        Checks every command in a batch before any of them are sent.
+    """
+
+    def __init__(self, catalog):
+        """
+        Compiles the index from the catalog.
+
+        Parameters
+        ----------
+        catalog : CommandCatalog
+            Catalog of the scripting ids and parameter signatures.
+        """
+
+        self._index = {}
+        for scripting_id in catalog.scripting_ids:
+            self._index[scripting_id.lower()] = (scripting_id, {})
+        for lower_id, signature in catalog.signatures.items():
+            param_checks = {}
+            for key, param in signature['params'].items():
+                if param['type'] == 'enum' and 'enum' in param:
+                    check = _make_enum_check(param['enum'])
+                else:
+                    check = _TYPE_CHECKS.get(param['type'], _check_any)
+                param_checks[key.lower()] = (key, param['type'], check)
+            self._index[lower_id] = (signature['id'], param_checks)
+
+    def validate(self, command):
+        """
+        Checks one command string and returns it parsed.
+
+        Parameters
+        ----------
+        command : str
+            Command to be sent to Audacity.
+
+        Raises
+        ------
+        CommandValidationError
+            If the command cannot be parsed, the scripting id is unknown, or
+            a parameter name or value is not valid for the command.
+        """
+
+        try:
+            parsed_command = parse_command(command)
+        except CommandSyntaxError as err:
+            raise CommandValidationError(str(err))
+
+        entry = self._index.get(parsed_command.scripting_id.lower())
+        if entry is None:
+            raise CommandValidationError('Unknown scripting id {!r} in '
+                                         '{!r}'.format(
+                                             parsed_command.scripting_id,
+                                             command))
+        scripting_id, param_checks = entry
+
+        for key, value in parsed_command.params.items():
+            param_check = param_checks.get(key.lower())
+            if param_check is None:
+                raise CommandValidationError(
+                    'Unknown parameter {!r} for {} in {!r}, expected one of '
+                    '{}'.format(key, scripting_id, command,
+                                sorted(name for name, _, _ in
+                                       param_checks.values())))
+            name, param_type, check = param_check
+            try:
+                check(value)
+            except ValueError as err:
+                raise CommandValidationError(
+                    'Invalid {} value {!r} for parameter {} of {} in {!r}: '
+                    '{}'.format(param_type, value, name, scripting_id,
+                                command, err))
+        return parsed_command
+
+    def validate_all(self, command_list):
+        """
+        Checks every command in a batch before any of them are sent, and
+        returns the parsed commands.
+
+        Parameters
+        ----------
+        command_list : list
+            Commands to be sent to Audacity.
+
+        Raises
+        ------
+        CommandValidationError
+            If any command in the batch is not valid.
+        """
+
+        return [self.validate(command) for command in command_list]
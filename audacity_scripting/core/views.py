@@ -0,0 +1,166 @@
+from audacity_scripting.core.regions import RegionIndex
+from collections import Counter, namedtuple
+from math import log10
+from types import MappingProxyType
+
+DerivedView = namedtuple('DerivedView', ['name', 'sources', 'compute'])
+DerivedView.__doc__ = """
+A value derived from one or more GetInfo results.
+
+Attributes
+----------
+name : str
+    Name the view is looked up by.
+sources : tuple
+    GetInfo types the view is computed from.
+compute : callable
+    Called with the result for each source, in order, and returns the value
+    of the view. The value is shared between callers, so it must not be
+    changed.
+"""
+
+
+def _track_gains_db(tracks_info):
+    return tuple(round(20 * log10(track_info['gain']), 4)
+                 if track_info['kind'] == 'wave' else None
+                 for track_info in tracks_info)
+
+
+def _project_length(tracks_info):
+    return max([track_info['end'] for track_info in tracks_info
+                if track_info['kind'] == 'wave'] or [0])
+
+
+def _track_clips(clips_info):
+    track_clips = {}
+    for clip_info in clips_info:
+        track_clips.setdefault(clip_info['track'], []).append(
+            (clip_info['start'], clip_info['end']))
+    return MappingProxyType({track_num: tuple(sorted(clips))
+                             for track_num, clips in track_clips.items()})
+
+
+def _clip_counts(clips_info):
+    return MappingProxyType(dict(Counter(clip_info['track']
+                                         for clip_info in clips_info)))
+
+
+# Views registered on every ViewRegistry created by AudacityScriptingUtils.
+DEFAULT_VIEWS = (
+    # Gain in dB of each track by track number, None for non-wave tracks.
+    DerivedView('track_gains_db', ('Tracks',), _track_gains_db),
+    # RegionIndex of the label regions of every label track, shared by every
+    # track.
+    DerivedView('label_regions', ('Labels',), RegionIndex.from_labels_info),
+    # Sorted (start, end) times of the clips of each track by track number.
+    DerivedView('track_clips', ('Clips',), _track_clips),
+    # End time of the last wave track, 0 if there are none.
+    DerivedView('project_length', ('Tracks',), _project_length),
+    # Number of clips of each track by track number.
+    DerivedView('clip_counts', ('Clips',), _clip_counts),
+)
+
+
+class ViewRegistry(object):
+    """
+    Memoized views derived from GetInfo results. Each view declares the
+    GetInfo types it depends on, and every lookup fetches them, which is a
+    dict lookup while they are cached. The view is only recomputed if a
+    result is not the same object as before, so it follows every
+    invalidation of the info cache, whatever caused it, and keeps its value
+    when the parse cache recognised an unchanged reply.
+
+    Attributes
+    ----------
+    computes : int
+        Number of times a view has been computed.
+
+    Methods
+    -------
+    register(name, sources, compute)
+        Adds a view.
+    get(name)
+        Returns the value of a view, computing it if needed.
+    invalidate(info_types=None)
+        Forgets the values of the views that depend on the GetInfo types.
+    """
+
+    def __init__(self, get_info, views=DEFAULT_VIEWS):
+        """
+        Parameters
+        ----------
+        get_info : callable
+            Returns the immutable result for a GetInfo type.
+        views : tuple, optional
+            DerivedView objects to register (Default is DEFAULT_VIEWS).
+        """
+
+        self._get_info = get_info
+        self._views = {}
+        self._memo = {}
+        self.computes = 0
+        for view in views:
+            self.register(*view)
+
+    def register(self, name, sources, compute):
+        """
+        Adds a view, replacing any view with the same name.
+
+        Parameters
+        ----------
+        name : str
+            Name the view is looked up by.
+        sources : tuple
+            GetInfo types the view is computed from.
+        compute : callable
+            Called with the result for each source and returns the value.
+        """
+
+        self._views[name] = DerivedView(name, tuple(sources), compute)
+        self._memo.pop(name, None)
+
+    def get(self, name):
+        """
+        Returns the value of a view, computing it if any of its sources has
+        changed since it was last computed.
+
+        Parameters
+        ----------
+        name : str
+            Name of the view.
+
+        Raises
+        ------
+        KeyError
+            If no view has the name.
+        """
+
+        view = self._views[name]
+        memo = self._memo.get(name)
+        source_infos = tuple(self._get_info(source)
+                             for source in view.sources)
+        if memo is not None and all(
+                info is memo_info
+                for info, memo_info in zip(source_infos, memo[0])):
+            return memo[1]
+        value = view.compute(*source_infos)
+        self.computes += 1
+        self._memo[name] = (source_infos, value)
+        return value
+
+    def invalidate(self, info_types=None):
+        """
+        Forgets the values of the views that depend on the GetInfo types, so
+        they are recomputed even if their sources are the same objects.
+
+        Parameters
+        ----------
+        info_types : tuple, optional
+            The GetInfo types whose views are forgotten. Every view is
+            forgotten if the value is None (Default is None).
+        """
+
+        for name, view in self._views.items():
+            if info_types is None or not set(view.sources).isdisjoint(
+                    info_types):
+                self._memo.pop(name, None)
@@ -10,10 +10,18 @@ def main():
     logger.info('Running Script: Join All Clips')
 
     parser = ArgumentParser(description='Join all clips on all tracks.')
-    parser.parse_args()
+    parser.add_argument('-n', '--dry-run', dest='dry_run',
+                        action='store_true',
+                        help='Print the planned commands and their '
+                             'estimated cost without running them.')
+    args = parser.parse_args()
 
     with AudacityScriptingUtils() as command_runner:
-        command_runner.join_all_clips()
+        with command_runner.transaction(send=not args.dry_run) as plan:
+            command_runner.join_all_clips()
+        if args.dry_run:
+            print(plan.describe(command_runner.latency,
+                                command_runner.selection.state))
 
 if __name__ == '__main__':
     main()
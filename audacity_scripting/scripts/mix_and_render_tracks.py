@@ -2,23 +2,35 @@
 from argparse import ArgumentParser
 from audacity_scripting import LOGGER_NAME
 from audacity_scripting.core.utils import AudacityScriptingUtils
-from copy import deepcopy
+from itertools import product
 import logging
 
-# TODO(adthomas811): Update script to mix and render multiple tracks -
-#                    add check for args and update default track_gains_list
 # TODO(adthomas811): Add arg for new track name(s)
 
 
 def parse_args():
-    parser = ArgumentParser(description='Mix and render two tracks.')
-    parser.add_argument('track_names', metavar='track_name', type=str, nargs=2,
-                        help='Tracks to be mixed and rendered.')
+    parser = ArgumentParser(description='Mix and render tracks.')
+    parser.add_argument('track_names', metavar='track_name', type=str,
+                        nargs='+', help='Tracks to be mixed and rendered.')
     parser.add_argument('-g', '--track_gains', dest='track_gains',
-                        type=float, nargs=2, action='append',
-                        help='')
-
-    return parser.parse_args()
+                        type=float, nargs='+', action='append',
+                        help='Gain of each track in dB for one mix. Can be '
+                             'given more than once.')
+    parser.add_argument('-v', '--grid_values', dest='grid_values',
+                        type=float, nargs='+',
+                        help='Gains in dB to mix every combination of, one '
+                             'from these values for each track.')
+    parser.add_argument('-n', '--dry-run', dest='dry_run',
+                        action='store_true',
+                        help='Print the planned commands and their '
+                             'estimated cost without running them.')
+
+    args = parser.parse_args()
+    for track_gains in args.track_gains or []:
+        if len(track_gains) != len(args.track_names):
+            parser.error('-g/--track_gains needs one gain for each of the '
+                         '{} tracks'.format(len(args.track_names)))
+    return args
 
 
 def main():
@@ -27,35 +39,20 @@ def main():
 
     args = parse_args()
 
-    track_gains_list = []
-    if args.track_gains is None:
-        track_gains_list = [[0, 0]]
-    else:
-        track_gains_list = deepcopy(args.track_gains)
+    gain_grid = list(args.track_gains or [])
+    if args.grid_values is not None:
+        gain_grid.extend(product(args.grid_values,
+                                 repeat=len(args.track_names)))
+    if not gain_grid:
+        gain_grid = [[0] * len(args.track_names)]
 
     with AudacityScriptingUtils() as command_runner:
-        track_starting_gain_dict = {}
-        for track_name in args.track_names:
-            track_starting_gain = command_runner.get_track_gain(track_name)
-            track_starting_gain_dict[track_name] = track_starting_gain
-
-        for track_gains in track_gains_list:
-            new_track_name = ''
-            for track_num in range(len(args.track_names)):
-                track_name = args.track_names[track_num]
-                track_gain = track_gains[track_num]
-                command_runner.set_track_gain(track_name, track_gain)
-                new_track_name += '{}: {} '.format(track_name, track_gain)
-
-            command_runner.mix_and_render_to_new_track(args.track_names)
-
-            new_track_num = len(command_runner.get_tracks_info()) - 1
-            command_runner.rename_track_by_num(new_track_name.rstrip(),
-                                               new_track_num)
-
-        for track_name in args.track_names:
-            command_runner.set_track_gain(track_name,
-                                          track_starting_gain_dict[track_name])
+        with command_runner.transaction(send=not args.dry_run) as plan:
+            command_runner.mix_and_render_gain_sweep(args.track_names,
+                                                     gain_grid)
+        if args.dry_run:
+            print(plan.describe(command_runner.latency,
+                                command_runner.selection.state))
 
 if __name__ == '__main__':
     main()
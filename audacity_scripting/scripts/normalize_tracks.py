@@ -1,6 +1,7 @@
 
 from argparse import ArgumentParser
 from audacity_scripting import LOGGER_NAME
+from audacity_scripting.core.journal import JobJournal
 from audacity_scripting.core.utils import AudacityScriptingUtils
 import logging
 
@@ -25,6 +26,18 @@ def parse_args():
                         type=bool, default=False,
                         help='Set the StereoIndependent attribute '
                              'for normalization. Default: False')
+    parser.add_argument('-m', '--multi_track', dest='multi_track',
+                        action='store_true',
+                        help='Normalize every track that shares a region '
+                             'with one Normalize command.')
+    parser.add_argument('-n', '--dry-run', dest='dry_run',
+                        action='store_true',
+                        help='Print the planned commands and their '
+                             'estimated cost without running them.')
+    parser.add_argument('-j', '--journal', dest='journal', type=str,
+                        help='Checkpoint journal file. Regions it records as '
+                             'normalized are skipped, so a rerun after a '
+                             'failure only normalizes the remaining regions.')
 
     return parser.parse_args()
 
@@ -35,12 +48,28 @@ def main():
 
     args = parse_args()
 
-    with AudacityScriptingUtils() as command_runner:
+    journal = None if args.journal is None else JobJournal(args.journal)
+
+    def normalize(command_runner):
         command_runner.normalize_tracks_by_label(args.tracks,
                                                  args.peak_level,
                                                  args.apply_gain,
                                                  args.rem_dc_offset,
-                                                 args.stereo_ind)
+                                                 args.stereo_ind,
+                                                 args.multi_track,
+                                                 journal)
+
+    with AudacityScriptingUtils() as command_runner:
+        if journal is not None and not args.dry_run:
+            # Batches are only recorded in the journal once Audacity has
+            # confirmed them, so they are sent straight away.
+            normalize(command_runner)
+            return
+        with command_runner.transaction(send=not args.dry_run) as plan:
+            normalize(command_runner)
+        if args.dry_run:
+            print(plan.describe(command_runner.latency,
+                                command_runner.selection.state))
 
 if __name__ == '__main__':
     main()
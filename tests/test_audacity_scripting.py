@@ -1,6 +1,28 @@
 
+from audacity_scripting.core.base import CommandAssertFailure
+from audacity_scripting.core.cache import ParseCache
+from audacity_scripting.core.command import (CommandSyntaxError,
+                                             format_command, parse_command)
+from audacity_scripting.core.diff import diff_info, diff_snapshots
+from audacity_scripting.core.export import ExportPathError
+from audacity_scripting.core.journal import JobJournal
+from audacity_scripting.core.latency import DEFAULT_LATENCY, LatencyStats
+from audacity_scripting.core.macros import (MacroCompileError, compile_macro,
+                                            write_macro)
+from audacity_scripting.core.model import ProjectModel
+from audacity_scripting.core.regions import RegionIndex
+from audacity_scripting.core.schema import SchemaError, validate_info
+from audacity_scripting.core.selection import SelectionTracker
+from audacity_scripting.core.stream import JsonArrayStream
+from audacity_scripting.core.sweep import count_gain_changes, order_gain_grid
+from audacity_scripting.core.tracks import (DuplicateTrackName, TrackIndex,
+                                            TrackNotFound)
+from audacity_scripting.core.undo import (UndoPolicy,
+                                          count_undo_operations)
 from audacity_scripting.core.utils import AudacityScriptingUtils
+from audacity_scripting.core.validation import CommandValidationError
 from datetime import datetime
+from itertools import product
 import logging
 import os
 from os import mkdir
@@ -9,8 +31,10 @@ from parameterized import parameterized
 import re
 import stat
 import sys
+import tempfile
 import threading
 from time import sleep
+from types import SimpleNamespace
 import unittest
 
 # Try to import modules for Windows
@@ -60,6 +84,27 @@ BAD_COMMAND_RESPONSE = ('Your batch command of {} was not recognized.\n'
                         'BatchCommand finished: Failed!\n')
 
 
+def record_sent_commands(command_runner):
+    """
+    Returns a list that each command written to Audacity by the command
+    runner is appended to.
+
+    Parameters
+    ----------
+    command_runner : AudacityScriptingBase
+        The connection whose commands are recorded.
+    """
+
+    sent_commands = []
+    send_command = command_runner._send_command
+
+    def record_command(command):
+        sent_commands.append(command)
+        send_command(command)
+    command_runner._send_command = record_command
+    return sent_commands
+
+
 class AudacityScriptingTests(unittest.TestCase):
     """
     A class containing the tests for the audacity_scripting package. Run with
@@ -74,13 +119,24 @@ class AudacityScriptingTests(unittest.TestCase):
     aud_mock_proc : AudacityMock
         The thread running the Audacity mock that the tests run against. Used
         if use_mock is True.
+    cache_dir : TemporaryDirectory
+        Directory the command catalog is cached in during each test.
+    previous_cache_dir : str
+        Value of AUDACITY_SCRIPTING_CACHE_DIR before the test, restored
+        afterwards.
     """
 
     def setUp(self):
         """
-        Starts the Audacity mock thread if the use_mock flag is True.
+        Points the command catalog cache at a temporary directory and starts
+        the Audacity mock thread if the use_mock flag is True.
         """
 
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.previous_cache_dir = os.environ.get(
+            'AUDACITY_SCRIPTING_CACHE_DIR')
+        os.environ['AUDACITY_SCRIPTING_CACHE_DIR'] = self.cache_dir.name
+
         # Set use_mock flag to False if running against Audacity
         self.use_mock = True
         logger.info('Using Mock: {}'.format(self.use_mock))
@@ -109,13 +165,21 @@ class AudacityScriptingTests(unittest.TestCase):
 
     def tearDown(self):
         """
-        Ends the Audacity mock thread if the use_mock flag is True.
+        Ends the Audacity mock thread if the use_mock flag is True and
+        removes the temporary command catalog cache.
         """
 
         logger.info('Test Teardown')
         if self.use_mock:
             self.aud_mock_proc.join()
 
+        if self.previous_cache_dir is None:
+            del os.environ['AUDACITY_SCRIPTING_CACHE_DIR']
+        else:
+            os.environ['AUDACITY_SCRIPTING_CACHE_DIR'] = \
+                self.previous_cache_dir
+        self.cache_dir.cleanup()
+
     # TODO(adthomas811): Parameterize and add more tests.
     def test_command_runner(self):
         """
@@ -230,6 +294,1150 @@ class AudacityScriptingTests(unittest.TestCase):
             res = command(command_runner, *args)
         self.assertEqual(type(res), target_type)
 
+    def test_get_info_parse_cache(self):
+        """
+        Tests that repeated GetInfo replies are parsed once and returned as
+        immutable objects.
+        """
+
+        with AudacityScriptingUtils() as command_runner:
+            first = command_runner.get_info('Tracks')
+            command_runner.info_cache.invalidate()
+            second = command_runner.get_info('Tracks')
+            stats = command_runner.parse_cache.stats()
+        self.assertIs(first, second)
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+        with self.assertRaises(TypeError):
+            first[0]['name'] = 'Renamed'
+
+    def test_get_info_write_invalidation(self):
+        """
+        Tests that cached GetInfo results are only refetched after a command
+        that can change them.
+        """
+
+        with AudacityScriptingUtils() as command_runner:
+            command_runner.get_info('Tracks')
+            command_runner.get_info('Clips')
+            command_runner.run_command('Select: Mode=Set Track=0 '
+                                       'Start=0 End=1')
+            command_runner.get_info('Tracks')
+            command_runner.run_command('SetTrackAudio: Gain=-1.5')
+            command_runner.get_info('Tracks')
+            command_runner.get_info('Clips')
+            info_cache = command_runner.info_cache
+        self.assertEqual((info_cache.hits, info_cache.misses), (2, 3))
+
+    def test_command_catalog_disk_cache(self):
+        """
+        Tests that the command catalog is stored on disk and reused without
+        fetching the Commands and Menus info again.
+        """
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            with AudacityScriptingUtils() as command_runner:
+                command_runner.catalog_cache.cache_dir = cache_dir
+                built_catalog = command_runner.get_command_catalog()
+                self.assertEqual(len(os.listdir(cache_dir)), 1)
+
+                command_runner._command_catalog = None
+                command_runner.stream_json = None
+                loaded_catalog = command_runner.get_command_catalog()
+        self.assertEqual(loaded_catalog.to_dict(), built_catalog.to_dict())
+        self.assertIn('Amplify', loaded_catalog.scripting_ids)
+        self.assertEqual(
+            loaded_catalog.signatures['amplify']['params']['Ratio'],
+            {'type': 'float'})
+
+    def test_run_commands_pipelined(self):
+        """
+        Tests that a pipelined batch returns each result in order, that each
+        result is reported as it is read, and that a failure is raised after
+        the results in flight have been read.
+        """
+
+        with AudacityScriptingUtils() as command_runner:
+            read_positions = []
+            results = command_runner.run_commands(
+                ['SelectNone:'] * 5, max_in_flight=2,
+                result_read=read_positions.append)
+            failed_positions = []
+            with self.assertRaises(CommandAssertFailure):
+                command_runner.run_commands(
+                    ['SelectAll:', 'NotACommand:', 'SelectNone:'],
+                    result_read=failed_positions.append)
+            response = command_runner.run_command('SelectAll:')
+        self.assertEqual(results, [SUCCESS_RESPONSE] * 5)
+        self.assertEqual(read_positions, [0, 1, 2, 3, 4])
+        self.assertEqual(failed_positions, [0])
+        self.assertEqual(response, SUCCESS_RESPONSE)
+
+    def test_failed_command_observers(self):
+        """
+        Tests that a command that fails is not applied to the selection
+        model or the track index, but makes them unknown instead.
+        """
+
+        with AudacityScriptingUtils() as command_runner:
+            sent_commands = record_sent_commands(command_runner)
+            send_command = command_runner._send_command
+            failing_commands = ['MixAndRenderToNewTrack:']
+
+            def fail_command(command):
+                if command in failing_commands:
+                    failing_commands.remove(command)
+                    command = 'NotACommand:'
+                send_command(command)
+            command_runner._send_command = fail_command
+
+            select_command = 'Select: Mode=Set Track=0 Start=0 End=1'
+            command_runner.run_command(select_command)
+            track_count = len(command_runner.get_track_index())
+            with self.assertRaises(CommandAssertFailure):
+                command_runner.run_command('MixAndRenderToNewTrack:')
+            self.assertFalse(command_runner.track_index.valid)
+            self.assertEqual(len(command_runner.get_track_index()),
+                             track_count)
+
+            failing_commands.append(select_command)
+            with self.assertRaises(CommandAssertFailure):
+                command_runner.run_commands([select_command])
+            self.assertIsNone(command_runner.selection.state.tracks)
+            sent_count = len(sent_commands)
+            command_runner.run_command(select_command)
+
+        self.assertEqual(sent_commands[sent_count:], [select_command])
+
+    def test_command_validation(self):
+        """
+        Tests that invalid commands are rejected before any of the batch is
+        sent, and that the built-in methods pass validation.
+        """
+
+        with AudacityScriptingUtils() as command_runner:
+            command_runner.enable_command_validation()
+            sent_commands = record_sent_commands(command_runner)
+
+            for bad_command in ['SetTrackAudio: Gian=1',
+                                'SetTrackAudio: Gain=loud',
+                                'SelectTracks: Mode=Replace',
+                                'SelectNone: Track=0',
+                                'NotACommand:']:
+                with self.assertRaises(CommandValidationError):
+                    command_runner.run_commands(['SelectAll:', bad_command])
+            self.assertEqual(sent_commands, [])
+
+            command_runner.normalize_tracks_by_label(['L - AT2050'])
+            command_runner.set_track_gain('L - AT2050', -1.5)
+            command_runner.rename_track_by_num('L - AT2050', 0)
+            command_runner.mix_and_render_to_new_track(['L - AT2050',
+                                                        'R - SM57'])
+        self.assertNotEqual(sent_commands, [])
+
+    def test_redundant_selection_elided(self):
+        """
+        Tests that selection commands that would not change the selection are
+        skipped, and that preserve_selection only restores what changed.
+        """
+
+        with AudacityScriptingUtils() as command_runner:
+            sent_commands = record_sent_commands(command_runner)
+
+            command_runner.join_all_clips()
+            command_runner.split_all_audio_on_labels()
+            self.assertEqual(sent_commands.count('SelectNone:'), 3)
+
+            command_runner.run_command('Select: Mode=Set Track=0 '
+                                       'Start=1 End=2')
+            with command_runner.preserve_selection():
+                command_runner.run_command('Normalize: PeakLevel=-1')
+            results = command_runner.run_commands(
+                ['Select: Mode=Set Track=0 Start=1 End=2',
+                 'SelectTracks: Mode=Add Track=1',
+                 'SelectTracks: Mode=Add Track=1'])
+            self.assertEqual(sent_commands[-2:],
+                             ['Normalize: PeakLevel=-1',
+                              'SelectTracks: Mode=Add Track=1'])
+            self.assertEqual(len(results), 3)
+
+            with command_runner.preserve_selection():
+                command_runner.run_command('SelectNone:')
+            self.assertEqual(sent_commands[-3:],
+                             ['SelectNone:',
+                              'SelectTracks: Mode=Set Track=0 TrackCount=2',
+                              'SelectTime: Start=1.0 End=2.0'])
+            elided = command_runner.selection.elided
+        self.assertEqual(elided, 3)
+
+    def test_project_model(self):
+        """
+        Tests that the project model applies gain changes, renames and splits
+        locally, and reports the drift from the mock when reconciled.
+        """
+
+        with AudacityScriptingUtils() as command_runner:
+            project_model = command_runner.get_project_model()
+            command_runner.set_track_gain('L - AT2050', -1.5)
+            command_runner.rename_track_by_num('Renamed', 1)
+            command_runner.split_all_audio_on_labels()
+
+            self.assertEqual(project_model.get_track_gain('L - AT2050'),
+                             -1.5)
+            self.assertEqual(project_model.get('Tracks')[1]['name'],
+                             'Renamed')
+            self.assertEqual(len(project_model.get('Clips')), 18)
+            self.assertEqual(project_model.get_project_end(), 10603.5)
+            self.assertEqual(project_model.commands_applied, 3)
+
+            drift = project_model.reconcile()
+        self.assertEqual(sorted(drift), ['Clips', 'Tracks'])
+        self.assertEqual(len(drift['Tracks'].changed), 1)
+
+    def test_transaction(self):
+        """
+        Tests that a transaction only sends reads until it exits, sends the
+        optimized plan as one batch, and sends nothing if the scope raises.
+        """
+
+        with AudacityScriptingUtils() as command_runner:
+            sent_commands = record_sent_commands(command_runner)
+
+            with command_runner.transaction() as plan:
+                starting_gain = command_runner.get_track_gain('L - AT2050')
+                command_runner.set_track_gain('L - AT2050', -1.5)
+                command_runner.rename_track_by_num('Renamed', 1)
+                command_runner.set_track_gain('L - AT2050', 0)
+                # Reads describe the project as it was on entry.
+                self.assertEqual(command_runner.get_track_gain('L - AT2050'),
+                                 starting_gain)
+                self.assertTrue(all(command.startswith('GetInfo:')
+                                    for command in sent_commands))
+                reads = len(sent_commands)
+            self.assertEqual(len(plan), 12)
+            self.assertEqual(len(plan.results), 8)
+            self.assertEqual(sent_commands[reads:], [
+                'SelectNone:', 'SelectTracks: Mode=Set Track=0',
+                'SetTrackAudio: Gain=-1.5',
+                'SelectTracks: Mode=Set Track=1 TrackCount=1',
+                'SetTrackStatus: Name="Renamed"',
+                'SelectTracks: Mode=Set Track=0 TrackCount=1',
+                'SetTrackAudio: Gain=0', 'SelectNone:'])
+
+            with self.assertRaises(ValueError):
+                with command_runner.transaction():
+                    command_runner.set_track_gain('L - AT2050', -3)
+                    raise ValueError('Abandoned')
+            self.assertTrue(all(command.startswith('GetInfo:')
+                                for command in sent_commands[reads + 8:]))
+            self.assertIsNone(command_runner.plan)
+
+    def test_preferences_override(self):
+        """
+        Tests that the current values are read with GetPreference, that
+        only the preferences that differ are set, in one batch, and that the
+        values from before the override are restored on exit.
+        """
+
+        with AudacityScriptingUtils() as command_runner:
+            sent_commands = record_sent_commands(command_runner)
+
+            preferences = command_runner.preferences
+            with preferences.override({'/AudioIO/LatencyDuration': 100.0,
+                                       '/AudioIO/EffectsPreviewLen': 10}):
+                self.assertEqual(
+                    preferences.get('/AudioIO/EffectsPreviewLen'), '10')
+            self.assertEqual(preferences.get('/AudioIO/EffectsPreviewLen'),
+                             '3')
+            self.assertEqual(preferences.changes(
+                {'/AudioIO/LatencyDuration': '100'}), {})
+            reads = preferences.reads
+        self.assertEqual(sent_commands, [
+            'GetPreference: Name="/AudioIO/LatencyDuration"',
+            'GetPreference: Name="/AudioIO/EffectsPreviewLen"',
+            'SetPreference: Name=/AudioIO/EffectsPreviewLen Value=10',
+            'SetPreference: Name=/AudioIO/EffectsPreviewLen Value=3'])
+        self.assertEqual(reads, 2)
+
+    def test_set_track_gains(self):
+        """
+        Tests that gains are read from one Tracks info, that only the tracks
+        whose gain changes are set, and that gains set earlier in the same
+        transaction are taken into account.
+        """
+
+        with AudacityScriptingUtils() as command_runner:
+            sent_commands = record_sent_commands(command_runner)
+
+            starting_gains = command_runner.get_track_gains(['L - AT2050',
+                                                             'R - SM57'])
+            self.assertEqual(sent_commands, ['GetInfo: Type=Tracks'])
+            self.assertEqual(starting_gains, {'L - AT2050': 10.0,
+                                              'R - SM57': 10.0})
+
+            previous_gains = command_runner.set_track_gains(
+                {'L - AT2050': 10, 'R - SM57': -6})
+            self.assertEqual(previous_gains, {'R - SM57': 10.0})
+            self.assertEqual(sent_commands[1:], [
+                'SelectNone:', 'SelectTracks: Mode=Set Track=1',
+                'SetTrackAudio: Gain=-6', 'SelectNone:'])
+
+            with command_runner.transaction() as plan:
+                command_runner.set_track_gains({'L - AT2050': -3})
+                command_runner.set_track_gains({'L - AT2050': 10})
+                command_runner.set_track_gains({'L - AT2050': 10})
+        self.assertEqual(plan.commands.count('SetTrackAudio: Gain=10'), 1)
+
+    def test_mix_and_render_gain_sweep(self):
+        """
+        Tests that a gain sweep renders each vector once, sets only the gains
+        that change, and names the rendered tracks without reading them.
+        """
+
+        with AudacityScriptingUtils() as command_runner:
+            sent_commands = record_sent_commands(command_runner)
+
+            rendered = command_runner.mix_and_render_gain_sweep(
+                ['L - AT2050', 'R - SM57'],
+                list(product([10.0, -6.0], repeat=2)) + [(10.0, 10.0)])
+
+        self.assertEqual([gains for gains, _ in rendered],
+                         [(-6.0, -6.0), (-6.0, 10.0), (10.0, 10.0),
+                          (10.0, -6.0)])
+        self.assertEqual(rendered[0][1], 'L - AT2050: -6.0 R - SM57: -6.0')
+        self.assertEqual(sent_commands.count('MixAndRenderToNewTrack:'), 4)
+        # Two gains for the first mix, then one per mix and to restore.
+        self.assertEqual(len([command for command in sent_commands
+                              if command.startswith('SetTrackAudio:')]), 6)
+        self.assertEqual(len([command for command in sent_commands
+                              if command.startswith('GetInfo:')]), 1)
+        self.assertIn('SetTrackStatus: '
+                      'Name="L - AT2050: 10.0 R - SM57: -6.0"',
+                      sent_commands)
+
+    def test_derived_views(self):
+        """
+        Tests that derived views are memoized, and only recomputed when one
+        of their sources has changed or they are invalidated.
+        """
+
+        with AudacityScriptingUtils() as command_runner:
+            views = command_runner.views
+            self.assertEqual(views.get('project_length'), 10603.5)
+            clip_counts = views.get('clip_counts')
+            self.assertEqual(sum(clip_counts.values()), 4)
+            computes = views.computes
+
+            command_runner.run_command('Select: Mode=Set Track=0 '
+                                       'Start=0 End=1')
+            command_runner.run_command('SetTrackAudio: Gain=-1.5')
+            self.assertIs(views.get('clip_counts'), clip_counts)
+            misses = command_runner.info_cache.misses
+            views.get('project_length')
+            # The mock replies with the same Tracks info, so the parse cache
+            # returns the same object and the view is not recomputed.
+            self.assertEqual(command_runner.info_cache.misses, misses + 1)
+            self.assertEqual(views.computes, computes)
+
+            command_runner.split_all_audio_on_labels()
+            views.get('clip_counts')
+            self.assertEqual(views.computes, computes)
+            # Invalidating the info cache directly also reaches the views.
+            command_runner.info_cache.invalidate()
+            command_runner.parse_cache.clear()
+            views.get('clip_counts')
+            self.assertEqual(views.computes, computes + 1)
+            views.invalidate()
+            views.get('clip_counts')
+            self.assertEqual(views.computes, computes + 2)
+
+    def test_normalize_multi_track(self):
+        """
+        Tests that multi-track normalization selects every track sharing a
+        region at once and sends one Normalize command per region.
+        """
+
+        with AudacityScriptingUtils() as command_runner:
+            sent_commands = record_sent_commands(command_runner)
+
+            command_runner.normalize_tracks_by_label(
+                ['L - AT2050', 'R - SM57'])
+            single_track_commands = sent_commands[:]
+            del sent_commands[:]
+            command_runner.normalize_tracks_by_label(
+                ['L - AT2050', 'R - SM57'], multi_track=True)
+
+        normalize_count = len([command for command in sent_commands
+                               if command.startswith('Normalize:')])
+        self.assertEqual(normalize_count, 9)
+        self.assertEqual(sent_commands[:3], [
+            'SelectTracks: Mode=Set Track=0 TrackCount=2',
+            'SelectTime: Start=0 End=134.861',
+            'Normalize: PeakLevel=-1.0 ApplyGain=True RemoveDcOffset=True '
+            'StereoIndependent=False'])
+        self.assertLess(len(sent_commands), len(single_track_commands) * 0.6)
+
+    def test_apply_effect_by_regions(self):
+        """
+        Tests that an effect is applied to explicit regions in batches with
+        progress reported, that regions with no audio are skipped, that the
+        catalog is not loaded unless validation is enabled, and that unknown
+        effects are then rejected before anything is sent.
+        """
+
+        with AudacityScriptingUtils() as command_runner:
+            sent_commands = record_sent_commands(command_runner)
+
+            progress_calls = []
+            region_count = command_runner.apply_effect_by_regions(
+                'Amplify', {'Ratio': 0.5},
+                regions=[(0, 1), (2, 3), (20000, 20001)], multi_track=True,
+                progress=lambda done, total: progress_calls.append(
+                    (done, total)), max_in_flight=1)
+            unchecked_commands = list(sent_commands)
+            command_runner.enable_command_validation()
+            sent_count = len(sent_commands)
+            with self.assertRaises(CommandValidationError):
+                command_runner.apply_effect_by_regions('NotAnEffect')
+
+        self.assertFalse(any(command.startswith(('GetPreference:',
+                                                 'GetInfo: Type=Commands'))
+                             for command in unchecked_commands))
+        self.assertEqual(sent_commands[sent_count:], [])
+        self.assertEqual(region_count, 2)
+        self.assertEqual(progress_calls, [(1, 2), (2, 2)])
+        self.assertEqual(unchecked_commands[-6:], [
+            'SelectTracks: Mode=Set Track=0 TrackCount=2',
+            'SelectTime: Start=0 End=1', 'Amplify: Ratio=0.5',
+            'SelectTime: Start=2 End=3', 'Amplify: Ratio=0.5',
+            'SelectNone:'])
+
+    def test_export_regions(self):
+        """
+        Tests that each label region is exported with Export2, that files
+        newer than the project are skipped, and that bad paths are rejected
+        before anything is exported.
+        """
+
+        with tempfile.TemporaryDirectory() as export_dir:
+            template = join(export_dir, '{track}_{index:03d}.wav')
+            with AudacityScriptingUtils() as command_runner:
+                sent_commands = record_sent_commands(command_runner)
+
+                summary = command_runner.export_regions(
+                    ['L - AT2050'], filename_template=template)
+
+                project_path = join(export_dir, 'project.aup')
+                open(project_path, 'w').close()
+                os.utime(project_path, (0, 0))
+                up_to_date_path = join(export_dir, 'L - AT2050_002.wav')
+                open(up_to_date_path, 'w').close()
+                rerun_summary = command_runner.export_regions(
+                    ['L - AT2050'], filename_template=template,
+                    project_path=project_path)
+
+                sent_count = len(sent_commands)
+                with self.assertRaises(ExportPathError):
+                    command_runner.export_regions(
+                        filename_template=join(export_dir, 'missing',
+                                               '{track}_{index}.wav'))
+                with self.assertRaises(ExportPathError):
+                    command_runner.export_regions(
+                        filename_template=join(export_dir, '{track}.wav'))
+                self.assertFalse(any(
+                    command.startswith('Export2:')
+                    for command in sent_commands[sent_count:]))
+
+        self.assertEqual(len(summary.exported), 9)
+        self.assertEqual(summary.skipped, [])
+        self.assertGreater(summary.regions_per_second, 0)
+        self.assertEqual(sent_commands[:4], [
+            'SelectNone:', 'GetInfo: Type=Tracks', 'GetInfo: Type=Labels',
+            'GetInfo: Type=Clips'])
+        self.assertEqual(sent_commands[4:6], [
+            'Select: Mode=Set Track=0 Start=0 End=134.861',
+            'Export2: Filename="{}" NumChannels=1'.format(
+                join(export_dir, 'L - AT2050_001.wav'))])
+        self.assertEqual(rerun_summary.skipped, [up_to_date_path])
+        self.assertEqual(len(rerun_summary.exported), 8)
+
+    def test_resume_from_journal(self):
+        """
+        Tests that regions recorded in the journal are skipped, that the
+        rest are recorded as they are processed, that steps of other tracks
+        are kept, and that a rerun sends no effect commands.
+        """
+
+        with tempfile.TemporaryDirectory() as journal_dir:
+            journal_path = join(journal_dir, 'compress.jsonl')
+            with AudacityScriptingUtils() as command_runner:
+                sent_commands = record_sent_commands(command_runner)
+
+                compressor = ('Compressor: Threshold=-12.0 NoiseFloor=-40.0 '
+                              'Ratio=2.0 AttackTime=0.2 ReleaseTime=1.0 '
+                              'Normalize=True UsePeak=False')
+                journal = JobJournal(journal_path)
+                journal.record([('L - AT2050', 0, 134.861, compressor),
+                                ('Gone', 0, 1, compressor)])
+                command_runner.compress_tracks_by_label(
+                    ['L - AT2050', 'R - SM57'], multi_track=True,
+                    journal=JobJournal(journal_path))
+                first_run = [command for command in sent_commands
+                             if command.startswith('Compressor:')]
+
+                sent_count = len(sent_commands)
+                rerun_journal = JobJournal(journal_path)
+                command_runner.compress_tracks_by_label(
+                    ['L - AT2050', 'R - SM57'], journal=rerun_journal)
+
+        self.assertEqual(len(first_run), 9)
+        self.assertIn('Select: Mode=Set Track=1 Start=0 End=134.861',
+                      sent_commands)
+        self.assertEqual(len(rerun_journal), 19)
+        self.assertTrue(rerun_journal.is_done('Gone', 0, 1, compressor))
+        self.assertFalse(any(command.startswith('Compressor:')
+                             for command in sent_commands[sent_count:]))
+
+    def test_journal_records_each_region(self):
+        """
+        Tests that each region is recorded as soon as its effect succeeds,
+        so the regions before a failure in the same batch are not redone.
+        """
+
+        with tempfile.TemporaryDirectory() as journal_dir:
+            journal_path = join(journal_dir, 'compress.jsonl')
+            with AudacityScriptingUtils() as command_runner:
+                send_command = command_runner._send_command
+                effect_count = [0]
+
+                def fail_third_effect(command):
+                    if command.startswith('Compressor:'):
+                        effect_count[0] += 1
+                        if effect_count[0] == 3:
+                            command = 'NotACommand:'
+                    send_command(command)
+                command_runner._send_command = fail_third_effect
+
+                with self.assertRaises(CommandAssertFailure):
+                    command_runner.compress_tracks_by_label(
+                        ['L - AT2050'], journal=JobJournal(journal_path))
+            journal = JobJournal(journal_path)
+
+        self.assertEqual(len(journal), 2)
+
+    def test_undo_policy(self):
+        """
+        Tests that the project is saved and reopened after every N effect
+        commands, that a workflow is not run as a macro under a policy, and
+        that an undo action Audacity does not list is rejected before
+        anything is processed.
+        """
+
+        with AudacityScriptingUtils() as command_runner:
+            sent_commands = record_sent_commands(command_runner)
+
+            policy = UndoPolicy('checkpoint', every=10,
+                                project_path='/tmp/session.aup',
+                                sample_memory=False)
+            command_runner.undo_policy = policy
+            command_runner.normalize_tracks_by_label(['L - AT2050',
+                                                      'R - SM57'])
+            with tempfile.TemporaryDirectory() as macros_dir:
+                ran_as_macro = command_runner.run_region_workflow(
+                    [('Amplify', {'Ratio': 2})], ['L - AT2050'],
+                    regions=[(0, 1), (2, 3)], macros_dir=macros_dir)
+                macro_files = os.listdir(macros_dir)
+
+            command_runner.undo_policy = UndoPolicy('compact')
+            sent_count = len(sent_commands)
+            with self.assertRaises(CommandValidationError):
+                command_runner.normalize_tracks_by_label(['L - AT2050'])
+
+        self.assertEqual(policy.operations, 20)
+        self.assertEqual(policy.resets, 2)
+        self.assertEqual([sample.operations for sample in policy.samples],
+                         [10, 18, 20])
+        self.assertFalse(ran_as_macro)
+        self.assertEqual(macro_files, [])
+        self.assertIsNone(policy.samples[0].memory_bytes)
+        save_index = sent_commands.index(
+            'SaveProject2: Filename=/tmp/session.aup')
+        self.assertEqual(sent_commands[save_index + 1:save_index + 3], [
+            'Close:', 'OpenProject2: Filename=/tmp/session.aup'])
+        self.assertFalse(any(command.startswith('Normalize:')
+                             for command in sent_commands[sent_count:]))
+
+    def test_region_workflow_macro(self):
+        """
+        Tests that a region workflow is written as a macro, that it runs
+        from Python when Audacity does not list the macro, and that the
+        Menus info is not read again for the next macro.
+        """
+
+        with tempfile.TemporaryDirectory() as macros_dir:
+            with AudacityScriptingUtils() as command_runner:
+                sent_commands = record_sent_commands(command_runner)
+
+                ran_as_macro = command_runner.run_region_workflow(
+                    [('Normalize', {'PeakLevel': -1}),
+                     ('Compressor', {'Ratio': 2})],
+                    ['L - AT2050'], regions=[(0, 1), (2, 3)],
+                    macro_name='Workflow', macros_dir=macros_dir)
+                first_run = list(sent_commands)
+                command_runner.run_region_workflow(
+                    [('Amplify', {'Ratio': 2})], ['L - AT2050'],
+                    regions=[(0, 1)], macro_name='Workflow2',
+                    macros_dir=macros_dir)
+            with open(join(macros_dir, 'Workflow.txt')) as macro_file:
+                macro_lines = macro_file.read().splitlines()
+
+        self.assertFalse(ran_as_macro)
+        self.assertEqual(macro_lines, [
+            'SelectNone:', 'Select: Mode=Set Track=0 Start=0 End=1',
+            'Normalize: PeakLevel=-1', 'Compressor: Ratio=2',
+            'Select: Mode=Set Track=0 Start=2 End=3',
+            'Normalize: PeakLevel=-1', 'Compressor: Ratio=2', 'SelectNone:'])
+        self.assertEqual(first_run[-7:], macro_lines[1:])
+        self.assertEqual(sent_commands.count('GetInfo: Type=Menus'),
+                         first_run.count('GetInfo: Type=Menus'))
+
+    def test_region_workflow_runs_macro(self):
+        """
+        Tests that a workflow Audacity lists as a macro is run with a single
+        macro command, reports progress once, and is recorded in the
+        journal.
+        """
+
+        self.aud_mock_proc.macro_ids.append('Macro_Workflow')
+        with tempfile.TemporaryDirectory() as work_dir:
+            journal_path = join(work_dir, 'workflow.jsonl')
+            with AudacityScriptingUtils() as command_runner:
+                sent_commands = record_sent_commands(command_runner)
+
+                progress_calls = []
+                ran_as_macro = command_runner.run_region_workflow(
+                    [('Normalize', {'PeakLevel': -1}),
+                     ('Compressor', {'Ratio': 2})],
+                    ['L - AT2050'], regions=[(0, 1), (2, 3)],
+                    macro_name='Workflow', macros_dir=work_dir,
+                    progress=lambda done, total: progress_calls.append(
+                        (done, total)),
+                    journal=JobJournal(journal_path))
+            journal = JobJournal(journal_path)
+
+        self.assertTrue(ran_as_macro)
+        self.assertEqual(sent_commands.count('Macro_Workflow:'), 1)
+        self.assertFalse(any(command.startswith(('Normalize:', 'Compressor:'))
+                             for command in sent_commands))
+        self.assertEqual(progress_calls, [(2, 2)])
+        self.assertEqual(len(journal), 4)
+        self.assertTrue(journal.is_done('L - AT2050', 2, 3,
+                                        'Compressor: Ratio=2'))
+
+    def test_dry_run_plan(self):
+        """
+        Tests that a dry run only sends reads, records what the plan depends
+        on, estimates its cost, and can be executed afterwards.
+        """
+
+        with AudacityScriptingUtils() as command_runner:
+            command_runner.get_command_catalog()
+            sent_commands = record_sent_commands(command_runner)
+
+            with command_runner.transaction(send=False) as plan:
+                command_runner.normalize_tracks_by_label(['L - AT2050'])
+            self.assertTrue(all(command.startswith('GetInfo:')
+                                for command in sent_commands))
+            plan_estimate = plan.estimate(command_runner.latency)
+            description = plan.describe(command_runner.latency)
+            results = plan.execute(command_runner)
+
+        self.assertEqual(plan.depends_on, ['GetInfo: Type=Tracks',
+                                           'GetInfo: Type=Labels',
+                                           'GetInfo: Type=Clips'])
+        self.assertEqual(plan_estimate.round_trips, len(results))
+        self.assertGreater(plan_estimate.seconds, 0)
+        self.assertIn('Depends on: GetInfo: Type=Tracks', description)
+        self.assertEqual(sent_commands.count('Normalize: PeakLevel=-1.0 '
+                                             'ApplyGain=True '
+                                             'RemoveDcOffset=True '
+                                             'StereoIndependent=False'), 9)
+
+    def test_pipelined_latency(self):
+        """
+        Tests that the commands sent in pipelined batches are measured, so a
+        plan of effects is not priced at the latency of GetInfo.
+        """
+
+        with AudacityScriptingUtils() as command_runner:
+            command_runner.normalize_tracks_by_label(['L - AT2050'])
+            command_runner.set_track_gains({'L - AT2050': -3})
+
+        self.assertEqual(command_runner.latency._counts['normalize'], 9)
+        self.assertIn('settrackaudio', command_runner.latency._counts)
+
+    def test_dry_run_writes_nothing(self):
+        """
+        Tests that a dry run writes no macro file, that exports in a plan
+        report no throughput until the plan is sent, and that sending the
+        plan writes the macro and reports it.
+        """
+
+        with tempfile.TemporaryDirectory() as work_dir:
+            template = join(work_dir, '{track}_{index:03d}.wav')
+            with AudacityScriptingUtils() as command_runner:
+                with command_runner.transaction(send=False) as plan:
+                    command_runner.run_region_workflow(
+                        [('Amplify', {'Ratio': 2})], ['L - AT2050'],
+                        regions=[(0, 1)], macro_name='Workflow',
+                        macros_dir=work_dir)
+                    summary = command_runner.export_regions(
+                        ['L - AT2050'], filename_template=template)
+                written_before_send = os.listdir(work_dir)
+                plan.execute(command_runner)
+                written_after_send = os.listdir(work_dir)
+
+        self.assertEqual(written_before_send, [])
+        self.assertIsNone(summary.seconds)
+        self.assertIsNone(summary.regions_per_second)
+        self.assertIn('Workflow.txt', written_after_send)
+        self.assertGreater(plan.seconds, 0)
+
+    @parameterized.expand([
+        ['Commands'], ['Menus'], ['Preferences'], ['Labels'], ['Boxes'],
+    ])
+    def test_stream_json(self, info_type):
+        """
+        Tests that streaming a GetInfo reply yields the same elements as
+        parsing the buffered reply.
+
+        Parameters
+        ----------
+        info_type : str
+            Value passed to the Type parameter of the GetInfo command.
+        """
+
+        command = 'GetInfo: Type={}'.format(info_type)
+        with AudacityScriptingUtils() as command_runner:
+            streamed = list(command_runner.stream_json(command))
+            buffered = command_runner.get_json(
+                command_runner.run_command(command))
+        self.assertEqual(streamed, buffered)
+
+    @parameterized.expand([
+        ['Commands'], ['Menus'], ['Preferences'], ['Tracks'], ['Clips'],
+        ['Envelopes'], ['Labels'], ['Boxes'],
+    ])
+    def test_get_info_schemas(self, info_type):
+        """
+        Tests that each GetInfo result passes its schema validator.
+
+        Parameters
+        ----------
+        info_type : str
+            Value passed to the Type parameter of the GetInfo command.
+        """
+
+        with AudacityScriptingUtils() as command_runner:
+            res = command_runner.get_info(info_type)
+        self.assertEqual(type(res), tuple)
+
+    def test_get_info_lazy(self):
+        """
+        Tests that the lazy GetInfo result matches the parsed result and only
+        parses the elements that are accessed.
+        """
+
+        with AudacityScriptingUtils() as command_runner:
+            lazy_info = command_runner.get_info_lazy('Preferences')
+            parsed_info = command_runner.get_preferences_info()
+        self.assertEqual(len(lazy_info), len(parsed_info))
+        preference = lazy_info.find('id', '/AudioIO/LatencyDuration')
+        self.assertEqual(preference['default'], 100)
+        self.assertEqual(lazy_info.parsed_count(), 1)
+        self.assertEqual(lazy_info[-1]['id'], parsed_info[-1]['id'])
+        self.assertIsNone(lazy_info.find('id', '/Not/A/Preference'))
+
+
+class CoreComponentTests(unittest.TestCase):
+    """
+    A class containing the tests for the components in audacity_scripting.core
+    that do not need to communicate with Audacity. Run with pytest.
+    """
+
+    def test_parse_cache_eviction(self):
+        """
+        Tests that the parse cache evicts the least recently used result.
+        """
+
+        cache = ParseCache(max_size=2)
+        cache.get('a', lambda result: [result])
+        cache.get('b', lambda result: [result])
+        cache.get('a', lambda result: [result])
+        cache.get('c', lambda result: [result])
+        self.assertEqual(cache.stats()['evictions'], 1)
+        self.assertEqual(cache.get('a', lambda result: None), ('a',))
+        self.assertIsNone(cache.get('b', lambda result: None))
+
+    def test_json_array_stream_incremental(self):
+        """
+        Tests that array elements are yielded as soon as they are complete
+        when the reply is fed one character at a time.
+        """
+
+        parser = JsonArrayStream()
+        elements = []
+        for char in '[ {"id":"a,]"}, [1, {"b":2}], 3 ]':
+            elements.extend(parser.feed(char))
+            if char == '}' and not elements:
+                self.fail('Element was not yielded when it completed')
+        parser.close()
+        self.assertEqual(elements, [{'id': 'a,]'}, [1, {'b': 2}], 3])
+
+    @parameterized.expand([
+        ['Tracks', [{'name': 'A', 'kind': 'wave', 'start': 0, 'end': 1,
+                     'pan': 0}], "Tracks[0]: missing key 'gain'"],
+        ['Labels', [[2, [[1.0, 1.0]]]], 'Labels[0][1][0]: expected an array '
+                                        'of 3 items'],
+        ['Clips', [{'track': 0, 'start': '0', 'end': 1}],
+         "Clips[0]['start']: expected a number, got str"],
+    ])
+    def test_validate_info_errors(self, info_type, info, message):
+        """
+        Tests that malformed GetInfo results raise a SchemaError that names
+        the offending item.
+
+        Parameters
+        ----------
+        info_type : str
+            Value passed to the Type parameter of the GetInfo command.
+        info : object
+            Malformed GetInfo result.
+        message : str
+            Expected start of the error message.
+        """
+
+        with self.assertRaises(SchemaError) as context:
+            validate_info(info_type, info)
+        self.assertTrue(str(context.exception).startswith(message),
+                        str(context.exception))
+        validate_info('Tracks', [{'name': 'Labels', 'kind': 'label'}])
+
+    def test_diff_snapshots(self):
+        """
+        Tests that snapshot diffs match items by key rather than position,
+        including items that share a key.
+        """
+
+        before = {
+            'Tracks': [{'name': 'A', 'gain': 1, 'selected': 0},
+                       {'name': 'B', 'gain': 1, 'selected': 0}],
+            'Labels': [[2, [[1.0, 1.0, 'One'], [2.0, 2.0, 'Two']]]],
+        }
+        after = {
+            'Tracks': [{'name': 'New', 'gain': 1, 'selected': 1},
+                       {'name': 'A', 'gain': 2, 'selected': 0},
+                       {'name': 'B', 'gain': 1, 'selected': 1}],
+            'Labels': [[2, [[2.0, 2.0, 'Two']]]],
+        }
+        diffs = diff_snapshots(before, after)
+        self.assertEqual([entry.index for entry in diffs['Tracks'].added],
+                         [0])
+        self.assertEqual([entry.key for entry in diffs['Tracks'].changed],
+                         [('A', 0)])
+        self.assertEqual(diffs['Tracks'].removed, [])
+        self.assertEqual([entry.before for entry in diffs['Labels'].removed],
+                         [[1.0, 1.0, 'One']])
+        self.assertTrue(diff_info('Clips', [], []).is_empty())
+
+        # Items that share a start time are told apart by occurrence.
+        label_diff = diff_info(
+            'Labels', [[2, [[1.0, 1.0, 'a'], [1.0, 2.0, 'b']]]],
+            [[2, [[1.0, 1.0, 'a']]]])
+        self.assertEqual(label_diff.changed, [])
+        self.assertEqual([entry.before for entry in label_diff.removed],
+                         [[1.0, 2.0, 'b']])
+        clip_diff = diff_info(
+            'Clips', [{'track': 0, 'start': 0.0, 'end': 1.0},
+                      {'track': 0, 'start': 0.0, 'end': 2.0}],
+            [{'track': 0, 'start': 0.0, 'end': 1.0}])
+        self.assertEqual(clip_diff.changed, [])
+        self.assertEqual([entry.key for entry in clip_diff.removed],
+                         [(0, 0.0, 1)])
+
+    def test_track_index(self):
+        """
+        Tests that the track index follows renames and mixes of the tracks
+        the selection tracker has selected, and reports missing and
+        duplicate names.
+        """
+
+        selection = SelectionTracker()
+        track_index = TrackIndex(selection)
+        selection.track_count = lambda: len(track_index)
+
+        def send(command):
+            track_index.command_sent(parse_command(command))
+            selection.command_sent(parse_command(command))
+
+        track_index.rebuild([{'name': 'A', 'kind': 'wave'},
+                             {'name': 'B', 'kind': 'wave'},
+                             {'name': 'Labels', 'kind': 'label'}])
+        for command in ['SelectNone:', 'SelectTracks: Mode=Set Track=0',
+                        'SelectTracks: Mode=Add Track=1',
+                        'MixAndRenderToNewTrack:',
+                        'SelectTracks: Mode=Set Track=3',
+                        'SetTrackStatus: Name="A + B"',
+                        'Normalize: PeakLevel=-1']:
+            send(command)
+        self.assertTrue(track_index.valid)
+        self.assertEqual(track_index.track_num('A + B'), 3)
+        self.assertEqual(track_index.track_nums(['B', 'A'], 'wave'), [0, 1])
+        with self.assertRaises(TrackNotFound):
+            track_index.track_num('Labels', 'wave')
+
+        send('SetTrackStatus: Name="A"')
+        with self.assertRaises(DuplicateTrackName):
+            track_index.track_num('A')
+
+        send('MixAndRenderToNewTrack:')
+        send('SetTrackStatus: Name="Mix"')
+        self.assertFalse(track_index.valid)
+
+        track_index.rebuild([{'name': 'A', 'kind': 'wave'}])
+        send('RemoveTracks:')
+        self.assertFalse(track_index.valid)
+
+    def test_model_split_labels(self):
+        """
+        Tests that the project model splits clips at the start and end of
+        range labels, and only at the labels inside the time selection.
+        """
+
+        selection = SelectionTracker(lambda: 3)
+        project_model = ProjectModel(SimpleNamespace(selection=selection))
+        project_model.info = {
+            'Tracks': [{'name': 'A', 'kind': 'wave', 'start': 0.0,
+                        'end': 10.0},
+                       {'name': 'B', 'kind': 'wave', 'start': 0.0,
+                        'end': 10.0},
+                       {'name': 'Labels', 'kind': 'label'}],
+            'Clips': [{'track': 0, 'start': 0.0, 'end': 10.0},
+                      {'track': 1, 'start': 0.0, 'end': 10.0}],
+            'Envelopes': [],
+            'Labels': [[2, [[1.0, 1.0, 'a'], [3.0, 5.0, 'b'],
+                            [8.0, 12.0, 'c']]]]}
+        project_model._stale_info_types.clear()
+        self.assertEqual(project_model.known_time_span(), (0.0, 12.0))
+
+        for command in ['SelectTracks: Mode=Set Track=0',
+                        'SelectTime: Start=0 End=9', 'SplitLabels:']:
+            project_model.command_sent(parse_command(command))
+            selection.command_sent(parse_command(command))
+        self.assertEqual([(clip_info['track'], clip_info['start'],
+                           clip_info['end'])
+                          for clip_info in project_model.info['Clips']],
+                         [(0, 0.0, 1.0), (0, 1.0, 3.0), (0, 3.0, 5.0),
+                          (0, 5.0, 10.0), (1, 0.0, 10.0)])
+
+    def test_select_track_defaults(self):
+        """
+        Tests that a Select command without track parameters selects track
+        0, so it is not skipped as redundant when another track is selected.
+        """
+
+        selection = SelectionTracker(lambda: 3)
+        for command in ['SelectNone:', 'SelectTracks: Mode=Set Track=1',
+                        'SelectTime: Start=0 End=1']:
+            selection.command_sent(parse_command(command))
+
+        select_time = parse_command('Select: Start=0 End=1')
+        self.assertFalse(selection.is_redundant(select_time))
+        selection.command_sent(select_time)
+        self.assertEqual(selection.state.tracks, frozenset([0]))
+        self.assertEqual(selection.state.time, (0.0, 1.0))
+
+    def test_parse_command(self):
+        """
+        Tests that command strings are split into scripting ids and
+        parameters, and that format_command round trips them.
+        """
+
+        parsed = parse_command('SetTrackStatus: Name="L - AT2050" '
+                               'Selected=1')
+        self.assertEqual(parsed.scripting_id, 'SetTrackStatus')
+        self.assertEqual(parsed.params, {'Name': 'L - AT2050',
+                                         'Selected': '1'})
+        self.assertEqual(parse_command('SelectNone:').params, {})
+        self.assertEqual(parse_command(format_command(*parsed)), parsed)
+        with self.assertRaises(CommandSyntaxError):
+            parse_command('Select All')
+
+    def test_compile_macro(self):
+        """
+        Tests that commands are written one per line, and that commands
+        that cannot run inside a macro are rejected.
+        """
+
+        self.assertEqual(compile_macro(['SelectAll:', 'Normalize: '
+                                        'PeakLevel=-1']),
+                         'SelectAll:\nNormalize: PeakLevel=-1\n')
+        for command in ['GetInfo: Type=Tracks', 'Message: Text="a\nb"']:
+            with self.assertRaises(MacroCompileError):
+                compile_macro([command])
+        with self.assertRaises(MacroCompileError):
+            write_macro('../Workflow', '')
+
+    def test_latency_stats(self):
+        """
+        Tests that estimates use the mean for the scripting id, then the
+        mean of every measurement, then the default.
+        """
+
+        latency = LatencyStats()
+        self.assertEqual(latency.estimate('Normalize'), DEFAULT_LATENCY)
+        latency.record('Normalize', 0.3)
+        latency.record('normalize', 0.1)
+        latency.record('SelectNone', 0.0)
+        self.assertAlmostEqual(latency.estimate('NORMALIZE'), 0.2)
+        self.assertAlmostEqual(latency.estimate('Amplify'), 0.4 / 3)
+
+    def test_order_gain_grid(self):
+        """
+        Tests that a full gain grid is ordered so that each step changes one
+        track's gain, with duplicate vectors removed.
+        """
+
+        gain_grid = list(product([-6, -3, 0], [-6, 0], [0, 6])) * 2
+        ordered_grid = order_gain_grid(gain_grid)
+        self.assertEqual(len(ordered_grid), 12)
+        self.assertEqual(set(ordered_grid), set(gain_grid))
+        self.assertEqual(count_gain_changes(ordered_grid[0], ordered_grid),
+                         11)
+        self.assertEqual(count_gain_changes((0, 0, 0), [(0, 6, 0),
+                                                        (-3, 6, 0)]), 2)
+
+    def test_job_journal(self):
+        """
+        Tests that journal steps are reloaded from disk, that a partly
+        written line is ignored, and that only the steps of the same job
+        whose regions are gone are forgotten.
+        """
+
+        with tempfile.TemporaryDirectory() as journal_dir:
+            journal_path = join(journal_dir, 'job.jsonl')
+            journal = JobJournal(journal_path)
+            journal.record([('A', 0, 1.5, 'Amplify: Ratio=2'),
+                            ('A', 2, 3, 'Amplify: Ratio=2'),
+                            ('A', 2, 3, 'Amplify: Ratio=3'),
+                            ('B', 2, 3, 'Amplify: Ratio=2')])
+            with open(journal_path, 'a') as journal_file:
+                journal_file.write('{"track": "A", "sta')
+
+            reloaded = JobJournal(journal_path)
+            self.assertEqual(len(reloaded), 4)
+            self.assertTrue(reloaded.is_done('A', 0, 1.5, 'Amplify: Ratio=2'))
+            self.assertFalse(reloaded.is_done('A', 0, 1.5,
+                                              'Amplify: Ratio=3'))
+
+            self.assertEqual(reloaded.verify(
+                {('A', 0, 1.5, 'Amplify: Ratio=2')}), 1)
+            self.assertEqual(len(JobJournal(journal_path)), 3)
+            self.assertTrue(reloaded.is_done('B', 2, 3, 'Amplify: Ratio=2'))
+
+            reloaded.clear()
+            self.assertFalse(isfile(journal_path))
+            self.assertEqual(len(reloaded), 0)
+
+    def test_undo_policy_settings(self):
+        """
+        Tests that undo operations are counted and that bad policies are
+        rejected.
+        """
+
+        self.assertEqual(count_undo_operations(
+            ['SelectNone:', 'Select: Mode=Set Track=0 Start=0 End=1',
+             'Normalize:', 'GetInfo: Type=Tracks', 'Export2:',
+             'Amplify: Ratio=2']), 2)
+        with self.assertRaises(ValueError):
+            UndoPolicy('clear')
+        with self.assertRaises(ValueError):
+            UndoPolicy('compact', every=0)
+        with self.assertRaises(ValueError):
+            UndoPolicy('checkpoint')
+        with self.assertRaises(TypeError):
+            UndoPolicy()
+        self.assertEqual(UndoPolicy('compact').reset_commands(),
+                         ['Compact:'])
+
+    def test_region_index(self):
+        """
+        Tests that tracks share one sorted boundary list and that region
+        lookups return the right positions.
+        """
+
+        region_index = RegionIndex.from_labels_info(
+            [[1, [[4.0, 4.0, ''], [1.0, 3.0, ''], [7.0, 9.0, '']]]])
+        self.assertEqual(region_index.boundaries, [2.0, 4.0, 8.0])
+
+        regions = region_index.track_regions(0.5, 6.0)
+        self.assertEqual(regions, [{'start': 0.5, 'end': 2.0},
+                                   {'start': 2.0, 'end': 4.0},
+                                   {'start': 4.0, 'end': 6.0}])
+        self.assertEqual(region_index.track_regions(3.0, 3.5),
+                         [{'start': 3.0, 'end': 3.5}])
+
+        self.assertEqual(region_index.region_containing(4.0, 0.5, 6.0),
+                         (2, {'start': 4.0, 'end': 6.0}))
+        self.assertIsNone(region_index.region_containing(7.0, 0.5, 6.0))
+        self.assertEqual(
+            [position for position, _ in
+             region_index.regions_overlapping(1.0, 4.0, 0.5, 6.0)], [0, 1])
+        self.assertEqual(region_index.regions_overlapping(7.0, 9.0, 0.5,
+                                                          6.0), [])
+
+        self.assertEqual(region_index.clip_aligned_regions([(5.0, 10.0),
+                                                            (0.0, 3.0)]),
+                         [[{'start': 0.0, 'end': 2.0},
+                           {'start': 2.0, 'end': 3.0}],
+                          [{'start': 5.0, 'end': 8.0},
+                           {'start': 8.0, 'end': 10.0}]])
+
+    def test_audio_regions(self):
+        """
+        Tests that the labels of every label track are merged, that the
+        gaps between clips are left out of a track's regions, and that clips
+        that touch do not cut a region.
+        """
+
+        region_index = RegionIndex.from_labels_info(
+            [[1, [[7.0, 9.0, ''], [1.0, 3.0, '']]],
+             [3, [[6.0, 6.0, ''], [4.0, 4.0, '']]]])
+        self.assertEqual(region_index.boundaries, [2.0, 4.0, 6.0, 8.0])
+        self.assertEqual(RegionIndex.from_labels_info(
+            [[1, [[1.0, 3.0, '']]], [3, [[6.0, 6.0, '']]]],
+            label_track_index=1).boundaries, [6.0])
+        self.assertEqual(RegionIndex.from_labels_info([]).boundaries, [])
+
+        self.assertEqual(region_index.audio_regions([(5.0, 10.0),
+                                                     (0.0, 3.0),
+                                                     (3.0, 3.0)]),
+                         [{'start': 0.0, 'end': 2.0},
+                          {'start': 2.0, 'end': 3.0},
+                          {'start': 5.0, 'end': 6.0},
+                          {'start': 6.0, 'end': 8.0},
+                          {'start': 8.0, 'end': 10.0}])
+        self.assertEqual(region_index.audio_regions([(0.0, 1.0),
+                                                     (1.0, 3.0),
+                                                     (9.0, 12.0),
+                                                     (5.0, 9.0)]),
+                         [{'start': 0.0, 'end': 2.0},
+                          {'start': 2.0, 'end': 3.0},
+                          {'start': 5.0, 'end': 6.0},
+                          {'start': 6.0, 'end': 8.0},
+                          {'start': 8.0, 'end': 12.0}])
+        self.assertEqual(region_index.audio_regions([]), [])
+
 
 class AudacityMock(threading.Thread):
     """
@@ -248,6 +1456,13 @@ class AudacityMock(threading.Thread):
     last_getinfo_str : str
         Stores the value of the last info returned by the GetInfo command.
         Defaults to getinfo_commands_str.
+    preferences : dict
+        Current preference values returned by the GetPreference command and
+        changed by the SetPreference command. They differ from the built-in
+        defaults in the Preferences info.
+    macro_ids : list
+        Ids of the macros listed in the Menus info, e.g. 'Macro_Workflow',
+        which the mock also runs.
     toname : str
         File name for tofile. Used on Unix only.
     fromname : str
@@ -277,6 +1492,9 @@ class AudacityMock(threading.Thread):
             self._init_mock_unix()
 
         self.last_getinfo_str = getinfo_commands_str
+        self.preferences = {'/AudioIO/LatencyDuration': '100',
+                            '/AudioIO/EffectsPreviewLen': '3'}
+        self.macro_ids = []
 
     def _init_mock_win(self):
         """
@@ -462,7 +1680,16 @@ class AudacityMock(threading.Thread):
                 getinfo_args = ' '.join(command_list[1:])
             response = self._getinfo_command(getinfo_args)
             response += SUCCESS_RESPONSE
-        elif scripting_id in scripting_id_list:
+        elif scripting_id in ('getpreference', 'setpreference'):
+            name = re.search(r'Name="?([^"\s]*)', command).group(1)
+            value = re.search(r'Value="?([^"\s]*)', command)
+            if value is not None:
+                self.preferences[name] = value.group(1)
+            elif name in self.preferences:
+                response = self.preferences[name] + '\n'
+            response += SUCCESS_RESPONSE
+        elif scripting_id in scripting_id_list or scripting_id in [
+                macro_id.lower() for macro_id in self.macro_ids]:
             response = SUCCESS_RESPONSE
         elif len(command_list) == 1 and ' ' in scripting_id:
             response = MISSING_CHAR_RESPONSE
@@ -488,8 +1715,14 @@ class AudacityMock(threading.Thread):
                 self.last_getinfo_str = getinfo_commands_str
                 return getinfo_commands_str
             elif getinfo_type == 'Menus':
-                self.last_getinfo_str = getinfo_menus_str
-                return getinfo_menus_str
+                # Each listed macro is added at the end of the menus.
+                macro_menus = ''.join(
+                    ',\n  {{ "depth":1, "flags":0, "label":"{0}", '
+                    '"accel":"", "id":"{0}" }}'.format(macro_id)
+                    for macro_id in self.macro_ids)
+                self.last_getinfo_str = (getinfo_menus_str[:-len(' ]\n')] +
+                                         macro_menus + ' ]\n')
+                return self.last_getinfo_str
             elif getinfo_type == 'Preferences':
                 self.last_getinfo_str = getinfo_preferences_str
                 return getinfo_preferences_str